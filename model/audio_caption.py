@@ -1,39 +1,290 @@
 import whisper_timestamped as whisper
 import whisper
+import os
 import subprocess
+import tempfile
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import torch
+from inference_device import prepare_model, resolve_device
+from model_registry import registry
+from caption_store import AUDIO_CAPTION_SCHEMA, save_records
+from checkpoint_log import CheckpointLog
+from moment_ranker import compute_audio_features, save_audio_features
 
-def transcribe_video_to_json(input_file, output_audio_file, output_json_file, language="en", device=None):
+# Whisper 입력 샘플링 레이트
+SAMPLE_RATE = 16000
+
+
+def load_audio_pcm(input_file, sample_rate=SAMPLE_RATE, output_audio_file=None):
+    """
+    ffmpeg 하나로 오디오를 디코딩해 mono float32 PCM을 파이프로 받아 numpy 배열로 반환
+
+    Args:
+        input_file: 입력 비디오/오디오 경로
+        sample_rate: 리샘플링할 샘플링 레이트 (Whisper는 16kHz)
+        output_audio_file: 지정하면 같은 ffmpeg 프로세스에서 192k AAC(m4a) 파일도 함께 저장 (선택)
+    """
+    command = ['ffmpeg', '-nostdin', '-v', 'error', '-i', input_file]
+    if output_audio_file:
+        command += ['-map', '0:a:0', '-vn', '-acodec', 'aac', '-b:a', '192k', '-y', output_audio_file]
+    command += ['-map', '0:a:0', '-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 'f32le', 'pipe:1']
+
+    # stderr도 파이프로 받으면 stdout을 읽는 동안 stderr 버퍼가 차서 ffmpeg가 멈출 수 있으므로 임시 파일로 받음
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = process.stdout.read(1 << 20)
+                if not chunk:
+                    break
+                buffer += chunk
+            returncode = process.wait()
+            if returncode != 0:
+                stderr_file.seek(0)
+                raise subprocess.CalledProcessError(returncode, command, stderr=stderr_file.read())
+            if not buffer:
+                stderr_file.seek(0)
+                message = stderr_file.read().decode(errors='replace').strip()
+                raise RuntimeError(f"ffmpeg가 오디오를 하나도 디코딩하지 못했습니다: {input_file}"
+                                   + (f" ({message})" if message else ""))
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+    # bytearray 위에 바로 배열을 만들어 추가 복사 없이 사용
+    return np.frombuffer(buffer, dtype=np.float32)
+
+def load_whisper_model(name="base", device=None, quantize=False, num_threads=None):
+    """
+    Whisper 모델 로드 (프로세스 전체에서 공유하는 model_registry를 통해 한 번만 로드)
+
+    Args:
+        name: Whisper 모델 크기 (예: 'base')
+        device: 실행 장치 (None이면 GPU가 있으면 cuda, 없으면 cpu)
+        quantize: CPU에서 Linear 레이어를 int8 동적 양자화할지 여부
+        num_threads: CPU 추론 스레드 수
+    """
+    device = resolve_device(device)
+
+    def load():
+        model = whisper.load_model(name, device="cpu" if quantize else device)
+        return prepare_model(model, device, quantize=quantize, num_threads=num_threads)
+
+    return registry.get(f"whisper-{name}:{device}:{'int8' if quantize else 'fp32'}", load)
+
+
+def find_silence_splits(audio, sample_rate=SAMPLE_RATE, max_chunk_seconds=120.0, min_chunk_seconds=30.0,
+                        frame_seconds=0.02, smooth_seconds=0.5):
+    """
+    오디오를 조용한 지점에서 잘라 최대 max_chunk_seconds 길이의 구간 [(시작 샘플, 끝 샘플), ...]으로 나눔
+
+    프레임별 RMS 에너지를 한 번에 계산하고, 각 구간의 [min_chunk_seconds, max_chunk_seconds] 범위 안에서
+    평활화한 에너지가 가장 낮은 지점을 자르는 위치로 고름.
+    """
+    total = len(audio)
+    max_chunk = int(max_chunk_seconds * sample_rate)
+    if total <= max_chunk:
+        return [(0, total)]
+
+    frame_len = max(1, int(frame_seconds * sample_rate))
+    num_frames = total // frame_len
+    frames = np.asarray(audio[:num_frames * frame_len], dtype=np.float32).reshape(num_frames, frame_len)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+    smooth = max(1, int(smooth_seconds / frame_seconds))
+    energy = np.convolve(energy, np.ones(smooth, dtype=np.float32) / smooth, mode='same')
+
+    min_frames = int(min_chunk_seconds * sample_rate) // frame_len
+    max_frames = max(1, max_chunk // frame_len)
+
+    chunks = []
+    start_frame = 0
+    while (num_frames - start_frame) > max_frames:
+        lo = start_frame + min(max(1, min_frames), max_frames)
+        hi = start_frame + max_frames
+        # min_chunk_seconds >= max_chunk_seconds면 고를 범위가 없으므로 max_chunk_seconds 지점에서 바로 자름
+        split_frame = lo + int(np.argmin(energy[lo:hi])) if lo < hi else hi
+        chunks.append((start_frame * frame_len, split_frame * frame_len))
+        start_frame = split_frame
+    chunks.append((start_frame * frame_len, total))
+    return chunks
+
+
+def stitch_transcriptions(chunk_results):
+    """
+    [(시작 시각(초), Whisper 결과), ...]를 하나의 Whisper 결과로 합침
+
+    각 segment(및 word)의 start/end에 구간 시작 시각을 더해 전체 오디오 기준 시각으로 바꾸고 id를 다시 매김.
+    """
+    segments = []
+    texts = []
+    language = None
+    for offset, result in sorted(chunk_results, key=lambda item: item[0]):
+        language = language or result.get('language')
+        texts.append(result.get('text', '').strip())
+        for segment in result.get('segments', []):
+            segment = dict(segment)
+            segment['id'] = len(segments)
+            segment['start'] = round(segment['start'] + offset, 3)
+            segment['end'] = round(segment['end'] + offset, 3)
+            if 'words' in segment:
+                segment['words'] = [
+                    dict(word, start=round(word['start'] + offset, 3), end=round(word['end'] + offset, 3))
+                    for word in segment['words']
+                ]
+            segments.append(segment)
+    return {
+        'text': " ".join(text for text in texts if text),
+        'segments': segments,
+        'language': language,
+    }
+
+
+# 프로세스 풀의 각 워커가 한 번만 로드해 계속 쓰는 Whisper 모델
+_worker_model = None
+_worker_fp16 = False
+
+
+def _init_transcribe_worker(model_name, device, quantize, num_threads):
+    global _worker_model, _worker_fp16
+    _worker_model = load_whisper_model(model_name, device=device, quantize=quantize, num_threads=num_threads)
+    _worker_fp16 = resolve_device(device).type == "cuda"
+
+
+def _transcribe_chunk(offset, chunk, language):
+    result = _worker_model.transcribe(chunk, language=language, fp16=_worker_fp16)
+    return offset, result
+
+
+def transcribe_parallel(audio, num_workers, model_name="base", device=None, language=None, quantize=False,
+                        num_threads=None, max_chunk_seconds=120.0, checkpoint_path=None):
+    """
+    오디오를 조용한 지점에서 나눠 프로세스 풀에서 병렬로 트랜스크립션한 뒤 전체 시각 기준으로 합침
+
+    Args:
+        num_workers: 워커 프로세스 수 (워커마다 Whisper 모델을 하나씩 로드, 1이면 현재 프로세스에서 구간별로 실행)
+        num_threads: 워커 하나가 쓸 CPU 스레드 수 (None이면 코어 수 / num_workers)
+        max_chunk_seconds: 구간 최대 길이 (초)
+        checkpoint_path: 지정하면 구간 결과를 끝나는 대로 이 로그에 이어 쓰고, 다시 실행하면 끝난 구간은 건너뜀
+    """
+    chunks = find_silence_splits(audio, max_chunk_seconds=max_chunk_seconds,
+                                 min_chunk_seconds=min(30.0, max_chunk_seconds / 2))
+
+    checkpoint = CheckpointLog(checkpoint_path) if checkpoint_path else None
+    chunk_results = []
+    if checkpoint:
+        done = {record['start_sample']: record['result'] for record in checkpoint.load()}
+        chunk_results = [(start / SAMPLE_RATE, done[start]) for start, _ in chunks if start in done]
+        if chunk_results:
+            print(f"체크포인트에서 {len(chunk_results)}개 구간의 트랜스크립션을 불러옵니다: {checkpoint_path}")
+        chunks = [(start, end) for start, end in chunks if start not in done]
+
+    def record(start, result):
+        chunk_results.append((start / SAMPLE_RATE, result))
+        if checkpoint:
+            checkpoint.append({'start_sample': start, 'result': result})
+
+    print(f"오디오를 {len(chunks)}개 구간으로 나눠 {num_workers}개 프로세스에서 트랜스크립션합니다.")
+    if num_threads is None:
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+    try:
+        if num_workers <= 1:
+            model = load_whisper_model(model_name, device=device, quantize=quantize, num_threads=num_threads)
+            fp16 = resolve_device(device).type == "cuda"
+            for start, end in chunks:
+                record(start, model.transcribe(audio[start:end], language=language, fp16=fp16))
+        elif chunks:
+            device = str(resolve_device(device))
+            # CUDA를 쓰는 워커도 안전하게 만들 수 있도록 spawn 사용
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                                     initializer=_init_transcribe_worker,
+                                     initargs=(model_name, device, quantize, num_threads)) as executor:
+                futures = {
+                    executor.submit(_transcribe_chunk, start / SAMPLE_RATE, audio[start:end], language): start
+                    for start, end in chunks
+                }
+                # 끝나는 순서대로 기록해서 중간에 멈춰도 끝난 구간은 남도록 함
+                for future in as_completed(futures):
+                    _, result = future.result()
+                    record(futures[future], result)
+    finally:
+        if checkpoint:
+            checkpoint.close()
+    return stitch_transcriptions(chunk_results)
+
+
+def transcribe_video_to_json(input_file, output_audio_file, output_json_file, language="en", device=None,
+                             quantize=False, num_threads=None, num_workers=1, max_chunk_seconds=120.0,
+                             checkpoint_path=None, audio_features_path=None):
     """
-    비디오 파일에서 오디오를 추출하고, Whisper 모델을 사용해 트랜스크립션을 진행한 후 결과를 JSON 파일로 저장하는 함수.
+    비디오 파일에서 오디오를 16kHz PCM으로 바로 받아 Whisper 모델로 트랜스크립션을 진행한 후 결과를 JSON 파일로 저장하는 함수.
 
     Parameters:
     input_file (str): 입력 비디오 파일 경로
-    output_audio_file (str): 추출된 오디오 파일 경로 (기본값: 'output.m4a')
-    output_json_file (str): 결과 JSON 파일 경로 (기본값: 'transcription_result.json')
+    output_audio_file (str): 지정하면 추출한 오디오를 m4a 파일로도 저장 (None이면 저장하지 않음)
+    output_json_file (str): 결과 경로 (.json이면 Whisper 결과 전체를 JSON으로, 아니면 segment만 caption_store 저장소로 저장)
     language (str): 트랜스크립션에 사용할 언어 (기본값: 'en')
+    device: 실행 장치 (None이면 GPU가 있으면 cuda, 없으면 cpu)
+    quantize (bool): CPU에서 Whisper Linear 레이어를 int8 동적 양자화할지 여부
+    num_threads (int): CPU 추론 스레드 수 (병렬 실행 시 워커 하나당)
+    num_workers (int): 1보다 크면 조용한 지점에서 오디오를 나눠 여러 프로세스에서 병렬로 트랜스크립션
+    max_chunk_seconds (float): 병렬 실행 시 구간 최대 길이 (초)
+    checkpoint_path (str): 지정하면 구간별로 나눠 트랜스크립션하면서 끝난 구간을 이 로그에 기록하고,
+                           다시 실행하면 끝난 구간은 건너뜀 (결과를 저장하면 로그는 삭제).
+                           Whisper는 한 번의 호출 중간부터 이어갈 수 없으므로 num_workers=1이어도
+                           조용한 지점에서 나눈 구간별로 실행함 (구간 경계에서 segment가 나뉠 수 있음)
+    audio_features_path (str): 지정하면 디코딩한 PCM으로 moment_ranker의 칸별 오디오 특징도 계산해 npz로 저장
+                               (moment_rank 단계가 소리를 다시 디코딩하지 않도록 함)
     
     Returns:
-    None (결과는 JSON 파일로 저장)
+    None (결과는 output_json_file에 저장)
     """
     print(f"Input file path: {input_file}")
     
     try:
-        subprocess.run(['ffmpeg', '-i', input_file, '-vn', '-acodec', 'aac', '-b:a', '192k', output_audio_file], check=True, stderr=subprocess.PIPE)
+        audio = load_audio_pcm(input_file, output_audio_file=output_audio_file)
     except subprocess.CalledProcessError as e:
         print("FFmpeg 오류:", e.stderr.decode())
+        raise
+    print(f"오디오 길이: {len(audio) / SAMPLE_RATE:.1f}초")
+    if audio_features_path:
+        save_audio_features(audio_features_path, compute_audio_features(audio, sample_rate=SAMPLE_RATE))
     
-    if device is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+    device = resolve_device(device)
     print(f"Using device for audio transcription: {device}")
     
-    model = whisper.load_model("base", device=device)
-    result = model.transcribe(output_audio_file)
+    # 체크포인트는 구간 단위로 남으므로 워커가 하나여도 구간으로 나눠 실행
+    if num_workers > 1 or checkpoint_path:
+        result = transcribe_parallel(
+            audio, num_workers, model_name="base", device=device, language=language, quantize=quantize,
+            num_threads=num_threads, max_chunk_seconds=max_chunk_seconds, checkpoint_path=checkpoint_path
+        )
+    else:
+        model = load_whisper_model("base", device=device, quantize=quantize, num_threads=num_threads)
+        # CPU에서는 fp16을 쓸 수 없으므로 fp32로 디코딩
+        result = model.transcribe(audio, language=language, fp16=device.type == "cuda")
     
-    with open(output_json_file, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
-        print(f"Transcription saved to {output_json_file}")
+    if output_json_file.endswith('.json'):
+        with open(output_json_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    else:
+        # 다음 단계에서 쓰는 segment 시각/텍스트만 컬럼형 저장소로 저장 (token 배열 등은 버림)
+        segments = [
+            {'start': segment['start'], 'end': segment['end'], 'text': segment['text']}
+            for segment in result['segments']
+        ]
+        save_records(output_json_file, segments, AUDIO_CAPTION_SCHEMA,
+                     attrs={'language': result.get('language'), 'text': result.get('text', '')})
+    print(f"Transcription saved to {output_json_file}")
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
 
 # input_file = '/home/aikusrv02/aiku/video_retrieval/data/brooklyn/brooklyn_nine-nine.mp4'
@@ -0,0 +1,416 @@
+import sys
+import json
+import time
+import difflib
+from itertools import islice
+
+
+def word_error_rate(reference, hypothesis):
+    """단어 단위 편집 거리 / 기준 단어 수"""
+    ref, hyp = reference.split(), hypothesis.split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ref_word != hyp_word))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def caption_agreement(reference_captions, captions):
+    """기준 캡션 대비 완전 일치율과 평균 단어 유사도(difflib ratio)"""
+    exact = sum(a == b for a, b in zip(reference_captions, captions))
+    similarity = sum(
+        difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
+        for a, b in zip(reference_captions, captions)
+    )
+    n = max(len(reference_captions), 1)
+    return exact / n, similarity / n
+
+
+def benchmark_cpu_quantization(video_path, num_frames=32, batch_size=8, audio_seconds=60, num_threads=None,
+                               output_json=None):
+    """
+    CPU에서 float32와 int8 동적 양자화 모델의 처리량과 결과 차이를 측정
+
+    BLIP은 frames/sec와 float32 캡션 대비 일치율/유사도를,
+    Whisper는 실시간 대비 속도(오디오 길이 / 처리 시간)와 float32 결과 대비 WER을 보고함.
+    """
+    from video_caption import initialize_model, sample_frames, preprocess_images, generate_captions_batched
+    from audio_caption import load_whisper_model, load_audio_pcm, SAMPLE_RATE
+    from model_registry import registry
+
+    frames = [frame for _, frame in islice(sample_frames(video_path, 1), num_frames)]
+    audio = load_audio_pcm(video_path)[:audio_seconds * SAMPLE_RATE]
+    audio_duration = len(audio) / SAMPLE_RATE
+
+    results = {}
+    for quantize in (False, True):
+        label = "int8" if quantize else "float32"
+
+        processor, model = initialize_model("cpu", quantize=quantize, num_threads=num_threads)
+        pixel_values = preprocess_images(frames, processor)
+        generate_captions_batched(pixel_values[:1], processor, model, 1)  # warm-up
+        start = time.time()
+        captions, _ = generate_captions_batched(pixel_values, processor, model, batch_size)
+        caption_seconds = time.time() - start
+        del model
+        registry.evict_all()
+
+        whisper_model = load_whisper_model("base", device="cpu", quantize=quantize, num_threads=num_threads)
+        start = time.time()
+        transcript = whisper_model.transcribe(audio, fp16=False)['text']
+        whisper_seconds = time.time() - start
+        del whisper_model
+        registry.evict_all()
+
+        results[label] = {
+            'blip_frames_per_sec': len(frames) / caption_seconds,
+            'whisper_realtime_factor': audio_duration / whisper_seconds,
+            'captions': captions,
+            'transcript': transcript,
+        }
+
+    exact, similarity = caption_agreement(results['float32']['captions'], results['int8']['captions'])
+    summary = {
+        'video_path': video_path,
+        'num_frames': len(frames),
+        'audio_seconds': audio_duration,
+        'blip_speedup': results['int8']['blip_frames_per_sec'] / results['float32']['blip_frames_per_sec'],
+        'blip_exact_match': exact,
+        'blip_word_similarity': similarity,
+        'whisper_speedup': results['int8']['whisper_realtime_factor'] / results['float32']['whisper_realtime_factor'],
+        'whisper_wer_vs_float32': word_error_rate(results['float32']['transcript'], results['int8']['transcript']),
+        'results': results,
+    }
+
+    print("\n=== CPU int8 동적 양자화 벤치마크 ===")
+    for label in ("float32", "int8"):
+        print(f"{label:>8}: BLIP {results[label]['blip_frames_per_sec']:.2f} frames/sec, "
+              f"Whisper {results[label]['whisper_realtime_factor']:.2f}x 실시간")
+    print(f"BLIP 속도 향상: {summary['blip_speedup']:.2f}x, 캡션 완전 일치율: {exact:.1%}, 단어 유사도: {similarity:.3f}")
+    print(f"Whisper 속도 향상: {summary['whisper_speedup']:.2f}x, float32 대비 WER: {summary['whisper_wer_vs_float32']:.3f}")
+
+    if output_json:
+        with open(output_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"벤치마크 결과 저장: {output_json}")
+    return summary
+
+
+def _merge_captions_quadratic(audio_caption, video_caption):
+    """기존 merge_captions (오디오 구간마다 모든 비디오 캡션을 strptime으로 비교) - 비교 기준용"""
+    from concat import to_datetime
+
+    merged_data = []
+    for audio in audio_caption:
+        start_time = to_datetime(str(audio['start_formatted']))
+        end_time = to_datetime(str(audio['end_formatted']))
+        relevant_videos = [
+            video['caption']
+            for video in video_caption
+            if start_time <= to_datetime(str(video['time'])) <= end_time
+        ]
+        merged_data.append({
+            'time': audio['start_formatted'],
+            'audio_caption': audio['text'],
+            'video_caption': relevant_videos
+        })
+    return merged_data
+
+
+def _synthetic_captions(num_segments, num_frames, seed=0):
+    """대사 구간과 공백이 섞인 오디오 구간 / 임의 시각의 비디오 캡션 생성"""
+    import random
+
+    def format_timestamp(seconds):
+        return f"{int(seconds) // 3600:02}:{int(seconds) % 3600 // 60:02}:{seconds % 60:06.3f}"
+
+    rng = random.Random(seed)
+    duration = num_frames * 1.0
+    audio_caption = []
+    t = 0.0
+    step = duration / num_segments
+    for i in range(num_segments):
+        start = t + rng.uniform(0, step * 0.3)
+        end = start + rng.uniform(step * 0.3, step * 0.7)
+        audio_caption.append({'start_formatted': round(start, 2), 'end_formatted': round(end, 2), 'text': f"line {i}"})
+        t += step
+    frame_times = sorted(rng.uniform(0, duration) for _ in range(num_frames))
+    video_caption = [
+        {'time': format_timestamp(frame_time), 'caption': f"frame {i}"}
+        for i, frame_time in enumerate(frame_times)
+    ]
+    return audio_caption, video_caption
+
+
+def benchmark_merge(num_segments=10000, num_frames=10000, legacy_size=1000, output_json=None):
+    """
+    concat.merge_captions 처리 시간 측정
+
+    num_segments x num_frames에서 현재 구현을 재고, 기존 O(N*M) 구현은 오래 걸리므로
+    legacy_size x legacy_size에서 재서 비교 쌍 수에 비례해 늘린 추정치를 함께 보고함.
+    작은 입력에서는 두 구현의 결과(공백 항목 제외)가 같은지도 확인함.
+    """
+    from concat import merge_captions
+
+    audio_caption, video_caption = _synthetic_captions(num_segments, num_frames)
+    start = time.time()
+    merged = merge_captions(audio_caption, video_caption)
+    merge_seconds = time.time() - start
+    gap_captions = sum(len(entry['video_caption']) for entry in merged if entry['audio_caption'] == '')
+
+    small_audio, small_video = _synthetic_captions(legacy_size, legacy_size)
+    start = time.time()
+    legacy = _merge_captions_quadratic(small_audio, small_video)
+    legacy_seconds = time.time() - start
+    identical = legacy == merge_captions(small_audio, small_video, include_gaps=False)
+    legacy_estimate = legacy_seconds * (num_segments * num_frames) / (legacy_size * legacy_size)
+
+    summary = {
+        'num_segments': num_segments,
+        'num_frames': num_frames,
+        'merge_seconds': merge_seconds,
+        'gap_captions_attached': gap_captions,
+        'legacy_size': legacy_size,
+        'legacy_seconds': legacy_seconds,
+        'legacy_estimated_seconds': legacy_estimate,
+        'identical_to_legacy': identical,
+    }
+
+    print("\n=== 캡션 병합 벤치마크 ===")
+    print(f"현재 구현: {num_segments} 구간 x {num_frames} 프레임 -> {merge_seconds * 1000:.1f}ms "
+          f"(공백 구간 캡션 {gap_captions}개 포함)")
+    print(f"기존 구현: {legacy_size} x {legacy_size} -> {legacy_seconds:.2f}초, "
+          f"{num_segments} x {num_frames} 추정 {legacy_estimate:.1f}초")
+    print(f"기존 구현과 결과 일치 (공백 항목 제외): {identical}")
+
+    if output_json:
+        with open(output_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def _synthetic_llm_response(model, messages):
+    """프롬프트의 세그먼트/후보 시각으로 올바른 형식의 응답을 만듦 (LLM 부하 테스트용 ReplayBackend fallback)"""
+    import re
+
+    def hms(seconds):
+        return f"{int(seconds) // 3600:02}:{int(seconds) % 3600 // 60:02}:{int(seconds) % 60:02}"
+
+    prompt = messages[-1]['content']
+    pairs = re.findall(r'\[\d+\] (\S+) - (\S+)', prompt)
+    if not pairs:
+        times = [float(t) for t in re.findall(r'Timestamp: ([\d.]+)', prompt)] or [0.0]
+        pairs = [(hms(times[0]), hms(times[-1]))]
+    return json.dumps({
+        'funniest_timestamps_full': [list(pair) for pair in pairs[:2]],
+        'funniest_start_timestamps_only': [pair[0] for pair in pairs[:2]],
+    })
+
+
+def benchmark_llm(num_segments=3000, window_tokens=2000, concurrency_levels=(1, 4, 8), latency_seconds=0.2,
+                  requests_per_minute=None, output_json=None):
+    """
+    타임스탬프 선택 단계(get_funny_timestamps)를 네트워크 없이 부하 테스트
+
+    로컬 OpenAI 호환 서버(llm_backend.start_stub_server)가 latency_seconds 뒤에 합성 응답을 돌려주고,
+    실제 실행과 같은 OpenAICompatibleBackend(연결 풀/속도 제한/재시도)로 동시 호출 수별 전체 시간을 잼.
+    """
+    import asyncio
+    import tempfile
+    from caption_store import MERGED_CAPTION_SCHEMA, save_records
+    from llm_backend import OpenAICompatibleBackend, ReplayBackend, start_stub_server
+    from prompt import get_funny_timestamps
+
+    merged = [
+        {'time': i * 3.0, 'audio_caption': f" line {i} " + "word " * 12, 'video_caption': [f"frame {i}"]}
+        for i in range(num_segments)
+    ]
+
+    async def run():
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            merged_path = f"{tmp_dir}/merged_caption.cap"
+            save_records(merged_path, merged, MERGED_CAPTION_SCHEMA)
+            for concurrency in concurrency_levels:
+                replay = ReplayBackend(fallback=_synthetic_llm_response, latency_seconds=latency_seconds)
+                server, base_url = await start_stub_server(replay)
+                backend = OpenAICompatibleBackend(base_url=base_url, max_connections=concurrency,
+                                                  requests_per_minute=requests_per_minute)
+                try:
+                    start = time.time()
+                    output = await get_funny_timestamps(
+                        merged_path, "benchmark", None, f"{tmp_dir}/funny_timestamps.json", num_clips=2,
+                        window_tokens=window_tokens, max_concurrency=concurrency, candidates_per_window=2,
+                        backend=backend
+                    )
+                    elapsed = time.time() - start
+                finally:
+                    await backend.close()
+                    await server.cleanup()
+                results[concurrency] = {
+                    'seconds': elapsed,
+                    'requests': replay.calls,
+                    'requests_per_sec': replay.calls / elapsed,
+                    'max_in_flight': replay.max_in_flight,
+                    'retries': backend.retries,
+                    'ok': output is not None,
+                }
+        return results
+
+    results = asyncio.run(run())
+    summary = {
+        'num_segments': num_segments,
+        'window_tokens': window_tokens,
+        'latency_seconds': latency_seconds,
+        'requests_per_minute': requests_per_minute,
+        'results': results,
+    }
+
+    print("\n=== LLM 타임스탬프 선택 부하 테스트 (로컬 서버) ===")
+    for concurrency, result in results.items():
+        print(f"동시 호출 {concurrency}: {result['seconds']:.2f}초, 요청 {result['requests']}개 "
+              f"({result['requests_per_sec']:.1f}/sec), 최대 동시 처리 {result['max_in_flight']}, "
+              f"재시도 {result['retries']}, 성공: {result['ok']}")
+
+    if output_json:
+        with open(output_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+DEFAULT_FRAME_QUERIES = (
+    "a man getting hit in the face", "a child screaming", "two burglars walking in the snow",
+    "a dark staircase", "a family at the airport", "a boy eating pizza", "a christmas tree with lights",
+    "a police car", "someone falling down", "a paint can swinging on a rope",
+)
+
+
+def benchmark_frame_index(video_path, video_caption_path, batch_size=32, quantize=False, top_k=10,
+                          queries=DEFAULT_FRAME_QUERIES, repeats=20, num_threads=None, output_json=None):
+    """
+    frame_index의 생성 처리량과 검색 지연 시간을 영화 한 편에서 측정
+
+    생성은 파이프라인과 같은 build_frame_index(video_caption 결과의 프레임 시각 + read_frames_at)로 재고,
+    frames/sec와 실시간 대비 속도(영상 길이 / 생성 시간)를 보고함. 검색은 질의 임베딩 시간과
+    int8 인덱스 검색 시간을 따로 보고하고, 같은 프레임을 float32로 다시 임베딩해서 구한 top_k 대비
+    int8 결과의 recall도 계산함 (recall용 임베딩은 생성 시간에 포함하지 않음).
+
+    Args:
+        video_caption_path: video_caption 단계 결과 (video_caption.cap), 임베딩할 프레임 시각을 가져옴
+    """
+    import subprocess
+    import tempfile
+    import numpy as np
+    from caption_store import load_records, to_seconds
+    from frame_index import (load_clip_model, build_frame_index, embed_frames, read_frames_at, encode_text_queries,
+                             FrameIndex)
+
+    try:
+        result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0',
+                                 video_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        video_seconds = float(result.stdout.decode().strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        video_seconds = max((to_seconds(record['time']) for record in load_records(video_caption_path)), default=0.0)
+
+    processor, model = load_clip_model("cpu", quantize=quantize, num_threads=num_threads)
+    stats = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_dir = f"{tmp_dir}/frame_index"
+        build_frame_index(video_path, video_caption_path, index_dir, device="cpu", batch_size=batch_size,
+                          quantize=quantize, num_threads=num_threads, stats=stats)
+        build_seconds = stats['build_seconds']
+        index = FrameIndex(index_dir)
+        times = np.asarray(index.times)
+        index_bytes = index.embeddings.nbytes + index.scales.nbytes + index.times.nbytes
+
+        start = time.time()
+        query_vectors = encode_text_queries(list(queries), processor, model)
+        encode_ms = (time.time() - start) * 1000 / len(queries)
+
+        start = time.time()
+        for _ in range(repeats):
+            for query_vector in query_vectors:
+                index.search_vector(query_vector, top_k)
+        search_ms = (time.time() - start) * 1000 / (repeats * len(queries))
+
+        batches = list(embed_frames(read_frames_at(video_path, times), processor, model, batch_size=batch_size))
+        reference_times = (np.concatenate([batch_times for batch_times, _ in batches]) if batches
+                           else np.zeros(0))
+        embeddings = (np.concatenate([batch_embeddings for _, batch_embeddings in batches]) if batches
+                      else np.zeros((0, model.config.projection_dim), dtype=np.float32))
+        recalls = []
+        for query_vector in query_vectors:
+            exact = {float(reference_times[i])
+                     for i in np.argsort(-(embeddings @ query_vector), kind='stable')[:top_k]}
+            found = {t for t, _ in index.search_vector(query_vector, top_k)}
+            recalls.append(len(exact & found) / max(len(exact), 1))
+
+    summary = {
+        'video_path': video_path,
+        'video_caption_path': video_caption_path,
+        'num_frames': len(times),
+        'video_seconds': video_seconds,
+        'build_seconds': build_seconds,
+        'build_frames_per_sec': len(times) / max(build_seconds, 1e-9),
+        'build_realtime_factor': video_seconds / max(build_seconds, 1e-9),
+        'decode_preprocess_seconds': stats['decode_preprocess'],
+        'inference_seconds': stats['inference'],
+        'index_bytes': index_bytes,
+        'float32_bytes': embeddings.astype(np.float32).nbytes,
+        'query_encode_ms': encode_ms,
+        'search_ms': search_ms,
+        f'int8_recall_at_{top_k}': float(np.mean(recalls)),
+    }
+
+    print("\n=== 프레임 인덱스 벤치마크 ===")
+    print(f"생성(build_frame_index): 프레임 {len(times)}개 ({video_seconds / 60:.1f}분), {build_seconds:.1f}초, "
+          f"{summary['build_frames_per_sec']:.2f} frames/sec, {summary['build_realtime_factor']:.1f}x 실시간 "
+          f"(디코딩+전처리 {stats['decode_preprocess']:.1f}초, 추론 {stats['inference']:.1f}초)")
+    print(f"인덱스 크기: {index_bytes / 1024 ** 2:.2f}MB (float32 {summary['float32_bytes'] / 1024 ** 2:.2f}MB)")
+    print(f"검색: 질의 임베딩 {encode_ms:.1f}ms + 검색 {search_ms:.2f}ms, "
+          f"float32 대비 int8 recall@{top_k}: {summary[f'int8_recall_at_{top_k}']:.3f}")
+
+    if output_json:
+        with open(output_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+BENCHMARKS = {
+    'quantization': benchmark_cpu_quantization,
+    'merge': benchmark_merge,
+    'llm': benchmark_llm,
+    'frame_index': benchmark_frame_index,
+}
+
+
+def _parse_cli_args(argv):
+    """'값' 은 위치 인자로, 'key=값' 은 키워드 인자로 변환 (숫자 등은 JSON으로 해석)"""
+    def parse_value(value):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+
+    args, kwargs = [], {}
+    for arg in argv:
+        if '=' in arg:
+            key, value = arg.split('=', 1)
+            kwargs[key] = parse_value(value)
+        else:
+            args.append(parse_value(arg))
+    return args, kwargs
+
+
+if __name__ == "__main__":
+    # 사용법: python benchmark.py <벤치마크 이름> [인자...] [key=value...]
+    # 예: python benchmark.py quantization /path/to/movie.mp4 num_frames=64 output_json=quant.json
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"사용법: python benchmark.py {{{'|'.join(BENCHMARKS)}}} [인자...] [key=value...]")
+        sys.exit(1)
+    args, kwargs = _parse_cli_args(sys.argv[2:])
+    BENCHMARKS[sys.argv[1]](*args, **kwargs)
@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import threading
+import cv2
+import numpy as np
+
+
+def perceptual_hash(frame, hash_size=8, highfreq_factor=4):
+    """
+    RGB 프레임의 64비트 perceptual hash (DCT 기반 pHash)
+
+    재인코딩/해상도 변경/약간의 밝기 차이에는 같은 값이 나오도록
+    축소한 흑백 이미지의 저주파 DCT 계수만 중앙값과 비교함.
+    """
+    img_size = hash_size * highfreq_factor
+    gray = cv2.cvtColor(np.asarray(frame, dtype=np.uint8), cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (img_size, img_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_freq = cv2.dct(small)[:hash_size, :hash_size].ravel()
+    # DC 성분은 전체 밝기라서 중앙값 계산에서 제외
+    bits = low_freq > np.median(low_freq[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    # sqlite INTEGER(부호 있는 64비트)에 들어가도록 변환
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class CaptionCache:
+    """
+    (perceptual hash, 모델 ID)를 키로 캡션을 저장하는 디스크 캐시 (sqlite)
+
+    항목 수가 max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 삭제(LRU)함.
+    여러 스레드에서 함께 써도 되도록 내부에서 잠금을 사용함.
+    """
+    def __init__(self, db_path, model_id, max_entries=500_000):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db_path = db_path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS captions ("
+            " model_id TEXT NOT NULL,"
+            " phash INTEGER NOT NULL,"
+            " caption TEXT NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " PRIMARY KEY (model_id, phash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_captions_last_access ON captions (last_access)")
+        self._conn.commit()
+
+    def get_many(self, hashes):
+        """hash 목록에 대한 캡션 목록 반환 (없는 항목은 None)"""
+        if not hashes:
+            return []
+        unique = list(set(hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT phash, caption FROM captions WHERE model_id = ? AND phash IN ({placeholders})",
+                    [self.model_id, *chunk]
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE captions SET last_access = ? WHERE model_id = ? AND phash = ?",
+                    [(now, self.model_id, h) for h in found]
+                )
+                self._conn.commit()
+            results = [found.get(h) for h in hashes]
+            hits = sum(caption is not None for caption in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, hashes, captions):
+        """hash별 캡션을 저장하고 필요하면 오래된 항목을 삭제"""
+        if not hashes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO captions (model_id, phash, caption, last_access) VALUES (?, ?, ?, ?)",
+                [(self.model_id, h, caption, now) for h, caption in zip(hashes, captions)]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM captions WHERE rowid IN "
+                "(SELECT rowid FROM captions ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
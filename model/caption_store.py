@@ -0,0 +1,207 @@
+import os
+import json
+import shutil
+import numpy as np
+
+# 각 단계 산출물의 컬럼 구성 (float: 초 단위 시각, text: 문자열, text_list: 문자열 목록)
+VIDEO_CAPTION_SCHEMA = {'time': 'float', 'caption': 'text'}
+AUDIO_CAPTION_SCHEMA = {'start': 'float', 'end': 'float', 'text': 'text'}
+MERGED_CAPTION_SCHEMA = {'time': 'float', 'audio_caption': 'text', 'video_caption': 'text_list'}
+
+STORE_VERSION = 1
+
+
+def to_seconds(time_value):
+    """'HH:MM:SS(.fff)' 문자열이나 숫자(초)를 float 초로 변환"""
+    if isinstance(time_value, (float, int)):
+        return float(time_value)
+    parts = str(time_value).split(':')
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _write_text_column(directory, name, texts):
+    """문자열 목록을 UTF-8 바이트 버퍼 하나와 offset 배열로 저장"""
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    with open(os.path.join(directory, f"{name}.utf8"), 'wb') as f:
+        for b in encoded:
+            f.write(b)
+
+
+def write_caption_store(path, columns, schema, time_column=None, attrs=None):
+    """
+    컬럼 데이터를 메모리 매핑 가능한 컬럼형 폴더로 저장
+
+    Args:
+        path: 저장할 폴더 경로 (예: 'video_caption.cap')
+        columns: {컬럼 이름: 값 목록}
+        schema: {컬럼 이름: 'float' | 'text' | 'text_list'}
+        time_column: 시간 범위 조회에 쓸 float 컬럼 (오름차순이어야 함, 기본값: 첫 번째 float 컬럼)
+        attrs: 함께 저장할 부가 정보 (예: 언어)
+    """
+    num_rows = len(next(iter(columns.values()))) if columns else 0
+    if time_column is None:
+        time_column = next((name for name, kind in schema.items() if kind == 'float'), None)
+
+    # 다 쓴 뒤에 이름을 바꿔서 중간에 죽어도 반쯤 쓰인 저장소가 남지 않게 함
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    for name, kind in schema.items():
+        values = columns[name]
+        if len(values) != num_rows:
+            raise ValueError(f"컬럼 길이가 다릅니다: {name} ({len(values)} != {num_rows})")
+        if kind == 'float':
+            array = np.asarray([to_seconds(v) for v in values], dtype=np.float64)
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        elif kind == 'text':
+            _write_text_column(tmp_path, name, [str(v) for v in values])
+        elif kind == 'text_list':
+            row_offsets = np.zeros(num_rows + 1, dtype=np.int64)
+            np.cumsum([len(v) for v in values], out=row_offsets[1:])
+            np.save(os.path.join(tmp_path, f"{name}.rows.npy"), row_offsets)
+            _write_text_column(tmp_path, name, [str(item) for v in values for item in v])
+        else:
+            raise ValueError(f"지원하지 않는 컬럼 형식입니다: {kind}")
+
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': STORE_VERSION,
+            'num_rows': num_rows,
+            'schema': schema,
+            'time_column': time_column,
+            'attrs': attrs or {},
+        }, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+class CaptionStore:
+    """
+    write_caption_store로 저장한 컬럼형 캡션 저장소를 메모리 매핑으로 여는 클래스
+
+    시각 컬럼은 float 배열, 텍스트는 offset 배열 + UTF-8 버퍼로 열리므로
+    파일 전체를 파싱하지 않고 필요한 행(시간 범위)만 꺼내 쓸 수 있음.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"지원하지 않는 저장소 버전입니다: {meta.get('version')}")
+        self.num_rows = meta['num_rows']
+        self.schema = meta['schema']
+        self.time_column = meta['time_column']
+        self.attrs = meta.get('attrs', {})
+        self._columns = {}
+
+    def __len__(self):
+        return self.num_rows
+
+    def _text_buffers(self, name):
+        offsets = np.load(os.path.join(self.path, f"{name}.offsets.npy"), mmap_mode='r')
+        blob_path = os.path.join(self.path, f"{name}.utf8")
+        if os.path.getsize(blob_path) == 0:
+            blob = np.zeros(0, dtype=np.uint8)
+        else:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        return offsets, blob
+
+    def column(self, name):
+        """float 컬럼은 메모리 매핑된 배열, 텍스트 컬럼은 (offsets, blob[, row_offsets]) 반환"""
+        if name not in self._columns:
+            kind = self.schema[name]
+            if kind == 'float':
+                self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+            elif kind == 'text':
+                self._columns[name] = self._text_buffers(name)
+            else:
+                row_offsets = np.load(os.path.join(self.path, f"{name}.rows.npy"), mmap_mode='r')
+                self._columns[name] = (*self._text_buffers(name), row_offsets)
+        return self._columns[name]
+
+    @staticmethod
+    def _decode(offsets, blob, start, end):
+        """offsets[start:end+1] 구간의 문자열들을 한 번에 디코딩"""
+        base = int(offsets[start])
+        chunk = bytes(blob[base:int(offsets[end])])
+        bounds = np.asarray(offsets[start:end + 1]) - base
+        return [chunk[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(end - start)]
+
+    def texts(self, name, start=0, end=None):
+        """텍스트 컬럼의 start~end 행 값 목록 (text_list 컬럼은 행마다 목록)"""
+        end = self.num_rows if end is None else end
+        kind = self.schema[name]
+        if kind == 'text':
+            offsets, blob = self.column(name)
+            return self._decode(offsets, blob, start, end)
+        offsets, blob, row_offsets = self.column(name)
+        item_start, item_end = int(row_offsets[start]), int(row_offsets[end])
+        items = self._decode(offsets, blob, item_start, item_end)
+        bounds = np.asarray(row_offsets[start:end + 1]) - item_start
+        return [items[bounds[i]:bounds[i + 1]] for i in range(end - start)]
+
+    def rows(self, start=0, end=None):
+        """start~end 행을 딕셔너리 목록으로 반환"""
+        end = self.num_rows if end is None else min(end, self.num_rows)
+        start = max(0, start)
+        if start >= end:
+            return []
+        columns = {}
+        for name, kind in self.schema.items():
+            if kind == 'float':
+                columns[name] = self.column(name)[start:end].tolist()
+            else:
+                columns[name] = self.texts(name, start, end)
+        return [
+            {name: columns[name][i] for name in self.schema}
+            for i in range(end - start)
+        ]
+
+    def time_range(self, start_time, end_time):
+        """시각 컬럼 값이 [start_time, end_time]인 행의 (시작, 끝) 인덱스"""
+        times = self.column(self.time_column)
+        lo = int(np.searchsorted(times, start_time, side='left'))
+        hi = int(np.searchsorted(times, end_time, side='right'))
+        return lo, hi
+
+    def slice_time(self, start_time, end_time):
+        """시각이 [start_time, end_time]인 행만 읽어서 반환"""
+        return self.rows(*self.time_range(start_time, end_time))
+
+    def to_records(self):
+        return self.rows()
+
+    def export_json(self, json_path):
+        """디버깅용 JSON 내보내기"""
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_records(), f, ensure_ascii=False, indent=4)
+
+
+def save_records(path, records, schema, attrs=None):
+    """
+    딕셔너리 목록을 저장 (.json 경로면 기존처럼 JSON, 아니면 컬럼형 저장소)
+    """
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=4)
+        return
+    columns = {name: [record[name] for record in records] for name in schema}
+    write_caption_store(path, columns, schema, attrs=attrs)
+
+
+def load_records(path):
+    """save_records로 저장한 딕셔너리 목록 읽기 (.json 또는 컬럼형 저장소)"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return CaptionStore(path).to_records()
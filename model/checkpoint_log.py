@@ -0,0 +1,82 @@
+import os
+import json
+import time
+
+# StageRunner가 단계를 이어서 실행할 때 지우지 않고 남겨두는 파일의 확장자
+CHECKPOINT_SUFFIX = '.ckpt'
+
+
+class CheckpointLog:
+    """
+    한 줄에 JSON 레코드 하나씩 이어 쓰는(append-only) 체크포인트 로그
+
+    레코드는 쓰자마자 flush하고, fsync_every개마다 또는 fsync_seconds가 지날 때마다 fsync해서
+    프로세스가 죽거나 노드가 선점되어도 그 전까지의 결과가 디스크에 남도록 함.
+    다시 열면 load()로 이전 레코드를 읽어 이미 끝난 작업을 건너뛸 수 있음.
+    """
+    def __init__(self, path, fsync_every=32, fsync_seconds=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def load(self):
+        """
+        지금까지 기록된 레코드 목록을 반환
+
+        마지막 줄이 쓰다가 끊긴 경우(줄바꿈 없음 또는 JSON 오류)에는 그 줄을 파일에서 잘라냄.
+        """
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(self.path):
+            print(f"[checkpoint] 끊긴 마지막 레코드를 버립니다: {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        return records
+
+    def append(self, record):
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.time() - self._last_sync >= self.fsync_seconds:
+            self.sync()
+
+    def sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """최종 결과를 저장한 뒤 더 필요 없는 로그 삭제"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,6 +1,10 @@
 import json
 import os
+import bisect
 from datetime import datetime, timedelta
+from caption_store import (
+    CaptionStore, MERGED_CAPTION_SCHEMA, load_records, save_records, to_seconds
+)
 
 def to_datetime(time_str):
     try:
@@ -12,53 +16,103 @@ def to_datetime(time_str):
     except ValueError:
         return datetime.strptime(time_str, '%H:%M:%S')
 
-def merge_captions(audio_caption, video_caption):
+def merge_captions(audio_caption, video_caption, include_gaps=True):
+    """
+    오디오 구간마다 그 구간 안(시작/끝 포함)에 있는 비디오 캡션을 묶어서 반환
+
+    두 목록의 시각을 한 번씩만 float 초로 바꾼 뒤, 정렬된 비디오 시각에서 bisect로 구간을 찾음 (O((N+M) log M)).
+    include_gaps가 True면 어떤 오디오 구간에도 속하지 않는 비디오 캡션(대사 사이 공백)을
+    audio_caption이 빈 항목으로 시간 순서에 맞게 끼워 넣음.
+    """
+    video = sorted(
+        ((to_seconds(video['time']), video['caption']) for video in video_caption),
+        key=lambda item: item[0]
+    )
+    video_times = [t for t, _ in video]
+    video_texts = [caption for _, caption in video]
+
     merged_data = []
+    # 어떤 오디오 구간에든 포함된 비디오 캡션을 표시하기 위한 차분 배열
+    coverage = [0] * (len(video) + 1)
 
     for audio in audio_caption:
-        start_time = to_datetime(str(audio['start_formatted']))  # 수정된 부분
-        end_time = to_datetime(str(audio['end_formatted']))      # 수정된 부분
+        start_time = to_seconds(audio['start_formatted'])
+        end_time = to_seconds(audio['end_formatted'])
 
-        relevant_videos = [
-            video['caption']
-            for video in video_caption
-            if start_time <= to_datetime(str(video['time']))     # 수정된 부분
-            <= end_time
-        ]
+        lo = bisect.bisect_left(video_times, start_time)
+        hi = bisect.bisect_right(video_times, end_time)
+        if lo < hi:
+            coverage[lo] += 1
+            coverage[hi] -= 1
 
         merged_entry = {
             'time': audio['start_formatted'],
             'audio_caption': audio['text'],
-            'video_caption': relevant_videos
+            'video_caption': video_texts[lo:hi]
         }
 
         merged_data.append(merged_entry)
 
-    return merged_data
+    if not include_gaps:
+        return merged_data
+
+    audio_starts = sorted(to_seconds(audio['start_formatted']) for audio in audio_caption)
+    gap_entries = []
+    last_gap = None  # (마지막으로 추가한 캡션 인덱스, 그 앞에서 시작한 오디오 구간 수)
+    covered = 0
+    for idx in range(len(video)):
+        covered += coverage[idx]
+        if covered:
+            continue
+        # 바로 앞 캡션도 같은 공백 구간(사이에 시작한 오디오 구간 없음)이었다면 같은 항목에 이어 붙임
+        gap_slot = bisect.bisect_right(audio_starts, video_times[idx])
+        if last_gap == (idx - 1, gap_slot):
+            gap_entries[-1]['video_caption'].append(video_texts[idx])
+        else:
+            gap_entries.append({
+                'time': video_times[idx],
+                'audio_caption': '',
+                'video_caption': [video_texts[idx]]
+            })
+        last_gap = (idx, gap_slot)
+
+    # 오디오 항목과 공백 항목을 시작 시각 순서로 합침 (같은 시각이면 오디오 항목이 먼저)
+    entries = [(to_seconds(entry['time']), 0, i, entry) for i, entry in enumerate(merged_data)]
+    entries += [(entry['time'], 1, i, entry) for i, entry in enumerate(gap_entries)]
+    entries.sort(key=lambda item: item[:3])
+    return [entry for *_, entry in entries]
 
 def save_merged_data(merged_data, output_path):
     with open(output_path, 'w') as file:
         json.dump(merged_data, file, indent=4)
         
+def load_audio_segments(audio_caption_path):
+    """Whisper 결과 JSON 또는 오디오 캡션 저장소에서 segment 목록(start/end/text)을 읽음"""
+    if audio_caption_path.endswith('.json'):
+        with open(audio_caption_path, 'r') as file:
+            return json.loads(file.read())['segments']
+    return CaptionStore(audio_caption_path).to_records()
+
 def concat_captions(audio_caption_path, video_caption_path, output_path):
-    with open(audio_caption_path, 'r') as file:
-        audio_caption_data = json.loads(file.read())
-        audio_caption = [
-            {
-                'start_formatted': entry['start'],  # 수정된 부분
-                'end_formatted': entry['end'],      # 수정된 부분
-                'text': entry['text']
-            }
-            for entry in audio_caption_data['segments']
-        ]
-    
-    with open(video_caption_path, 'r') as file:
-        video_caption = json.loads(file.read())
+    """
+    오디오/비디오 캡션을 병합해서 저장
+
+    입력은 .json 파일이나 caption_store 저장소 모두 가능하고,
+    output_path가 .json으로 끝나면 JSON, 아니면 컬럼형 저장소로 저장함.
+    """
+    audio_caption = [
+        {
+            'start_formatted': entry['start'],  # 수정된 부분
+            'end_formatted': entry['end'],      # 수정된 부분
+            'text': entry['text']
+        }
+        for entry in load_audio_segments(audio_caption_path)
+    ]
+    video_caption = load_records(video_caption_path)
 
     merged_data = merge_captions(audio_caption, video_caption)
-    save_merged_data(merged_data, output_path)
+    if output_path.endswith('.json'):
+        save_merged_data(merged_data, output_path)
+    else:
+        save_records(output_path, merged_data, MERGED_CAPTION_SCHEMA)
     print(f"병합된 데이터가 {output_path}에 저장되었습니다.")
-    
-    
-    
-
@@ -1,29 +1,92 @@
 import json
 import subprocess
 import os
-import datetime
-from prompt import get_funny_timestamps, load_json, convert_timestamp_to_seconds
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from prompt import convert_timestamp_to_seconds
+from keyframe_index import load_keyframe_index, smart_cut
 
-def cut_video(timestamp_pair, input_video_path, clip_output_dir, title):
-    """시작-끝 타임스탬프 쌍을 사용하여 비디오 자르기"""
+
+def clip_filename(title, start_time, end_time, index=None):
+    """제목/구간으로 클립 파일 이름 생성 (파일 이름에 쓸 수 없는 문자는 '_'로 바꿈)"""
+    safe_title = re.sub(r'[^\w.-]+', '_', str(title or 'clip')).strip('_') or 'clip'
+    prefix = f"{safe_title}_{index:02d}" if index is not None else safe_title
+    return f"{prefix}_{start_time:.2f}-{end_time:.2f}.mp4"
+
+
+def reserve_output_path(clip_output_dir, filename):
+    """
+    같은 이름의 파일이 있으면 '_1', '_2'...를 붙여 겹치지 않는 경로를 만들고 빈 파일로 선점
+
+    O_EXCL로 만들기 때문에 여러 작업이 동시에 같은 이름을 골라도 서로 덮어쓰지 않음.
+    """
+    stem, ext = os.path.splitext(filename)
+    suffix = 0
+    while True:
+        path = os.path.join(clip_output_dir, f"{stem}_{suffix}{ext}" if suffix else filename)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return path
+        except FileExistsError:
+            suffix += 1
+
+
+def parse_clip_range(timestamp_pair):
+    """(시작, 끝) 타임스탬프 쌍을 초 단위 (시작, 끝)으로 변환 (형식이 잘못됐거나 끝이 시작보다 앞이면 None)"""
+    try:
+        start_time = convert_timestamp_to_seconds(timestamp_pair[0])
+        end_time = convert_timestamp_to_seconds(timestamp_pair[1])
+    except (ValueError, TypeError, IndexError, AttributeError):
+        return None
+    return (start_time, end_time) if end_time > start_time else None
+
+
+def cut_video(timestamp_pair, input_video_path, clip_output_dir, title, index=None, keyframe_index=None):
+    """
+    시작-끝 타임스탬프 쌍을 사용하여 비디오 자르기
+
+    -ss를 -i 앞에 두어(입력 탐색) ffmpeg가 시작 지점 근처 키프레임으로 바로 이동하고,
+    -t로 길이만큼만 스트림 복사함. 클립 길이는 키프레임 위치에 따라 조금 달라질 수 있음.
+    keyframe_index를 넘기면 경계 GOP만 다시 인코딩하는 smart cut으로 프레임 단위까지 정확하게 자름.
+
+    Args:
+        timestamp_pair: (시작, 끝) - 'HH:MM:SS' 문자열 또는 초 단위 숫자
+        title: 출력 파일 이름 앞부분 (예: 비디오 제목)
+        index: 지정하면 파일 이름에 클립 번호를 붙임
+        keyframe_index: keyframe_index.load_keyframe_index 결과 (None이면 스트림 복사)
+    """
     # HH:MM:SS 형식의 시작/끝 시간을 초 단위로 변환
-    start_time = convert_timestamp_to_seconds(timestamp_pair[0])
-    end_time = convert_timestamp_to_seconds(timestamp_pair[1])
-    
+    clip_range = parse_clip_range(timestamp_pair)
+    if clip_range is None:
+        print(f"잘못된 구간이라 건너뜁니다: {timestamp_pair}")
+        return None
+    start_time, end_time = clip_range
+
     # 출력 디렉토리 생성 (없을 경우)
     os.makedirs(clip_output_dir, exist_ok=True)
+    output_filepath = reserve_output_path(clip_output_dir, clip_filename(title, start_time, end_time, index))
 
-    # 파일 이름 포맷팅 및 저장 경로 설정
-    output_filename = f"home_alone_{start_time}_{end_time}.mp4"
-    output_filepath = os.path.join(clip_output_dir, output_filename)
+    if keyframe_index is not None:
+        try:
+            smart_cut(keyframe_index, input_video_path, start_time, end_time, output_filepath)
+            print(f"비디오가 {output_filepath}에 저장되었습니다.")
+            return output_filepath
+        except subprocess.CalledProcessError as e:
+            print(f"비디오 자르기 실패: {e.stderr.decode(errors='replace').strip() or e}")
+            if os.path.exists(output_filepath):
+                os.remove(output_filepath)
+            return None
 
     # ffmpeg 명령어 생성
     command = [
-        'ffmpeg',
+        'ffmpeg', '-v', 'error', '-y',
+        '-ss', f"{start_time:.3f}",
         '-i', input_video_path,
-        '-ss', str(start_time),
-        '-to', str(end_time),
+        '-t', f"{end_time - start_time:.3f}",
         '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero',
         output_filepath
     ]
 
@@ -33,40 +96,364 @@ def cut_video(timestamp_pair, input_video_path, clip_output_dir, title):
         print(f"비디오가 {output_filepath}에 저장되었습니다.")
         return output_filepath
     except subprocess.CalledProcessError as e:
-        print(f"비디오 자르기 실패: {e}")
+        print(f"비디오 자르기 실패: {e.stderr.decode(errors='replace').strip() or e}")
+        if os.path.exists(output_filepath):
+            os.remove(output_filepath)
         return None
 
-def process_funny_timestamps(funny_timestamps_json, input_video_path, clip_output_dir):
-    """funny_timestamps.json 파일을 처리하여 비디오 클립 생성"""
+
+def cut_clips(timestamp_pairs, input_video_path, clip_output_dir, title, max_workers=None, keyframe_index=None):
+    """
+    여러 구간을 최대 max_workers개의 ffmpeg 프로세스로 동시에 자름 (keyframe_index를 넘기면 smart cut)
+
+    Returns:
+        timestamp_pairs와 같은 순서의 출력 경로 목록 (실패한 구간은 None)
+    """
+    max_workers = max_workers or min(4, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(cut_video, pair, input_video_path, clip_output_dir, title, index, keyframe_index)
+            for index, pair in enumerate(timestamp_pairs, 1)
+        ]
+        return [future.result() for future in futures]
+
+
+def parse_clip_ranges(timestamp_pairs):
+    """
+    타임스탬프 쌍들을 초 단위 구간으로 변환
+
+    Returns:
+        (유효한 구간 [(클립 번호, 시작 초, 끝 초), ...], 잘못된 구간의 클립 번호 목록) - 클립 번호는 1부터
+    """
+    clips, invalid = [], []
+    for index, pair in enumerate(timestamp_pairs, 1):
+        clip_range = parse_clip_range(pair)
+        if clip_range is None:
+            invalid.append(index)
+        else:
+            clips.append((index, *clip_range))
+    return clips, invalid
+
+
+def merge_clip_ranges(clips):
+    """
+    (클립 번호, 시작, 끝) 구간들을 시작 순서로 정렬하고 겹치는 구간을 하나로 합침
+
+    Returns:
+        [(시작 초, 끝 초, [포함된 클립 번호, ...]), ...] - 시작 순서
+    """
+    merged = []
+    for index, start_time, end_time in sorted(clips, key=lambda clip: (clip[1], clip[2])):
+        if merged and start_time < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end_time)
+            merged[-1][2].append(index)
+        else:
+            merged.append([start_time, end_time, [index]])
+    return [(start_time, end_time, indices) for start_time, end_time, indices in merged]
+
+
+def probe_keyframes(input_video_path, times, window_seconds=30.0):
+    """
+    각 시각 앞뒤 window_seconds 구간에 있는 비디오 키프레임 시각 (오름차순)
+
+    ffprobe -read_intervals로 해당 구간의 패킷만 읽으므로 파일 전체를 읽지 않음.
+    ffprobe가 없거나 실패하면 예외(FileNotFoundError, CalledProcessError)를 그대로 올림.
+    """
+    if not times:
+        return []
+    intervals = ",".join(f"{max(0.0, t - window_seconds):.3f}%{t + window_seconds:.3f}" for t in times)
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-read_intervals', intervals,
+         '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    keyframes = set()
+    for line in result.stdout.decode().splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.add(float(pts_time))
+    return sorted(keyframes)
+
+
+def snap_clip_ranges(groups, keyframes, window_seconds=None):
+    """
+    합친 구간의 시작을 그 앞(같거나 이전) 키프레임으로, 끝을 그 뒤(같거나 이후) 키프레임으로 넓히고 다시 합침
+
+    스트림 복사는 키프레임에서만 시작할 수 있으므로 각 클립을 온전한 GOP 단위로 만듦.
+    window_seconds를 넘기면 keyframes가 각 시각 앞뒤 그 범위까지만 확인된 목록이라고 보고, 범위 밖의 키프레임은 쓰지 않음.
+
+    Args:
+        groups: merge_clip_ranges 결과 [(시작, 끝, [클립 번호, ...]), ...]
+        keyframes: 키프레임 시각 (오름차순)
+
+    Returns:
+        [(시작 키프레임, 끝 키프레임 또는 None(파일 끝까지), [클립 번호, ...]), ...]
+
+    Raises:
+        ValueError: 시작 앞 키프레임이나 (마지막이 아닌 구간의) 끝 뒤 키프레임을 찾지 못한 경우
+    """
+    keyframes = np.asarray(keyframes, dtype=np.float64)
+    snapped = []
+    for group_idx, (start_time, end_time, indices) in enumerate(groups):
+        idx = np.searchsorted(keyframes, start_time + 1e-6, side='right') - 1
+        if idx < 0 or (window_seconds is not None and start_time - keyframes[idx] > window_seconds):
+            raise ValueError(f"{start_time:.3f}초 앞의 키프레임을 찾지 못했습니다")
+        key_start = float(keyframes[idx])
+        idx = np.searchsorted(keyframes, end_time - 1e-6, side='left')
+        key_end = float(keyframes[idx]) if idx < len(keyframes) else None
+        if key_end is not None and window_seconds is not None and key_end - end_time > window_seconds:
+            key_end = None
+        if key_end is None and group_idx < len(groups) - 1:
+            raise ValueError(f"{end_time:.3f}초 뒤의 키프레임을 찾지 못했습니다")
+
+        if snapped and key_start < snapped[-1][1]:
+            snapped[-1][1] = key_end if key_end is None else max(snapped[-1][1], key_end)
+            snapped[-1][2].extend(indices)
+        else:
+            snapped.append([key_start, key_end, list(indices)])
+    return [(key_start, key_end, indices) for key_start, key_end, indices in snapped]
+
+
+def _previous_keyframe(keyframe_time, keyframes, window_seconds=None):
+    """
+    keyframe_time 바로 앞 키프레임 시각 (파일의 첫 키프레임이면 None)
+
+    Raises:
+        ValueError: window_seconds 범위 안에서 앞 키프레임을 확인하지 못한 경우 (GOP가 확인 범위보다 긺)
+    """
+    keyframes = np.asarray(keyframes, dtype=np.float64)
+    idx = np.searchsorted(keyframes, keyframe_time - 1e-6, side='left') - 1
+    if idx >= 0 and (window_seconds is None or keyframe_time - keyframes[idx] <= window_seconds):
+        return float(keyframes[idx])
+    if window_seconds is None or keyframe_time <= window_seconds:
+        return None
+    raise ValueError(f"{keyframe_time:.3f}초 앞의 키프레임을 찾지 못했습니다")
+
+
+def probe_clip(clip_path):
+    """
+    클립의 영상/소리 시작 시각과 영상 프레임 수 (패킷 수를 세므로 디코딩하지 않음)
+
+    Returns:
+        {'video_start', 'audio_start'(소리가 없으면 None), 'frames', 'frame_rate'}
+    """
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-count_packets',
+         '-show_entries', 'stream=codec_type,start_time,nb_read_packets,r_frame_rate', '-of', 'json', clip_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    streams = json.loads(result.stdout).get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    num, _, den = str(video.get('r_frame_rate') or '0/1').partition('/')
+    return {
+        'video_start': float(video.get('start_time') or 0.0),
+        'audio_start': float(audio.get('start_time') or 0.0) if audio else None,
+        'frames': int(video.get('nb_read_packets') or 0),
+        'frame_rate': float(num) / float(den) if float(den or 0) else 0.0,
+    }
+
+
+def check_clip(clip_path, start_time, end_time, expected_frames=None):
+    """
+    자른 클립의 영상과 소리가 같은 시각에서 시작하고 프레임 수가 구간과 맞는지 확인
+
+    expected_frames가 없으면 프레임레이트로 구간 길이에서 계산하고 한 프레임까지 차이를 허용함.
+
+    Returns:
+        문제가 없으면 None, 있으면 이유 문자열
+    """
+    info = probe_clip(clip_path)
+    frame_time = 1.0 / info['frame_rate'] if info['frame_rate'] else 0.05
+    if info['audio_start'] is not None and abs(info['video_start'] - info['audio_start']) > frame_time:
+        return f"영상({info['video_start']:.3f}초)과 소리({info['audio_start']:.3f}초)의 시작 시각이 다릅니다"
+    if end_time is None:
+        return None
+    if expected_frames is not None:
+        if info['frames'] != expected_frames:
+            return f"프레임 수가 {info['frames']}개로 구간의 {expected_frames}개와 다릅니다"
+    elif abs(info['frames'] * frame_time - (end_time - start_time)) > frame_time:
+        return f"프레임 수 {info['frames']}개가 구간 길이 {end_time - start_time:.3f}초와 맞지 않습니다"
+    return None
+
+
+def _clip_results_from_paths(timestamp_pairs, clips, output_paths):
+    """cut_clips 결과(구간별 출력 경로)를 cut_clips_single_pass와 같은 클립별 결과 형식으로 변환"""
+    ranges = {index: (start_time, end_time) for index, start_time, end_time in clips}
+    results = []
+    for index, output_path in enumerate(output_paths, 1):
+        status = 'invalid' if index not in ranges else ('ok' if output_path else 'failed')
+        results.append({'index': index, 'range': ranges.get(index), 'cut_range': ranges.get(index),
+                        'output': output_path, 'status': status, 'merged_with': []})
+    return results
+
+
+def cut_clips_single_pass(timestamp_pairs, input_video_path, clip_output_dir, title, keyframe_index=None,
+                          keyframe_window_seconds=30.0):
+    """
+    여러 구간을 ffmpeg 한 번 실행으로 원본을 한 번만 읽으며 자름
+
+    구간을 시작 순서로 정렬해 겹치는 구간은 하나의 클립으로 합치고, 각 클립의 시작/끝을 바깥쪽 키프레임으로 넓힘.
+    첫 클립의 시작 키프레임으로 입력 탐색한 뒤 segment muxer로 키프레임 경계마다 파일을 나눠 스트림 복사하고,
+    클립 사이 구간의 조각은 지움. 모든 출력이 키프레임에서 시작하므로 영상과 소리가 같은 시각에서 시작함.
+    keyframe_index를 넘기면 캐시된 키프레임 위치를, 아니면 ffprobe로 경계 근처 키프레임만 확인해서 사용하고,
+    키프레임을 확인할 수 없으면 클립별로 자르는 cut_clips로 넘어감.
+    잘린 클립은 check_clip으로 확인하고, 맞지 않는 클립은 cut_video로 다시 자름.
+
+    Returns:
+        timestamp_pairs와 같은 순서의 클립별 결과
+        [{'index', 'range', 'cut_range', 'output', 'status': 'ok'|'failed'|'invalid', 'merged_with'}, ...]
+        (cut_range: 키프레임에 맞춰 실제로 자른 구간, 끝이 None이면 파일 끝까지)
+    """
+    clips, _ = parse_clip_ranges(timestamp_pairs)
+    results = {
+        index: {'index': index, 'range': None, 'cut_range': None, 'output': None, 'status': 'invalid',
+                'merged_with': []}
+        for index in range(1, len(timestamp_pairs) + 1)
+    }
+    for index, start_time, end_time in clips:
+        results[index]['range'] = (start_time, end_time)
+    groups = merge_clip_ranges(clips)
+
+    if groups:
+        try:
+            if keyframe_index is not None:
+                keyframes, window_seconds = keyframe_index.keyframes, None
+            else:
+                keyframes = probe_keyframes(input_video_path, [t for start_time, end_time, _ in groups
+                                                               for t in (start_time, end_time)],
+                                            keyframe_window_seconds)
+                window_seconds = keyframe_window_seconds
+            segments = snap_clip_ranges(groups, keyframes, window_seconds)
+
+            # 키프레임 경계 목록: 첫 경계는 입력 탐색 위치, 이후 경계마다 segment muxer가 새 파일을 시작함.
+            # segment muxer는 첫 조각의 시각을 0으로 맞추지 않으므로 첫 클립 앞 GOP 하나부터 읽어 버릴 조각으로 만듦
+            first_previous = _previous_keyframe(segments[0][0], keyframes, window_seconds)
+            boundaries = [segments[0][0]] if first_previous is None else [first_previous, segments[0][0]]
+            segment_of_clip = []
+            for key_start, key_end, _ in segments:
+                if key_start != boundaries[-1]:
+                    boundaries.append(key_start)
+                segment_of_clip.append(len(boundaries) - 1)
+                if key_end is not None:
+                    boundaries.append(key_end)
+            # segment muxer는 첫 패킷 시각부터 잰 기준 시각을 넘은 첫 키프레임에서 나누므로, 경계마다 바로 앞
+            # 키프레임과의 가운데를 기준으로 줌 (소리 패킷이 영상보다 조금 먼저 나와도 같은 키프레임에서 나뉨)
+            segment_times = [(_previous_keyframe(t, keyframes, window_seconds) + t) / 2 - boundaries[0]
+                             for t in boundaries[1:]]
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+            print(f"키프레임 확인 실패, 클립별로 자릅니다: {e}")
+            return _clip_results_from_paths(
+                timestamp_pairs, clips, cut_clips(timestamp_pairs, input_video_path, clip_output_dir, title))
+
+        os.makedirs(clip_output_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=clip_output_dir) as segment_dir:
+            command = ['ffmpeg', '-v', 'error', '-y', '-ss', f"{boundaries[0]:.6f}", '-copyts',
+                       '-i', input_video_path, '-map', '0:v:0', '-map', '0:a:0?', '-c', 'copy']
+            if segments[-1][1] is not None:
+                # 마지막 클립 끝 키프레임 조금 뒤까지만 읽음 (그 뒤 조각은 버림)
+                command += ['-to', f"{segments[-1][1] + 0.1:.6f}"]
+            if segment_times:
+                command += ['-segment_times', ",".join(f"{t:.6f}" for t in segment_times)]
+            command += ['-f', 'segment', '-segment_format', 'mp4', '-reset_timestamps', '1',
+                        os.path.join(segment_dir, '%05d.mp4')]
+
+            try:
+                subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            except subprocess.CalledProcessError as e:
+                print(f"비디오 자르기 실패: {e.stderr.decode(errors='replace').strip() or e}")
+
+            # ffmpeg가 중간에 실패해도 이미 다 쓴 클립은 살리고, 비었거나 확인에 실패한 클립만 다시 자름
+            for clip_idx, (key_start, key_end, indices) in enumerate(segments, 1):
+                end_time = key_end if key_end is not None else max(results[index]['range'][1] for index in indices)
+                segment_path = os.path.join(segment_dir, f"{segment_of_clip[clip_idx - 1]:05d}.mp4")
+                output_filepath = None
+                if os.path.exists(segment_path) and os.path.getsize(segment_path) > 0:
+                    expected_frames = (keyframe_index.frame_count(key_start, key_end)
+                                      if keyframe_index is not None and key_end is not None else None)
+                    problem = check_clip(segment_path, key_start, key_end, expected_frames)
+                    if problem is None:
+                        output_filepath = reserve_output_path(
+                            clip_output_dir, clip_filename(title, key_start, end_time, clip_idx))
+                        os.replace(segment_path, output_filepath)
+                    else:
+                        print(f"[클립 {min(indices)}] {problem}, 이 클립만 다시 자릅니다")
+                if output_filepath is None:
+                    output_filepath = cut_video((key_start, end_time), input_video_path, clip_output_dir, title,
+                                                clip_idx)
+                for index in indices:
+                    results[index].update({
+                        'cut_range': (key_start, key_end),
+                        'output': output_filepath,
+                        'status': 'ok' if output_filepath else 'failed',
+                        'merged_with': sorted(other for other in indices if other != index),
+                    })
+
+    for index in sorted(results):
+        result = results[index]
+        if result['status'] == 'ok':
+            merged = f" (겹치는 클립 {result['merged_with']}과 합침)" if result['merged_with'] else ""
+            print(f"[클립 {index}] {result['range']} -> {result['output']}{merged}")
+        elif result['status'] == 'invalid':
+            print(f"[클립 {index}] 잘못된 구간이라 건너뜁니다: {timestamp_pairs[index - 1]}")
+        else:
+            print(f"[클립 {index}] {result['range']} 자르기 실패")
+    return [results[index] for index in sorted(results)]
+
+
+def process_funny_timestamps(funny_timestamps_json, input_video_path, clip_output_dir, title=None, max_workers=None,
+                             single_pass=False, frame_accurate=False, keyframe_cache_dir=None):
+    """
+    funny_timestamps.json 파일을 처리하여 비디오 클립 생성
+
+    Args:
+        title: 클립 파일 이름 앞부분 (None이면 입력 비디오 파일 이름)
+        max_workers: 동시에 실행할 ffmpeg 프로세스 수 (None이면 CPU 수, 최대 4)
+        single_pass: True면 모든 클립을 ffmpeg 한 번 실행으로 원본을 한 번만 읽으며 자름 (겹치는 구간은 합침)
+        frame_accurate: True면 클립마다 경계 GOP만 다시 인코딩하는 smart cut으로 프레임 단위까지 정확하게 자름
+                        (클립별 작업이라 single_pass는 무시됨)
+        keyframe_cache_dir: 키프레임/패킷 인덱스 캐시 폴더 (single_pass는 캐시에 이미 있으면 그 키프레임 위치를 사용)
+    """
+    if title is None:
+        title = os.path.splitext(os.path.basename(input_video_path))[0]
     try:
         # JSON 파일 로드
         with open(funny_timestamps_json, 'r', encoding='utf-8') as f:
             timestamps_data = json.load(f)
-        
+
         # full_timestamps 리스트 가져오기
         full_timestamps = timestamps_data.get('full_timestamps', [])
-        
+
         if not full_timestamps:
             print("타임스탬프 데이터가 없습니다.")
             return []
-        
-        # 각 타임스탬프 쌍에 대해 비디오 자르기 실행
-        output_files = []
-        for pair in full_timestamps:
-            output_file = cut_video(
-                pair,
-                input_video_path,
-                clip_output_dir,
-                title
-            )
-            if output_file:
-                output_files.append(output_file)
-        
+
+        keyframe_index = None
+        if frame_accurate or keyframe_cache_dir:
+            # smart cut은 전체 인덱스가 필요하지만, single pass는 캐시에 이미 있을 때만 씀
+            # (없으면 파일 전체를 스캔하지 않고 클립 경계 근처의 키프레임만 ffprobe로 확인)
+            try:
+                keyframe_index = load_keyframe_index(input_video_path, keyframe_cache_dir, build=frame_accurate)
+            except (subprocess.CalledProcessError, OSError, ValueError) as e:
+                print(f"키프레임 인덱스를 만들지 못해 스트림 복사로 자릅니다: {e}")
+                frame_accurate = False
+
+        if single_pass and not frame_accurate:
+            results = cut_clips_single_pass(full_timestamps, input_video_path, clip_output_dir, title,
+                                            keyframe_index=keyframe_index)
+            # 합쳐진 클립은 같은 파일을 가리키므로 한 번만 포함
+            output_files = list(dict.fromkeys(result['output'] for result in results if result['output']))
+        else:
+            # 각 타임스탬프 쌍을 작업 풀에서 동시에 자름
+            results = cut_clips(full_timestamps, input_video_path, clip_output_dir, title, max_workers=max_workers,
+                                keyframe_index=keyframe_index if frame_accurate else None)
+            output_files = [output_file for output_file in results if output_file]
+
         print(f"총 {len(output_files)}개의 클립이 생성되었습니다.")
         return output_files
-        
-    except FileNotFoundError:
-        print(f"파일을 찾을 수 없습니다: {funny_timestamps_json}")
+
+    except FileNotFoundError as e:
+        print(f"파일을 찾을 수 없습니다: {e.filename or funny_timestamps_json}")
         return []
     except json.JSONDecodeError:
         print(f"JSON 파일 형식이 잘못되었습니다: {funny_timestamps_json}")
@@ -74,4 +461,3 @@ def process_funny_timestamps(funny_timestamps_json, input_video_path, clip_outpu
     except Exception as e:
         print(f"처리 중 오류 발생: {e}")
         return []
-
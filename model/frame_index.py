@@ -0,0 +1,328 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import threading
+import cv2
+import numpy as np
+import torch
+from transformers import CLIPModel, CLIPProcessor
+from caption_store import load_records, to_seconds
+from inference_device import prepare_model, resolve_device
+from model_registry import registry
+
+# CPU에서도 돌릴 수 있는 작은 이미지-텍스트 모델 (512차원)
+CLIP_MODEL_ID = "openai/clip-vit-base-patch32"
+FRAME_INDEX_VERSION = 1
+
+
+def load_clip_model(device="cpu", quantize=False, num_threads=None):
+    """CLIP 모델 로드 (model_registry를 통해 한 번만 로드)"""
+    device = resolve_device(device)
+
+    def load():
+        processor = CLIPProcessor.from_pretrained(CLIP_MODEL_ID)
+        model = CLIPModel.from_pretrained(CLIP_MODEL_ID)
+        return processor, prepare_model(model, device, quantize=quantize, num_threads=num_threads)
+
+    return registry.get(f"{CLIP_MODEL_ID}:{device}:{'int8' if quantize else 'fp32'}", load)
+
+
+def _normalize(features):
+    return torch.nn.functional.normalize(features, dim=-1).float().cpu().numpy()
+
+
+def encode_images(pixel_values, model):
+    """전처리된 pixel_values 배치를 L2 정규화된 float32 임베딩 (N, D)으로 변환"""
+    device = next(model.parameters()).device
+    with torch.inference_mode():
+        return _normalize(model.get_image_features(pixel_values=pixel_values.to(device)))
+
+
+def encode_text_queries(texts, processor, model):
+    """질의 문장들을 이미지 임베딩과 같은 공간의 L2 정규화된 float32 임베딩 (N, D)으로 변환"""
+    device = next(model.parameters()).device
+    inputs = processor(text=texts, return_tensors="pt", padding=True, truncation=True).to(device)
+    with torch.inference_mode():
+        return _normalize(model.get_text_features(**inputs))
+
+
+def quantize_embeddings(embeddings):
+    """
+    행마다 절댓값 최대를 127로 맞춰 int8로 양자화
+
+    Returns:
+        (int8 (N, D), 행별 scale float32 (N,)) - 원래 값은 대략 q * scale
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scales = np.abs(embeddings).max(axis=1) / 127.0 if len(embeddings) else np.zeros(0, dtype=np.float32)
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    quantized = np.clip(np.round(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def read_frames_at(input_video_path, timestamps, tolerance_seconds=0.05):
+    """
+    정렬된 timestamps(초)마다 그 시각 이후 첫 프레임을 (시각, RGB 배열)로 반환하는 제너레이터
+
+    video_caption이 캡셔닝한 프레임과 같은 프레임을 다시 꺼내기 위해 사용.
+    필요 없는 프레임은 grab()만 하고 이미지로 꺼내지 않음.
+    """
+    cap = cv2.VideoCapture(input_video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    targets = iter(timestamps)
+    target = next(targets, None)
+    frame_idx = 0
+    try:
+        while target is not None and cap.grab():
+            position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if position <= 0 and frame_idx > 0:
+                position = frame_idx / fps
+            frame_idx += 1
+            if position + tolerance_seconds < target:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # 샘플 간격이 프레임 간격보다 짧으면 같은 프레임이 여러 시각에 쓰일 수 있음
+            while target is not None and position + tolerance_seconds >= target:
+                yield target, frame
+                target = next(targets, None)
+    finally:
+        cap.release()
+
+
+_END = object()
+
+
+def embed_frames(frames, processor, model, batch_size=32, queue_size=4, stats=None):
+    """
+    (시각, RGB 배열)을 batch_size씩 묶어 (시각 배열, float32 임베딩)을 순서대로 반환하는 제너레이터
+
+    디코딩/전처리는 별도 스레드에서 하고, 크기가 queue_size인 큐로 모델 추론과 겹쳐서 실행함.
+    """
+    if stats is None:
+        stats = {}
+    stats.update({'decode_preprocess': 0.0, 'inference': 0.0, 'frames': 0})
+    ready_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    errors = []
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                ready_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        timestamps, images = [], []
+        try:
+            start = time.time()
+            for timestamp, frame in frames:
+                timestamps.append(timestamp)
+                images.append(frame)
+                if len(images) >= batch_size:
+                    pixel_values = processor(images=images, return_tensors="pt")["pixel_values"]
+                    stats['decode_preprocess'] += time.time() - start
+                    if not put((timestamps, pixel_values)):
+                        return
+                    timestamps, images = [], []
+                    start = time.time()
+            if images:
+                pixel_values = processor(images=images, return_tensors="pt")["pixel_values"]
+                stats['decode_preprocess'] += time.time() - start
+                put((timestamps, pixel_values))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(_END)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = ready_queue.get()
+            if errors:
+                raise errors[0]
+            if item is _END:
+                break
+            timestamps, pixel_values = item
+            start = time.time()
+            embeddings = encode_images(pixel_values, model)
+            stats['inference'] += time.time() - start
+            stats['frames'] += len(timestamps)
+            yield np.asarray(timestamps, dtype=np.float64), embeddings
+    finally:
+        stop_event.set()
+        thread.join(timeout=1)
+
+
+def write_frame_index(index_dir, times, embeddings, meta=None):
+    """
+    프레임 시각과 float32 임베딩을 int8로 양자화해서 인덱스 폴더로 저장
+
+    index_dir/
+        embeddings.npy  - int8 (N, D), 검색할 때 메모리 매핑으로 열림
+        scales.npy      - 행별 scale float32 (N,)
+        times.npy       - 프레임 시각 (초) float64 (N,), 오름차순
+        meta.json       - 모델 ID, 차원, 프레임 수
+    """
+    quantized, scales = quantize_embeddings(embeddings)
+    tmp_dir = f"{index_dir}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'embeddings.npy'), quantized)
+    np.save(os.path.join(tmp_dir, 'scales.npy'), scales)
+    np.save(os.path.join(tmp_dir, 'times.npy'), np.asarray(times, dtype=np.float64))
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': FRAME_INDEX_VERSION,
+            'model_id': CLIP_MODEL_ID,
+            'dim': int(quantized.shape[1]) if quantized.ndim == 2 else 0,
+            'num_frames': len(quantized),
+            **(meta or {}),
+        }, f, ensure_ascii=False, indent=2)
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir)
+    os.replace(tmp_dir, index_dir)
+    return index_dir
+
+
+def build_frame_index(input_video_path, video_caption_path, index_dir, device="cpu", batch_size=32, quantize=False,
+                      num_threads=None, stats=None):
+    """
+    video_caption이 캡셔닝한 프레임(같은 시각)을 CLIP으로 임베딩해서 프레임 검색 인덱스를 만듦
+
+    캡션 단계와 따로 캐시되는 단계라서 비디오를 OpenCV로 한 번 더 디코딩함 (필요한 시각의 프레임만 꺼내고
+    나머지는 grab()만 함). 캡션 단계 안에서 같이 임베딩하면 이 디코딩은 없어지지만, CLIP 모델과 이 단계의
+    설정이 video_caption 단계의 키에 들어가서 프레임 인덱스를 켜고 끌 때마다 BLIP 캡셔닝을 다시 하게 됨.
+
+    Args:
+        video_caption_path: video_caption 단계 결과 (.json 또는 caption_store 저장소), 프레임 시각을 가져옴
+        quantize: CPU에서 CLIP Linear 레이어를 int8 동적 양자화할지 여부 (저장되는 임베딩은 항상 int8)
+        stats: 지정하면 {'decode_preprocess', 'inference', 'frames', 'build_seconds'} 소요 시간/프레임 수를 채움
+    """
+    timestamps = np.unique([to_seconds(record['time']) for record in load_records(video_caption_path)])
+    processor, model = load_clip_model(device, quantize=quantize, num_threads=num_threads)
+
+    start_time = time.time()
+    stats = {} if stats is None else stats
+    times, embeddings = [], []
+    for batch_times, batch_embeddings in embed_frames(read_frames_at(input_video_path, timestamps), processor, model,
+                                                      batch_size=batch_size, stats=stats):
+        times.append(batch_times)
+        embeddings.append(batch_embeddings)
+    elapsed = time.time() - start_time
+    dim = model.config.projection_dim
+    times = np.concatenate(times) if times else np.zeros(0)
+    embeddings = np.concatenate(embeddings) if embeddings else np.zeros((0, dim), dtype=np.float32)
+
+    write_frame_index(index_dir, times, embeddings, meta={'source': os.path.abspath(input_video_path)})
+    stats['build_seconds'] = time.time() - start_time
+    print(f"프레임 인덱스 생성 완료: 프레임 {len(times)}개, {len(times) / max(elapsed, 1e-9):.2f} frames/sec "
+          f"(디코딩+전처리 {stats['decode_preprocess']:.2f}초, 추론 {stats['inference']:.2f}초) -> {index_dir}")
+    return index_dir
+
+
+def merge_frame_hits(hits, gap_seconds=3.0, pad_seconds=1.0):
+    """
+    [(시각, 점수), ...]에서 gap_seconds 이내로 이어지는 프레임들을 한 구간으로 합침
+
+    Returns:
+        [(시작 초, 끝 초, 최고 점수, 프레임 수), ...] - 최고 점수 순서
+    """
+    ranges = []
+    for timestamp, score in sorted(hits):
+        if ranges and timestamp - ranges[-1][1] <= gap_seconds:
+            ranges[-1][1] = timestamp
+            ranges[-1][2] = max(ranges[-1][2], score)
+            ranges[-1][3] += 1
+        else:
+            ranges.append([timestamp, timestamp, score, 1])
+    return sorted(
+        [(max(0.0, start - pad_seconds), end + pad_seconds, score, count) for start, end, score, count in ranges],
+        key=lambda item: -item[2]
+    )
+
+
+class FrameIndex:
+    """
+    build_frame_index로 만든 인덱스 폴더를 열어 자유 문장으로 프레임을 검색
+
+    int8 임베딩은 메모리 매핑으로 열고 chunk 단위로만 float32로 바꿔 점수를 계산함.
+    """
+    def __init__(self, index_dir, device="cpu"):
+        self.index_dir = index_dir
+        self.device = device
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FRAME_INDEX_VERSION:
+            raise ValueError(f"지원하지 않는 프레임 인덱스 버전입니다: {self.meta.get('version')}")
+        self.embeddings = np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r')
+        self.scales = np.load(os.path.join(index_dir, 'scales.npy'))
+        self.times = np.load(os.path.join(index_dir, 'times.npy'))
+
+    def __len__(self):
+        return len(self.times)
+
+    def encode_query(self, query):
+        processor, model = load_clip_model(self.device)
+        return encode_text_queries([query], processor, model)[0]
+
+    def scores(self, query_vector, chunk_rows=65536):
+        """모든 프레임과 질의 벡터의 코사인 유사도 (int8 내적 * 행별 scale)"""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        scores = np.empty(len(self.embeddings), dtype=np.float32)
+        for start in range(0, len(self.embeddings), chunk_rows):
+            chunk = np.asarray(self.embeddings[start:start + chunk_rows], dtype=np.float32)
+            scores[start:start + len(chunk)] = chunk @ query_vector
+        return scores * self.scales
+
+    def search_vector(self, query_vector, top_k=10):
+        """질의 임베딩으로 검색해서 [(시각, 점수), ...]를 점수 순서로 반환"""
+        scores = self.scores(query_vector)
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        idx = np.argpartition(-scores, top_k - 1)[:top_k]
+        idx = idx[np.argsort(-scores[idx], kind='stable')]
+        return [(float(self.times[i]), float(scores[i])) for i in idx]
+
+    def search(self, query, top_k=10):
+        """자유 문장으로 검색해서 [(시각, 점수), ...]를 점수 순서로 반환"""
+        return self.search_vector(self.encode_query(query), top_k)
+
+
+def query_frames(index_dir, query, top_k=20, gap_seconds=3.0, pad_seconds=1.0, device="cpu"):
+    """
+    프레임 인덱스에서 질의와 가까운 프레임과, 그 프레임들을 이어 붙인 구간을 함께 반환
+
+    Returns:
+        (frames: [(시각, 점수), ...], ranges: [(시작 초, 끝 초, 최고 점수, 프레임 수), ...])
+        ranges의 (시작, 끝)은 final_video.cut_video에 그대로 넘길 수 있음
+    """
+    frames = FrameIndex(index_dir, device=device).search(query, top_k)
+    return frames, merge_frame_hits(frames, gap_seconds=gap_seconds, pad_seconds=pad_seconds)
+
+
+if __name__ == "__main__":
+    # 사용법:
+    #   python frame_index.py build <입력 비디오> <video_caption 경로> <인덱스 폴더>
+    #   python frame_index.py search <인덱스 폴더> "<질의>" [프레임 수]
+    if len(sys.argv) >= 5 and sys.argv[1] == "build":
+        build_frame_index(sys.argv[2], sys.argv[3], sys.argv[4])
+    elif len(sys.argv) >= 4 and sys.argv[1] == "search":
+        frames, ranges = query_frames(sys.argv[2], sys.argv[3], top_k=int(sys.argv[4]) if len(sys.argv) > 4 else 20)
+        for timestamp, score in frames:
+            print(f"frame {timestamp:9.2f}  {score:.3f}")
+        for start, end, score, count in ranges:
+            print(f"range {start:9.2f} - {end:9.2f}  {score:.3f}  ({count} frames)")
+    else:
+        print("사용법: python frame_index.py build|search ...")
@@ -0,0 +1,71 @@
+import os
+import torch
+import torch.nn as nn
+
+
+def resolve_device(device=None):
+    """장치 문자열/객체를 torch.device로 변환 (None이면 GPU가 있으면 cuda, 없으면 cpu)"""
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    device = torch.device(device)
+    if device.type == "cuda" and not torch.cuda.is_available():
+        print("CUDA를 사용할 수 없어 CPU로 실행합니다.")
+        device = torch.device("cpu")
+    return device
+
+
+def configure_cpu_threads(num_threads=None):
+    """
+    CPU 연산 스레드 수 설정 (None이면 사용 가능한 코어 수)
+
+    intra-op 스레드는 행렬 연산 하나를 나눠 계산하는 스레드이고,
+    inter-op 스레드는 서로 다른 연산을 동시에 돌리는 스레드로 추론에서는 적게 두는 편이 빠름.
+    """
+    if num_threads is None:
+        num_threads = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    torch.set_num_threads(max(1, num_threads))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # 이미 병렬 작업이 시작된 뒤에는 바꿀 수 없음
+        pass
+    return torch.get_num_threads()
+
+
+def _as_plain_linear(model):
+    """nn.Linear를 상속한 커스텀 Linear(예: whisper.model.Linear)를 양자화할 수 있도록 nn.Linear로 변경"""
+    for module in model.modules():
+        if isinstance(module, nn.Linear) and type(module) is not nn.Linear:
+            module.__class__ = nn.Linear
+    return model
+
+
+def quantize_linear_int8(model):
+    """Linear 레이어 가중치를 int8로 동적 양자화 (CPU 전용)"""
+    model = _as_plain_linear(model.to("cpu").float())
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def prepare_model(model, device, quantize=False, num_threads=None):
+    """
+    모델을 추론용으로 장치에 올림
+
+    Args:
+        model: torch 모델
+        device: 실행 장치
+        quantize: True이고 장치가 CPU이면 Linear 레이어를 int8 동적 양자화
+        num_threads: CPU일 때 사용할 intra-op 스레드 수 (None이면 코어 수)
+    """
+    device = resolve_device(device)
+    model.eval()
+    if device.type == "cpu":
+        threads = configure_cpu_threads(num_threads)
+        print(f"CPU 추론 스레드 수: {threads}")
+        if quantize:
+            print("Linear 레이어를 int8 동적 양자화합니다.")
+            return quantize_linear_int8(model)
+        return model.to(device)
+
+    if quantize:
+        print("int8 동적 양자화는 CPU에서만 지원되어 적용하지 않습니다.")
+    return model.to(device)
@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import subprocess
+import numpy as np
+
+KEYFRAME_INDEX_VERSION = 2
+
+# 원본 코덱별로 경계 GOP를 다시 인코딩할 인코더와, 키프레임마다 SPS/PPS를 넣게 하는 옵션
+# (이어 붙이려면 가운데 복사 구간과 코덱이 같아야 하고, 조각마다 다른 파라미터 셋이 패킷 안에 있어야 함)
+SMART_CUT_ENCODERS = {
+    'h264': ('libx264', ['-x264-params', 'repeat-headers=1']),
+    'hevc': ('libx265', ['-x265-params', 'repeat-headers=1']),
+}
+# ffprobe 프로필 이름 -> 인코더 -profile:v 값 (다시 인코딩한 조각의 SPS를 가운데 복사 구간과 같은 프로필로 맞춤)
+SMART_CUT_PROFILES = {
+    'h264': {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high',
+             'High 10': 'high10', 'High 4:2:2': 'high422', 'High 4:4:4 Predictive': 'high444'},
+    'hevc': {'Main': 'main', 'Main 10': 'main10', 'Main Still Picture': 'mainstillpicture'},
+}
+# 조각마다 다른 파라미터 셋을 패킷 안에 두는 mp4 샘플 항목 (avc1/hvc1은 샘플 항목에 든 파라미터 셋 하나만 허용)
+SMART_CUT_TAGS = {'h264': 'avc3', 'hevc': 'hev1'}
+# 조각 파일 형식: 패킷과 시각을 그대로 보존하는 ffmpeg 기본 컨테이너
+SMART_CUT_PART_FORMAT = 'nut'
+
+
+def _cache_key(video_path):
+    """경로 + 크기 + 수정 시각으로 캐시 키 생성 (파일이 바뀌면 인덱스를 다시 만듦)"""
+    stat = os.stat(video_path)
+    source = f"{os.path.abspath(video_path)}:{stat.st_size}:{stat.st_mtime_ns}:{KEYFRAME_INDEX_VERSION}"
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def _probe_video_stream(video_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=codec_name,profile,level,pix_fmt,width,height,r_frame_rate,time_base',
+         '-of', 'json', video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    streams = json.loads(result.stdout).get('streams') or [{}]
+    return streams[0]
+
+
+def _scan_packets(video_path):
+    """ffprobe로 비디오 패킷을 디코딩 없이 훑어 (표시 시각 배열, 키프레임 여부 배열)을 표시 순서로 반환"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    pts, keyframe = [], []
+    for line in result.stdout.decode().splitlines():
+        pts_time, _, flags = line.partition(',')
+        if pts_time in ('', 'N/A'):
+            continue
+        pts.append(float(pts_time))
+        keyframe.append('K' in flags)
+    pts = np.asarray(pts, dtype=np.float64)
+    keyframe = np.asarray(keyframe, dtype=bool)
+    # 패킷은 디코딩 순서(B 프레임이 있으면 표시 순서와 다름)로 나오므로 표시 시각 순서로 정렬
+    order = np.argsort(pts, kind='stable')
+    return pts[order], keyframe[order]
+
+
+class KeyframeIndex:
+    """
+    비디오 한 편의 패킷 표시 시각과 키프레임 위치
+
+    pts: 모든 비디오 패킷(프레임)의 표시 시각 (초, 오름차순)
+    keyframes: 키프레임의 표시 시각 (초, 오름차순)
+    stream: 코덱/해상도/픽셀 형식/프레임레이트 등 ffprobe 스트림 정보
+    """
+    def __init__(self, pts, keyframes, stream):
+        self.pts = pts
+        self.keyframes = keyframes
+        self.stream = stream
+
+    @property
+    def frame_rate(self):
+        num, _, den = str(self.stream.get('r_frame_rate') or '0/1').partition('/')
+        return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+    def keyframe_at_or_before(self, t):
+        idx = np.searchsorted(self.keyframes, t + 1e-6, side='right') - 1
+        return float(self.keyframes[idx]) if idx >= 0 else None
+
+    def keyframe_at_or_after(self, t):
+        idx = np.searchsorted(self.keyframes, t - 1e-6, side='left')
+        return float(self.keyframes[idx]) if idx < len(self.keyframes) else None
+
+    def frame_count(self, start, end):
+        """표시 시각이 [start, end)인 프레임 수"""
+        return int(np.searchsorted(self.pts, end - 1e-6, side='left') - np.searchsorted(self.pts, start - 1e-6,
+                                                                                         side='left'))
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, pts=self.pts, keyframes=self.keyframes,
+                 meta=np.array(json.dumps({'version': KEYFRAME_INDEX_VERSION, 'stream': self.stream})))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != KEYFRAME_INDEX_VERSION:
+                raise ValueError(f"지원하지 않는 키프레임 인덱스 버전입니다: {meta.get('version')}")
+            return cls(data['pts'], data['keyframes'], meta['stream'])
+
+
+def load_keyframe_index(video_path, cache_dir=None, build=True):
+    """
+    비디오의 키프레임/패킷 인덱스를 반환 (cache_dir에 있으면 불러오고, 없으면 ffprobe 패킷 스캔으로 한 번 만들어 저장)
+
+    Args:
+        cache_dir: 인덱스를 저장할 폴더 (None이면 비디오 옆 .keyframe_index/)
+        build: False면 캐시에 없을 때 파일 전체를 스캔하지 않고 None을 반환
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(video_path)), '.keyframe_index')
+    cache_path = os.path.join(cache_dir, f"{_cache_key(video_path)}.npz")
+    if os.path.exists(cache_path):
+        try:
+            return KeyframeIndex.load(cache_path)
+        except (ValueError, KeyError, OSError) as e:
+            print(f"키프레임 인덱스를 다시 만듭니다 ({e}): {cache_path}")
+    if not build:
+        return None
+
+    pts, is_keyframe = _scan_packets(video_path)
+    index = KeyframeIndex(pts, pts[is_keyframe], _probe_video_stream(video_path))
+    os.makedirs(cache_dir, exist_ok=True)
+    index.save(cache_path)
+    print(f"키프레임 인덱스 생성: 프레임 {len(pts)}개, 키프레임 {len(index.keyframes)}개 -> {cache_path}")
+    return index
+
+
+def _run_ffmpeg(args):
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+
+def _encoder_args(stream):
+    """원본 스트림과 같은 코덱/프로필/레벨로 인코딩하는 인코더 옵션"""
+    codec_name = stream['codec_name']
+    encoder, encoder_args = SMART_CUT_ENCODERS[codec_name]
+    encoder_args = list(encoder_args)
+    profile = SMART_CUT_PROFILES[codec_name].get(stream.get('profile'))
+    if profile:
+        encoder_args += ['-profile:v', profile]
+    level = stream.get('level')
+    if isinstance(level, int) and level > 0:
+        if codec_name == 'h264':
+            encoder_args += ['-level:v', f"{level / 10:.1f}"]
+        else:
+            # HEVC general_level_idc는 레벨 x 30 (x265는 -x265-params로만 레벨을 받음)
+            encoder_args[-1] += f":level-idc={level / 30:.1f}"
+    return ['-c:v', encoder, *encoder_args]
+
+
+def _encode_part(index, input_video_path, start, num_frames, output_path, crf):
+    """start부터 num_frames 프레임을 원본과 같은 코덱/프로필/레벨/해상도/픽셀 형식으로 다시 인코딩 (영상만)"""
+    stream = index.stream
+    args = ['-ss', f"{start:.6f}", '-i', input_video_path, '-map', '0:v:0', '-an',
+            '-frames:v', str(num_frames), *_encoder_args(stream), '-preset', 'veryfast', '-crf', str(crf)]
+    if stream.get('pix_fmt'):
+        args += ['-pix_fmt', stream['pix_fmt']]
+    if index.frame_rate:
+        args += ['-r', stream['r_frame_rate']]
+    _run_ffmpeg(args + ['-f', SMART_CUT_PART_FORMAT, output_path])
+
+
+def smart_cut(index, input_video_path, start, end, output_path, crf=18):
+    """
+    [start, end) 구간을 프레임 단위로 정확하게 자름
+
+    구간 안의 첫 키프레임 앞(시작 쪽 GOP 일부)과 마지막 키프레임 뒤(끝 쪽 GOP 일부)만 다시 인코딩하고,
+    그 사이의 온전한 GOP들은 스트림 복사한 뒤 concat으로 이어 붙임. 소리는 구간 전체를 스트림 복사함.
+    코덱이 SMART_CUT_ENCODERS에 없거나 구간 안에 키프레임이 없으면 구간 전체를 다시 인코딩함.
+
+    Returns:
+        {'head_frames', 'copied_seconds', 'tail_frames', 'reencoded_all'}
+    """
+    codec_name = index.stream.get('codec_name')
+    first_key = index.keyframe_at_or_after(start)
+    last_key = index.keyframe_at_or_before(end)
+    total_frames = index.frame_count(start, end)
+
+    if codec_name not in SMART_CUT_ENCODERS or first_key is None or last_key is None or first_key >= last_key:
+        encoder = SMART_CUT_ENCODERS.get(codec_name, ('libx264', []))[0]
+        _run_ffmpeg(['-ss', f"{start:.6f}", '-i', input_video_path, '-map', '0:v:0', '-map', '0:a:0?',
+                     '-frames:v', str(total_frames), '-t', f"{end - start:.6f}",
+                     '-c:v', encoder, '-crf', str(crf), '-c:a', 'aac', output_path])
+        return {'head_frames': total_frames, 'copied_seconds': 0.0, 'tail_frames': 0, 'reencoded_all': True}
+
+    head_frames = index.frame_count(start, first_key)
+    tail_frames = index.frame_count(last_key, end)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp_dir:
+        parts = []
+        if head_frames:
+            parts.append(os.path.join(tmp_dir, 'head.nut'))
+            _encode_part(index, input_video_path, start, head_frames, parts[-1], crf)
+        # 키프레임에서 시작하므로 입력 탐색 + 스트림 복사만으로 정확히 잘림 (SPS/PPS는 패킷 안으로 옮김)
+        parts.append(os.path.join(tmp_dir, 'middle.nut'))
+        _run_ffmpeg(['-ss', f"{first_key:.6f}", '-i', input_video_path, '-map', '0:v:0', '-an',
+                     '-frames:v', str(index.frame_count(first_key, last_key)), '-c:v', 'copy',
+                     '-bsf:v', f"{codec_name}_mp4toannexb", '-f', SMART_CUT_PART_FORMAT, parts[-1]])
+        if tail_frames:
+            parts.append(os.path.join(tmp_dir, 'tail.nut'))
+            _encode_part(index, input_video_path, last_key, tail_frames, parts[-1], crf)
+
+        concat_list = os.path.join(tmp_dir, 'parts.txt')
+        with open(concat_list, 'w', encoding='utf-8') as f:
+            f.writelines(f"file '{part}'\n" for part in parts)
+        _run_ffmpeg(['-f', 'concat', '-safe', '0', '-i', concat_list,
+                     '-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', input_video_path,
+                     '-map', '0:v:0', '-map', '1:a:0?', '-c', 'copy', '-tag:v', SMART_CUT_TAGS[codec_name],
+                     output_path])
+    return {'head_frames': head_frames, 'copied_seconds': last_key - first_key, 'tail_frames': tail_frames,
+            'reencoded_all': False}
+
+
+if __name__ == "__main__":
+    # 사용법: python keyframe_index.py <입력 비디오> [<시작 초> <끝 초> <출력 경로>]
+    if len(sys.argv) < 2:
+        print("사용법: python keyframe_index.py <입력 비디오> [<시작 초> <끝 초> <출력 경로>]")
+        sys.exit(1)
+    keyframe_index = load_keyframe_index(sys.argv[1])
+    gops = np.diff(keyframe_index.keyframes)
+    print(f"프레임 {len(keyframe_index.pts)}개, 키프레임 {len(keyframe_index.keyframes)}개, "
+          f"평균 GOP {gops.mean() if len(gops) else 0:.2f}초, 최대 GOP {gops.max() if len(gops) else 0:.2f}초")
+    if len(sys.argv) >= 5:
+        print(smart_cut(keyframe_index, sys.argv[1], float(sys.argv[2]), float(sys.argv[3]), sys.argv[4]))
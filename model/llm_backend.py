@@ -0,0 +1,213 @@
+import time
+import random
+import socket
+import asyncio
+import aiohttp
+from aiohttp import web
+from llm_cache import llm_cache_key
+from checkpoint_log import CheckpointLog
+
+# 다시 시도하면 성공할 수 있는 HTTP 상태 코드
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """요청 사이 간격을 60 / requests_per_minute초 이상으로 벌려서 분당 요청 수를 제한"""
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_time = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class OpenAICompatibleBackend:
+    """
+    OpenAI 호환 Chat Completions HTTP API 백엔드
+
+    aiohttp 세션 하나의 연결 풀(max_connections)을 모든 요청이 재사용하고,
+    requests_per_minute로 요청 속도를 제한하며, 429/5xx/네트워크 오류는
+    지수 백오프(+지터, Retry-After가 있으면 그 값)로 max_retries번까지 다시 시도함.
+    """
+    def __init__(self, api_key=None, base_url="https://api.openai.com/v1", max_connections=8,
+                 requests_per_minute=None, max_retries=5, timeout_seconds=120.0, backoff_seconds=1.0,
+                 max_backoff_seconds=30.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout_seconds = timeout_seconds
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.retries = 0
+        self._session = None
+
+    def _get_session(self):
+        # 세션은 이벤트 루프 안에서 만들어야 하므로 첫 요청 때 생성
+        if self._session is None or self._session.closed:
+            headers = {'Content-Type': 'application/json'}
+            if self.api_key:
+                headers['Authorization'] = f"Bearer {self.api_key}"
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds)
+            )
+        return self._session
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff_seconds)
+            except ValueError:
+                pass
+        delay = min(self.backoff_seconds * (2 ** attempt), self.max_backoff_seconds)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def complete(self, model, messages, max_tokens=300, temperature=0.7):
+        """Chat Completion 요청을 보내고 응답 텍스트를 반환"""
+        payload = {'model': model, 'messages': messages, 'max_tokens': max_tokens, 'temperature': temperature}
+        url = f"{self.base_url}/chat/completions"
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.wait()
+            retry_after = None
+            try:
+                async with self._get_session().post(url, json=payload) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        return data['choices'][0]['message']['content'].strip()
+                    body = await response.text()
+                    if response.status not in RETRYABLE_STATUS:
+                        raise RuntimeError(f"LLM 요청 실패 (HTTP {response.status}): {body[:500]}")
+                    retry_after = response.headers.get('Retry-After')
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt == self.max_retries:
+                raise RuntimeError(f"LLM 요청이 {self.max_retries + 1}번 모두 실패했습니다: {error}")
+            delay = self._backoff(attempt, retry_after)
+            self.retries += 1
+            print(f"[llm] {error}, {delay:.1f}초 뒤 다시 시도합니다 ({attempt + 1}/{self.max_retries})")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class ReplayBackend:
+    """
+    기록해 둔 응답을 그대로 돌려주는 오프라인 백엔드 (네트워크 없이 재현 가능한 실행/테스트용)
+
+    요청은 llm_cache_key(모델, 메시지, temperature, max_tokens)로 찾고,
+    기록에 없는 요청은 fallback(model, messages)의 반환값을 쓰거나 (없으면) KeyError를 냄.
+    latency_seconds만큼 기다렸다가 응답해서 실제 API의 지연을 흉내낼 수 있음.
+    """
+    def __init__(self, recordings_path=None, fallback=None, latency_seconds=0.0):
+        self.responses = {}
+        if recordings_path:
+            for record in CheckpointLog(recordings_path).load():
+                self.responses[record['key']] = record['response']
+        self.fallback = fallback
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, model, messages, max_tokens=300, temperature=0.7):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency_seconds:
+                await asyncio.sleep(self.latency_seconds)
+            key = llm_cache_key(model, messages, temperature, max_tokens)
+            if key in self.responses:
+                return self.responses[key]
+            if self.fallback is None:
+                raise KeyError(f"기록된 응답이 없는 요청입니다: {key[:12]}")
+            return self.fallback(model, messages)
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        pass
+
+
+class RecordingBackend:
+    """
+    다른 백엔드의 응답을 recordings_path에 기록 (나중에 ReplayBackend로 재생)
+
+    응답 캐시에서 바로 꺼낸 응답도 기록해야 재생할 때 빠지는 요청이 없으므로,
+    캐시를 쓰는 호출자(prompt.request_completion)는 캐시 hit도 record()로 남김.
+    """
+    def __init__(self, backend, recordings_path):
+        self.backend = backend
+        self.log = CheckpointLog(recordings_path)
+
+    def record(self, model, messages, max_tokens, temperature, response):
+        self.log.append({
+            'key': llm_cache_key(model, messages, temperature, max_tokens),
+            'model': model,
+            'response': response,
+        })
+
+    async def complete(self, model, messages, max_tokens=300, temperature=0.7):
+        response = await self.backend.complete(model, messages, max_tokens=max_tokens, temperature=temperature)
+        self.record(model, messages, max_tokens, temperature, response)
+        return response
+
+    async def close(self):
+        self.log.close()
+        await self.backend.close()
+
+
+async def start_stub_server(backend, host='127.0.0.1', port=0):
+    """
+    backend(보통 ReplayBackend)로 응답하는 로컬 OpenAI 호환 서버를 띄움
+
+    OpenAICompatibleBackend(base_url=...)를 이 서버로 향하게 하면 연결 풀/속도 제한/재시도를 포함한
+    실제 HTTP 경로를 네트워크 없이 부하 테스트할 수 있음.
+
+    Returns:
+        (web.AppRunner, base_url) - 끝나면 await runner.cleanup() 호출
+    """
+    async def chat_completions(request):
+        body = await request.json()
+        content = await backend.complete(
+            body['model'], body['messages'],
+            max_tokens=body.get('max_tokens', 300), temperature=body.get('temperature', 0.7)
+        )
+        return web.json_response({
+            'object': 'chat.completion',
+            'model': body['model'],
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        })
+
+    app = web.Application()
+    app.router.add_post('/v1/chat/completions', chat_completions)
+    # port=0이면 OS가 빈 포트를 고르므로, 직접 만든 소켓에 묶어서 실제 포트를 알아냄
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    bound_port = sock.getsockname()[1]
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.SockSite(runner, sock).start()
+    return runner, f"http://{host}:{bound_port}/v1"
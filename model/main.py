@@ -2,12 +2,24 @@ import os
 import torch
 import json
 import asyncio
+import functools
+import shutil
 import time
 from video_caption import process_video
 from audio_caption import transcribe_video_to_json
 from concat import concat_captions
 from prompt import get_funny_timestamps, load_json
-from final_video import cut_video, process_funny_timestamps
+from final_video import process_funny_timestamps
+from stage_runner import Stage, StageRunner
+from model_registry import registry
+from inference_device import configure_cpu_threads
+from caption_store import CaptionStore, MERGED_CAPTION_SCHEMA, load_records, save_records
+from checkpoint_log import CHECKPOINT_SUFFIX
+from llm_backend import OpenAICompatibleBackend, RecordingBackend, ReplayBackend
+from moment_ranker import rank_moments, load_audio_features
+from retrieval_index import TEXT_ENCODER_ID, build_index
+from frame_index import CLIP_MODEL_ID, build_frame_index
+from video_library import VideoLibrary
 
 ## 데이터 경로 ##
 BASE_PATH = '/home/aikusrv02/aiku/video_retrieval'
@@ -15,84 +27,339 @@ base_data_path = f"{BASE_PATH}/data/home_alone" ## 여기 바꿔 여기랑 아
 input_video_path = f"{base_data_path}/home_alone_4800_end.mp4"   ## 여기 바꿔!!!!!!!!##
 video_title = "home_alone"
 api_key = '' ### chatgpt api key 입력
-
-def setup_paths():
-    frame_folder = f"{base_data_path}/video_caption/frames"
-    video_caption_output = f"{base_data_path}/video_caption/video_caption_output.json"
-    audio_output_dir = f"{base_data_path}/audio_caption"
-    audio_output_m4a = f"{audio_output_dir}/audio_caption_output.m4a"
-    audio_output_json = f"{audio_output_dir}/audio_caption_output.json"
-    merged_output_json = f"{base_data_path}/merged_caption/merged_caption.json"
-    data_clips = f"{base_data_path}/clips"
-    final_video_output = f"{base_data_path}/final_video"
-    funny_timestamps_json = f"{base_data_path}/funny_timestamps.json"
-    return {
-        'input_video_path': input_video_path,
-        'frame_folder': frame_folder,
-        'video_caption_output': video_caption_output,
-        'audio_output_m4a': audio_output_m4a,
-        'audio_output_json': audio_output_json,
-        'merged_output_json': merged_output_json,
-        'data_clips': data_clips,
-        'final_video_output': final_video_output,
-        'funny_timestamps_json': funny_timestamps_json
-    }
+artifact_root = f"{base_data_path}/artifacts"  # 단계별 산출물이 입력 해시별로 저장되는 폴더
+final_video_export = f"{base_data_path}/final_video"  # final_video 단계의 클립을 내보내는 고정 경로 (video_shorts.py가 읽음)
+save_debug_frames = False  # True면 샘플링한 프레임을 video_caption 산출물 폴더의 frames/에 JPEG로 저장
+caption_cache_path = f"{BASE_PATH}/data/caption_cache.sqlite"  # 비디오/실행 사이에 공유하는 BLIP 캡션 캐시 (None이면 사용 안 함)
+save_audio_m4a = False  # True면 audio_caption 산출물 폴더에 추출한 오디오(m4a)도 저장
+cpu_quantize = False  # CPU 노드에서 BLIP/Whisper를 int8 동적 양자화해서 실행 (GPU에서는 무시됨)
+cpu_num_threads = None  # 단계별 CPU 추론 스레드 수 상한 (None이면 단계가 resource_slots에서 받은 'cpu' 슬롯 수)
+audio_num_workers = 1  # 1보다 크면 Whisper를 조용한 지점에서 나눈 구간별로 여러 프로세스에서 병렬 실행 (CPU 노드용)
+model_memory_budget_gb = None  # 모델 전체 메모리 한도 (넘으면 오래 안 쓴 모델부터 내림, None이면 제한 없음)
+model_idle_seconds = None  # 이 시간 동안 쓰이지 않은 모델은 메모리에서 내림 (None이면 유지)
+# 동시에 실행되는 단계들이 나눠 쓰는 자원 용량 (비디오/오디오 캡션 단계가 이 안에서 함께 실행됨)
+resource_slots = {'cpu': os.cpu_count() or 1, 'gpu_memory_gb': 10}
+caption_batch_size = 16  # BLIP 배치 크기 (가용 메모리에 맞춰 자동으로 줄어듦, 결과에는 영향 없음)
+stage_checkpoints = True  # True면 캡션 단계가 결과를 체크포인트 로그(.ckpt)에 이어 쓰고, 중단 후 다시 실행하면 이어서 진행
+                         # (오디오는 audio_num_workers=1이어도 조용한 지점에서 나눈 구간별로 트랜스크립션함)
+export_debug_json = False  # True면 컬럼형 캡션 저장소(.cap) 옆에 같은 내용의 .json도 저장 (디버깅용)
+moment_ranking = True  # True면 소리/자막 특징으로 후보 구간을 먼저 골라 그 구간의 자막만 LLM에 보냄
+moment_top_k = 12  # LLM에 보낼 후보 구간 수
+moment_window_seconds = 60.0  # 후보 구간 길이 (초)
+moment_context_seconds = 15.0  # 후보 구간 앞뒤로 함께 보낼 문맥 길이 (초)
+build_retrieval_index = True  # True면 병합된 캡션으로 자유 문장 검색 인덱스(caption_index/)도 만듦
+build_frame_search_index = True  # True면 캡셔닝한 프레임을 CLIP으로 임베딩해서 문장으로 장면을 찾는 프레임 인덱스(frame_index/)도 만듦
+library_root = f"{BASE_PATH}/data/library"  # 검색 인덱스를 등록해서 여러 비디오를 함께 검색하는 라이브러리 (None이면 등록 안 함)
+llm_base_url = "https://api.openai.com/v1"  # OpenAI 호환 API 주소 (로컬 서버 등으로 바꿀 수 있음)
+llm_requests_per_minute = 60  # 분당 최대 요청 수 (None이면 제한 없음)
+llm_max_retries = 5  # 429/5xx/네트워크 오류 시 다시 시도할 횟수
+llm_record_path = None  # 지정하면 LLM 응답을 이 파일(JSONL)에 기록
+llm_replay_path = None  # 지정하면 API 대신 이 파일에 기록된 응답을 재생 (네트워크 없이 실행)
+llm_window_tokens = 6000  # 자막이 이 토큰 수를 넘으면 창으로 나눠 창마다 후보를 고른 뒤 한 번 더 순위를 매김
+llm_max_concurrency = 4  # 동시에 보낼 후보 선택 호출 수
+llm_candidates_per_window = 5  # 창마다 고를 후보 수 (num_clips와 따로 두면 num_clips를 바꿔도 후보 선택 응답은 캐시에서 재사용)
+llm_cache_path = f"{BASE_PATH}/data/llm_cache.sqlite"  # LLM 응답 캐시 (None이면 사용 안 함)
+llm_cache_ttl_days = 30  # 캐시된 응답의 유효 기간 (None이면 만료 없음)
+llm_cache_refresh = False  # True면 캐시된 응답을 쓰지 않고 새로 호출 (새 응답으로 캐시 갱신)
+clip_single_pass = True  # True면 모든 클립을 ffmpeg 한 번 실행으로 원본을 한 번만 읽으며 자름 (겹치는 구간은 합침)
+clip_workers = 4  # clip_single_pass가 꺼져 있거나 clip_frame_accurate일 때 동시에 실행할 ffmpeg 작업 수
+clip_frame_accurate = False  # True면 클립 경계 GOP만 다시 인코딩해서 프레임 단위까지 정확하게 자름 (클립마다 따로 실행)
+keyframe_cache_dir = f"{BASE_PATH}/data/keyframe_cache"  # 비디오별 키프레임/패킷 인덱스 캐시 (None이면 비디오 옆 .keyframe_index/)
+rerun_stages = []  # 캐시를 무시하고 다시 돌릴 단계 이름 (예: ['funny_timestamps'])
 
 def setup_device():
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"장치 사용 중: {device}")
     return device
 
-def generate_video_captions(input_video_path, frame_folder, video_caption_output):
-    try:
-        video_captions = process_video(input_video_path, frame_folder, video_caption_output)
-        print("비디오 캡션이 생성되어 저장되었습니다.")
-        return video_captions
-    except Exception as e:
-        print(f"비디오 캡션 생성 중 오류 발생: {e}")
+def export_caption_json(store_path):
+    """export_debug_json이 켜져 있으면 caption_store 저장소를 같은 이름의 .json으로도 저장"""
+    if export_debug_json and os.path.isdir(store_path):
+        CaptionStore(store_path).export_json(f"{os.path.splitext(store_path)[0]}.json")
+
+def stage_checkpoint_path(output_path, name):
+    """stage_checkpoints가 켜져 있으면 단계 산출물 폴더 안의 체크포인트 로그 경로"""
+    if not stage_checkpoints:
         return None
+    return os.path.join(os.path.dirname(output_path), f"{name}{CHECKPOINT_SUFFIX}")
 
-def generate_audio_captions(input_video_path, audio_output_m4a, audio_output_json, device):
-    try:
-        transcribe_video_to_json(input_video_path, audio_output_m4a, audio_output_json, device)
-        print("오디오 캡션이 생성되어 저장되었습니다.")
-    except Exception as e:
-        print(f"오디오 캡션 생성 중 오류 발생: {e}")
+def stage_threads(cpu_threads):
+    """
+    단계가 쓸 CPU 스레드 수를 정하고 torch에 설정 (자원 풀에서 받은 cpu 슬롯 수, cpu_num_threads가 있으면 그 이하)
 
-async def main():
-    start_time = time.time()  # 시작 시간 기록
+    단계 함수가 실행되는 스레드에서 호출해서, 레지스트리에 이미 올라간 모델을 다른 단계가 다시 쓸 때도
+    이 단계가 받은 코어 수만큼만 쓰게 함. 둘 다 없으면 None (코어 수 전체).
+    """
+    threads = cpu_threads
+    if cpu_num_threads is not None:
+        threads = min(cpu_num_threads, cpu_threads) if cpu_threads else cpu_num_threads
+    if threads is not None:
+        configure_cpu_threads(threads)
+    return threads
 
-    paths = setup_paths()
-    device = setup_device()
+def generate_video_captions(input_video_path, video_caption_output, device=None, downsample_rate_seconds=1,
+                            sampling="fixed", min_interval_seconds=1.0, max_interval_seconds=10.0, quantize=False,
+                            cpu_threads=None):
+    threads = stage_threads(cpu_threads)
+    frame_folder = None
+    if save_debug_frames:
+        frame_folder = os.path.join(os.path.dirname(video_caption_output), 'frames')
+    # 오류는 그대로 올려보냄 (StageRunner가 단계를 실패로 기록하고 동시에 실행 중인 다른 단계를 취소함)
+    video_captions = process_video(
+        input_video_path, frame_folder, video_caption_output,
+        downsample_rate_seconds, batch_size=caption_batch_size, sampling=sampling,
+        min_interval_seconds=min_interval_seconds, max_interval_seconds=max_interval_seconds,
+        cache_path=caption_cache_path, device=device, quantize=quantize, num_threads=threads,
+        num_preprocess_workers=min(2, threads or 2),
+        checkpoint_path=stage_checkpoint_path(video_caption_output, 'video_caption')
+    )
+    export_caption_json(video_caption_output)
+    print("비디오 캡션이 생성되어 저장되었습니다.")
+    return video_captions
+
+def generate_audio_captions(input_video_path, audio_output_json, audio_features_output, device, language="en",
+                            quantize=False, num_workers=1, max_chunk_seconds=120.0, cpu_threads=None):
+    threads = stage_threads(cpu_threads)
+    audio_output_m4a = None
+    if save_audio_m4a:
+        audio_output_m4a = os.path.join(os.path.dirname(audio_output_json), 'audio_caption_output.m4a')
+    transcribe_video_to_json(
+        input_video_path, audio_output_m4a, audio_output_json, language=language, device=device,
+        quantize=quantize, num_threads=max(1, threads // num_workers) if threads else None,
+        num_workers=num_workers,
+        max_chunk_seconds=max_chunk_seconds,
+        checkpoint_path=stage_checkpoint_path(audio_output_json, 'audio_caption'),
+        audio_features_path=audio_features_output
+    )
+    export_caption_json(audio_output_json)
+    print("오디오 캡션이 생성되어 저장되었습니다.")
+
+def merge_video_audio_captions(audio_output_json, video_caption_output, merged_output_json):
+    concat_captions(audio_output_json, video_caption_output, merged_output_json)
+    export_caption_json(merged_output_json)
+
+def rank_funny_moments(audio_features_output, merged_output_json, ranked_caption_output, top_k=12,
+                       window_seconds=60.0, context_seconds=15.0):
+    merged_data = load_records(merged_output_json)
+    # audio_caption 단계에서 계산해 둔 오디오 특징을 쓰므로 소리를 다시 디코딩하지 않음
+    audio_feature_bins, bin_seconds = load_audio_features(audio_features_output)
+    segments, windows = rank_moments(merged_data, top_k=top_k, window_seconds=window_seconds,
+                                     context_seconds=context_seconds, bin_seconds=bin_seconds,
+                                     audio_feature_bins=audio_feature_bins)
+    save_records(ranked_caption_output, segments, MERGED_CAPTION_SCHEMA, attrs={'windows': windows})
+    export_caption_json(ranked_caption_output)
+    kept_seconds = sum(end - start for start, end, _ in windows)
+    print(f"후보 구간 {len(windows)}개 ({kept_seconds:.0f}초) 선택: 세그먼트 {len(merged_data)}개 중 "
+          f"{len(segments)}개({len(segments) / max(len(merged_data), 1):.1%})만 LLM에 보냅니다.")
+
+def build_caption_index(merged_output_json, caption_index, cpu_threads=None):
+    build_index(merged_output_json, caption_index, num_threads=stage_threads(cpu_threads))
+
+def build_video_frame_index(input_video_path, video_caption_output, frame_index, device=None, quantize=False,
+                            cpu_threads=None):
+    build_frame_index(input_video_path, video_caption_output, frame_index, device=device, quantize=quantize,
+                      num_threads=stage_threads(cpu_threads))
 
-    # generate_video_captions(paths['input_video_path'], paths['frame_folder'], paths['video_caption_output'])
-    # print("비디오 캡션 생성 완료")
-    # generate_audio_captions(paths['input_video_path'], paths['audio_output_m4a'], paths['audio_output_json'], device)
-    # print("오디오 캡션 생성 완료")
-    # # 비디오 캡션과 오디오 캡션을 병합
-    # concat_captions(paths['audio_output_json'], paths['video_caption_output'], paths['merged_output_json'])
-    # print("병합 완료")
-    
-    # funny_timestamps.json 생성 후
-    await get_funny_timestamps(
-        paths['merged_output_json'], 
-        video_title, 
-        api_key, 
-        paths['funny_timestamps_json'],
-        num_clips=5  # 원하는 클립 개수 지정
+def build_llm_backend():
+    """설정에 따라 타임스탬프 선택에 쓸 LLM 백엔드 생성"""
+    if llm_replay_path:
+        return ReplayBackend(llm_replay_path)
+    backend = OpenAICompatibleBackend(
+        api_key=api_key, base_url=llm_base_url, max_connections=llm_max_concurrency,
+        requests_per_minute=llm_requests_per_minute, max_retries=llm_max_retries
     )
+    if llm_record_path:
+        backend = RecordingBackend(backend, llm_record_path)
+    return backend
 
-    # 새로운 방식으로 비디오 클립 생성
+async def select_funny_timestamps(funny_timestamps_json, video_title, num_clips, window_tokens=6000,
+                                  candidates_per_window=None, merged_output_json=None, ranked_caption_output=None):
+    # moment_ranking이 켜져 있으면 후보 구간만 남긴 자막을, 아니면 전체 병합 자막을 사용
+    caption_path = ranked_caption_output or merged_output_json
+    backend = build_llm_backend()
+    try:
+        await get_funny_timestamps(
+            caption_path,
+            video_title,
+            api_key,
+            funny_timestamps_json,
+            num_clips=num_clips,
+            window_tokens=window_tokens,
+            max_concurrency=llm_max_concurrency,
+            candidates_per_window=candidates_per_window,
+            cache_path=llm_cache_path,
+            refresh_cache=llm_cache_refresh,
+            cache_ttl_seconds=llm_cache_ttl_days * 86400 if llm_cache_ttl_days is not None else None,
+            backend=backend
+        )
+    finally:
+        await backend.close()
+
+def cut_funny_clips(funny_timestamps_json, input_video_path, final_video_output, single_pass=True,
+                    frame_accurate=False):
+    # 다시 실행하면 이전 클립 옆에 _1, _2 클립이 쌓이지 않도록 이 단계의 출력 폴더를 비우고 시작
+    # (final_video_output은 StageRunner가 정한 이 단계 전용 폴더라 통째로 지워도 됨, 고정 경로는 export_clips가 관리)
+    if os.path.isdir(final_video_output):
+        shutil.rmtree(final_video_output)
+    os.makedirs(final_video_output, exist_ok=True)
     output_files = process_funny_timestamps(
-        paths['funny_timestamps_json'],
-        paths['input_video_path'],
-        paths['final_video_output']
+        funny_timestamps_json,
+        input_video_path,
+        final_video_output,
+        title=video_title,
+        max_workers=clip_workers,
+        single_pass=single_pass,
+        frame_accurate=frame_accurate,
+        keyframe_cache_dir=keyframe_cache_dir
+    )
+    if not output_files:
+        # 완료 표시를 남기지 않아 다음 실행에서 다시 시도
+        raise RuntimeError("클립 생성 중 문제가 발생했습니다.")
+    print("모든 클립이 성공적으로 생성되었습니다.")
+
+def export_clips(final_video_output, export_dir):
+    """
+    final_video 단계 산출물(artifacts/final_video/<키>/final_video/)의 클립을 고정 경로로 내보냄
+
+    video_shorts.py 등 뒤따르는 스크립트는 export_dir을 읽음. export_dir은 지우지 않고,
+    지난번에 내보낸 클립 중 이번 결과에 없는 것만 지운 뒤 클립을 하드 링크(안 되면 복사)로 넣음.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    manifest_path = os.path.join(export_dir, '.exported_clips.json')
+    previous = []
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            previous = []
+
+    clips = sorted(name for name in os.listdir(final_video_output) if name.endswith('.mp4'))
+    for name in set(previous) - set(clips):
+        path = os.path.join(export_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    for name in clips:
+        target = os.path.join(export_dir, name)
+        if os.path.exists(target):
+            os.remove(target)
+        try:
+            os.link(os.path.join(final_video_output, name), target)
+        except OSError:
+            shutil.copy2(os.path.join(final_video_output, name), target)
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(clips, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+    print(f"클립 {len(clips)}개를 내보냈습니다: {export_dir}")
+    return export_dir
+
+def build_pipeline(device):
+    """각 단계의 입력/출력을 선언한 파이프라인 생성"""
+    runner = StageRunner(artifact_root, sources={'input_video_path': input_video_path}, resource_slots=resource_slots)
+    runner.add_stage(Stage(
+        'video_caption',
+        functools.partial(generate_video_captions, device=device),
+        inputs=['input_video_path'],
+        outputs={'video_caption_output': 'video_caption.cap'},
+        model='Salesforce/blip-image-captioning-large',
+        # 샷이 바뀔 때마다 키프레임을 캡셔닝 (같은 샷이면 최대 8초마다 한 장)
+        params={'sampling': 'shot', 'min_interval_seconds': 1.0, 'max_interval_seconds': 8.0,
+                'quantize': cpu_quantize and device.type == 'cpu'},
+        resources={'cpu': 4, 'gpu_memory_gb': 6}  # 디코딩/전처리 스레드 + BLIP-large
+    ))
+    runner.add_stage(Stage(
+        'audio_caption',
+        functools.partial(generate_audio_captions, device=device),
+        inputs=['input_video_path'],
+        outputs={'audio_output_json': 'audio_caption.cap', 'audio_features_output': 'audio_features.npz'},
+        model='whisper-base',
+        params={'language': 'en', 'quantize': cpu_quantize and device.type == 'cpu',
+                'num_workers': audio_num_workers, 'max_chunk_seconds': 120.0},
+        resources={'cpu': 2 * audio_num_workers, 'gpu_memory_gb': 2}  # ffmpeg + Whisper base
+    ))
+    runner.add_stage(Stage(
+        'merge_caption',
+        merge_video_audio_captions,
+        inputs=['audio_output_json', 'video_caption_output'],
+        outputs={'merged_output_json': 'merged_caption.cap'}
+    ))
+    if build_retrieval_index:
+        # 검색: RetrievalIndex(caption_index 경로).search("질의") -> [(start, end, score), ...]
+        runner.add_stage(Stage(
+            'retrieval_index',
+            build_caption_index,
+            inputs=['merged_output_json'],
+            outputs={'caption_index': 'caption_index'},
+            model=TEXT_ENCODER_ID,
+            resources={'cpu': 2}
+        ))
+    if build_frame_search_index:
+        # 검색: frame_index.query_frames(frame_index 경로, "질의") -> (가까운 프레임, 이어 붙인 구간)
+        # 캡션 단계와 따로 캐시되도록 캡셔닝한 시각의 프레임을 비디오에서 한 번 더 디코딩함
+        runner.add_stage(Stage(
+            'frame_index',
+            functools.partial(build_video_frame_index, device=device),
+            inputs=['input_video_path', 'video_caption_output'],
+            outputs={'frame_index': 'frame_index'},
+            model=CLIP_MODEL_ID,
+            params={'quantize': cpu_quantize and device.type == 'cpu'},
+            resources={'cpu': 2, 'gpu_memory_gb': 1}
+        ))
+    if moment_ranking:
+        runner.add_stage(Stage(
+            'moment_rank',
+            rank_funny_moments,
+            inputs=['audio_features_output', 'merged_output_json'],
+            outputs={'ranked_caption_output': 'ranked_caption.cap'},
+            params={'top_k': moment_top_k, 'window_seconds': moment_window_seconds,
+                    'context_seconds': moment_context_seconds},
+            resources={'cpu': 2}
+        ))
+    runner.add_stage(Stage(
+        'funny_timestamps',
+        select_funny_timestamps,
+        inputs=['ranked_caption_output' if moment_ranking else 'merged_output_json'],
+        outputs={'funny_timestamps_json': 'funny_timestamps.json'},
+        model='gpt-4-turbo',
+        params={'video_title': video_title, 'num_clips': 5,  # 원하는 클립 개수 지정
+                'window_tokens': llm_window_tokens, 'candidates_per_window': llm_candidates_per_window}
+    ))
+    runner.add_stage(Stage(
+        'final_video',
+        cut_funny_clips,
+        inputs=['funny_timestamps_json', 'input_video_path'],
+        outputs={'final_video_output': 'final_video'},
+        params={'single_pass': clip_single_pass, 'frame_accurate': clip_frame_accurate}
+    ))
+    return runner
+
+async def main():
+    start_time = time.time()  # 시작 시간 기록
+
+    device = setup_device()
+    registry.configure(
+        memory_budget_bytes=int(model_memory_budget_gb * 1024 ** 3) if model_memory_budget_gb else None,
+        idle_seconds=model_idle_seconds
     )
 
-    if output_files:
-        print("모든 클립이 성공적으로 생성되었습니다.")
-    else:
-        print("클립 생성 중 문제가 발생했습니다.")
+    # 이미 끝난 단계는 입력 해시/모델/파라미터가 같으면 자동으로 건너뜀
+    # 비디오 캡션과 오디오 캡션은 resource_slots 안에서 동시에 실행되고, 둘 다 끝나면 바로 병합 시작
+    runner = build_pipeline(device)
+    paths = await runner.run(force=rerun_stages)
+    # 단계 산출물은 입력 해시별 폴더에 있으므로, 뒤따르는 스크립트가 읽는 고정 경로로 클립을 내보냄
+    clip_dir = export_clips(paths['final_video_output'], final_video_export) if final_video_export \
+        else paths['final_video_output']
+    print(f"클립 저장 위치: {clip_dir}")
+    if library_root and 'caption_index' in paths:
+        # 검색 인덱스가 바뀌었을 때만 다시 등록 (같은 video_title로 다시 등록하면 해당 비디오의 샤드만 교체됨)
+        library = VideoLibrary(library_root)
+        if not library.is_current(video_title, runner.keys['caption_index']):
+            library.add(video_title, title=video_title, video_path=input_video_path,
+                        index_dir=paths['caption_index'], key=runner.keys['caption_index'])
+    runner.report_timings()
+    registry.report()
 
     end_time = time.time()
     elapsed_time = end_time - start_time
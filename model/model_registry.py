@@ -0,0 +1,179 @@
+import time
+import threading
+
+
+def _tensor_bytes(value):
+    """텐서/모듈/튜플 안에 들어 있는 텐서들의 바이트 수 합계"""
+    try:
+        import torch
+    except ImportError:
+        return 0
+
+    if isinstance(value, torch.Tensor):
+        return value.nelement() * value.element_size()
+    if isinstance(value, torch.nn.Module):
+        # 양자화된 Linear의 packed weight는 parameters()에 나오지 않으므로 state_dict 기준으로 계산
+        return sum(_tensor_bytes(v) for v in value.state_dict().values())
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_tensor_bytes(v) for v in value.values())
+    model = getattr(value, 'model', None)  # transformers pipeline 등
+    if isinstance(model, torch.nn.Module):
+        return _tensor_bytes(model)
+    return 0
+
+
+class _Entry:
+    def __init__(self, loader):
+        self.loader = loader
+        self.value = None
+        self.loaded = False
+        self.load_seconds = 0.0
+        self.size_bytes = 0
+        self.last_used = 0.0
+        self.uses = 0
+        self.loads = 0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    프로세스 전체에서 공유하는 모델 저장소
+
+    모델은 처음 요청될 때 한 번만 로드되고 이후 호출에서는 그대로 재사용됨.
+    idle_seconds 동안 쓰이지 않은 모델과, 전체 크기가 memory_budget_bytes를 넘을 때
+    가장 오래 쓰이지 않은 모델부터 메모리에서 내림 (다시 요청되면 다시 로드).
+    """
+    def __init__(self, memory_budget_bytes=None, idle_seconds=None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_seconds = idle_seconds
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def configure(self, memory_budget_bytes=None, idle_seconds=None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_seconds = idle_seconds
+
+    def register(self, name, loader):
+        """name으로 요청될 때 호출할 로더 등록 (이미 등록되어 있으면 유지)"""
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(loader)
+            return self._entries[name]
+
+    def get(self, name, loader=None):
+        """
+        name에 해당하는 모델을 반환 (처음이면 loader()로 로드)
+
+        Args:
+            name: 모델 키 (장치/양자화 여부 등 로드 옵션을 포함해야 함)
+            loader: 인자 없이 모델을 만들어 반환하는 함수 (이미 register 했다면 생략 가능)
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                if loader is None:
+                    raise KeyError(f"등록되지 않은 모델입니다: {name}")
+                entry = self.register(name, loader)
+        self.evict_idle(exclude=name)
+
+        # 로드는 모델별 잠금으로 처리해서 다른 모델 요청을 막지 않음
+        with entry.lock:
+            if not entry.loaded:
+                start = time.time()
+                entry.value = entry.loader()
+                entry.load_seconds = time.time() - start
+                entry.size_bytes = _tensor_bytes(entry.value)
+                entry.loaded = True
+                entry.loads += 1
+                print(f"[model registry] '{name}' 로드 완료: {entry.load_seconds:.2f}초, "
+                      f"{entry.size_bytes / 1024 ** 2:.1f}MB")
+            entry.last_used = time.time()
+            entry.uses += 1
+            value = entry.value
+
+        self._enforce_budget(exclude=name)
+        return value
+
+    def evict(self, name):
+        """모델을 메모리에서 내림 (로더는 남겨두어 다시 요청하면 다시 로드)"""
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            return
+        with entry.lock:
+            if not entry.loaded:
+                return
+            entry.value = None
+            entry.loaded = False
+        print(f"[model registry] '{name}' 메모리에서 내림 ({entry.size_bytes / 1024 ** 2:.1f}MB)")
+        self._release_memory()
+
+    def evict_all(self):
+        with self._lock:
+            names = list(self._entries)
+        for name in names:
+            self.evict(name)
+
+    def evict_idle(self, exclude=None):
+        if self.idle_seconds is None:
+            return
+        now = time.time()
+        with self._lock:
+            idle = [
+                name for name, entry in self._entries.items()
+                if entry.loaded and name != exclude and now - entry.last_used > self.idle_seconds
+            ]
+        for name in idle:
+            self.evict(name)
+
+    def _enforce_budget(self, exclude=None):
+        if self.memory_budget_bytes is None:
+            return
+        while self.resident_bytes() > self.memory_budget_bytes:
+            with self._lock:
+                candidates = [
+                    (entry.last_used, name) for name, entry in self._entries.items()
+                    if entry.loaded and name != exclude
+                ]
+            if not candidates:
+                break
+            self.evict(min(candidates)[1])
+
+    def _release_memory(self):
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values() if entry.loaded)
+
+    def stats(self):
+        """모델별 로드 시간/메모리 크기/사용 횟수"""
+        with self._lock:
+            return {
+                name: {
+                    'loaded': entry.loaded,
+                    'load_seconds': entry.load_seconds,
+                    'size_bytes': entry.size_bytes,
+                    'uses': entry.uses,
+                    'loads': entry.loads,
+                }
+                for name, entry in self._entries.items()
+            }
+
+    def report(self):
+        print("\n=== 모델 사용 현황 ===")
+        for name, info in self.stats().items():
+            state = "메모리" if info['loaded'] else "내려감"
+            print(f"- {name}: 로드 {info['loads']}회 (마지막 {info['load_seconds']:.2f}초), "
+                  f"{info['size_bytes'] / 1024 ** 2:.1f}MB, 사용 {info['uses']}회, {state}")
+
+
+# 프로세스 전체에서 공유하는 기본 저장소
+registry = ModelRegistry()
@@ -0,0 +1,246 @@
+import re
+import numpy as np
+from caption_store import to_seconds
+
+# 타임라인 점수를 만들 때 각 특징의 가중치
+DEFAULT_WEIGHTS = {
+    'loudness_peak': 1.0,   # 주변보다 갑자기 커진 소리 (비명, 부딪히는 소리, 웃음)
+    'high_band': 1.0,       # 2~5kHz 대역 에너지 비율 (비명/웃음처럼 날카로운 소리)
+    'flux': 0.5,            # 스펙트럼 변화량 (웃음처럼 끊기는 소리, 효과음)
+    'speech_rate': 0.5,     # 초당 단어 수
+    'exclamation': 1.0,     # 느낌표/물음표/감탄사/대문자 외침
+    'visual_change': 0.5,   # 비디오 캡션이 바뀌는 빈도
+}
+
+INTERJECTIONS = {
+    'ha', 'haha', 'hahaha', 'oh', 'ohh', 'wow', 'hey', 'ah', 'ahh', 'aah', 'ow', 'ouch', 'no', 'yes', 'whoa',
+    'help', 'stop', 'what', 'huh', 'yeah', 'god'
+}
+
+
+def _bin_mean(values, bins, num_bins):
+    sums = np.bincount(bins, weights=values, minlength=num_bins)[:num_bins]
+    counts = np.bincount(bins, minlength=num_bins)[:num_bins]
+    return sums / np.maximum(counts, 1)
+
+
+def audio_features(audio, num_bins, sample_rate=16000, bin_seconds=1.0, frame_length=1024, block_frames=4096,
+                   local_seconds=30.0):
+    """
+    오디오를 frame_length 단위 프레임으로 나눠 FFT를 블록 단위로 한 번에 계산하고 bin_seconds 칸별 특징으로 모음
+
+    Returns:
+        {'loudness_peak', 'high_band', 'flux'}: 각각 길이 num_bins 배열
+    """
+    num_frames = len(audio) // frame_length
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / sample_rate)
+    high_mask = (freqs >= 2000) & (freqs < 5000)
+    window = np.hanning(frame_length).astype(np.float32)
+
+    rms = np.zeros(num_frames, dtype=np.float32)
+    high_ratio = np.zeros(num_frames, dtype=np.float32)
+    flux = np.zeros(num_frames, dtype=np.float32)
+    prev_spectrum = None
+    # 전체 스펙트로그램을 한 번에 만들면 영화 한 편에 수백 MB가 필요하므로 블록 단위로 계산
+    for start in range(0, num_frames, block_frames):
+        end = min(start + block_frames, num_frames)
+        frames = np.asarray(audio[start * frame_length:end * frame_length], dtype=np.float32)
+        frames = frames.reshape(end - start, frame_length)
+        rms[start:end] = np.sqrt(np.mean(frames ** 2, axis=1))
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1))
+        power = spectrum ** 2
+        high_ratio[start:end] = power[:, high_mask].sum(axis=1) / (power.sum(axis=1) + 1e-10)
+        previous = np.vstack([spectrum[:1] if prev_spectrum is None else prev_spectrum, spectrum[:-1]])
+        flux[start:end] = np.maximum(spectrum - previous, 0).sum(axis=1) / (spectrum.sum(axis=1) + 1e-10)
+        prev_spectrum = spectrum[-1:]
+
+    bins = np.minimum((np.arange(num_frames) * frame_length / sample_rate / bin_seconds).astype(np.int64),
+                      num_bins - 1)
+    loudness_db = 20 * np.log10(rms + 1e-6)
+    # 칸 안에서 가장 큰 소리를 주변 local_seconds 평균과 비교해 갑자기 커진 정도를 봄
+    peak_db = np.full(num_bins, -120.0)
+    np.maximum.at(peak_db, bins, loudness_db)
+    local = max(1, min(int(local_seconds / bin_seconds), num_bins))
+    local_mean = np.convolve(peak_db, np.ones(local) / local, mode='same')
+    return {
+        'loudness_peak': peak_db - local_mean,
+        'high_band': _bin_mean(high_ratio, bins, num_bins),
+        'flux': _bin_mean(flux, bins, num_bins),
+    }
+
+
+def compute_audio_features(audio, sample_rate=16000, bin_seconds=1.0):
+    """
+    오디오 전체 길이 기준으로 칸별 오디오 특징을 계산 (1초보다 짧으면 None)
+
+    audio_caption 단계에서 Whisper용 PCM을 디코딩한 김에 계산해 두면 moment_rank 단계가 소리를 다시 디코딩하지 않음.
+    """
+    if audio is None or len(audio) < sample_rate:
+        return None
+    num_bins = int(np.ceil(len(audio) / sample_rate / bin_seconds))
+    return audio_features(audio, num_bins, sample_rate=sample_rate, bin_seconds=bin_seconds)
+
+
+def save_audio_features(path, features, bin_seconds=1.0):
+    """compute_audio_features 결과를 npz로 저장 (None이면 특징 없이 칸 크기만 저장)"""
+    np.savez(path, bin_seconds=np.float64(bin_seconds), **(features or {}))
+
+
+def load_audio_features(path):
+    """
+    save_audio_features로 저장한 특징을 읽음
+
+    Returns:
+        ({특징 이름: 배열} 또는 None, 칸 크기(초))
+    """
+    with np.load(path) as data:
+        features = {name: data[name] for name in data.files if name != 'bin_seconds'}
+        return features or None, float(data['bin_seconds'])
+
+
+def _exclamation_count(text):
+    words = re.findall(r"[A-Za-z']+", text)
+    shouted = sum(1 for word in words if len(word) > 1 and word.isupper())
+    interjections = sum(1 for word in words if word.lower() in INTERJECTIONS)
+    return text.count('!') + text.count('?') * 0.5 + shouted + interjections
+
+
+def caption_features(merged_data, num_bins, bin_seconds=1.0, last_segment_seconds=5.0):
+    """
+    병합된 캡션 세그먼트마다 특징을 계산해 세그먼트가 걸친 칸들에 초당 값으로 나눠 넣음
+
+    Returns:
+        {'speech_rate', 'exclamation', 'visual_change'}: 각각 길이 num_bins 배열
+    """
+    features = {name: np.zeros(num_bins) for name in ('speech_rate', 'exclamation', 'visual_change')}
+    times = [to_seconds(segment['time']) for segment in merged_data]
+    previous_words = set()
+    for i, segment in enumerate(merged_data):
+        start = times[i]
+        end = times[i + 1] if i + 1 < len(times) else start + last_segment_seconds
+        duration = max(end - start, bin_seconds)
+
+        text = segment['audio_caption'] or ''
+        changes = 0
+        for caption in segment['video_caption']:
+            words = set(caption.lower().split())
+            # 앞 캡션과 단어가 절반 이상 다르면 장면이 바뀐 것으로 봄
+            union = words | previous_words
+            if union and len(words & previous_words) / len(union) < 0.5:
+                changes += 1
+            previous_words = words
+
+        lo = min(int(start / bin_seconds), num_bins - 1)
+        hi = min(max(int(np.ceil(end / bin_seconds)), lo + 1), num_bins)
+        features['speech_rate'][lo:hi] += len(text.split()) / duration
+        features['exclamation'][lo:hi] += _exclamation_count(text) / duration
+        features['visual_change'][lo:hi] += changes / duration
+    return features
+
+
+def _robust_zscore(values):
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * 1.4826
+    scale = mad if mad > 1e-9 else (values.std() or 1.0)
+    return np.clip((values - median) / scale, -3.0, 6.0)
+
+
+def score_timeline(merged_data, audio=None, sample_rate=16000, bin_seconds=1.0, weights=None, audio_feature_bins=None):
+    """
+    bin_seconds 칸마다 재미있는 순간일 가능성 점수를 계산
+
+    Args:
+        audio_feature_bins: compute_audio_features로 미리 계산한 오디오 특징 (지정하면 audio 대신 사용)
+
+    Returns:
+        (점수 배열, 특징 이름별 정규화된 배열)
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    duration = max(to_seconds(segment['time']) for segment in merged_data) + bin_seconds
+    if audio_feature_bins is not None:
+        duration = max(duration, len(next(iter(audio_feature_bins.values()))) * bin_seconds)
+    elif audio is not None:
+        duration = max(duration, len(audio) / sample_rate)
+    num_bins = int(np.ceil(duration / bin_seconds))
+
+    features = caption_features(merged_data, num_bins, bin_seconds)
+    if audio_feature_bins is not None:
+        # 자막이 소리보다 조금 더 길면 남는 칸은 0(평범한 소리)으로 채움
+        for name, values in audio_feature_bins.items():
+            features[name] = np.pad(values[:num_bins], (0, max(0, num_bins - len(values))))
+    elif audio is not None and len(audio) >= sample_rate:
+        features.update(audio_features(audio, num_bins, sample_rate=sample_rate, bin_seconds=bin_seconds))
+
+    normalized = {name: _robust_zscore(values) for name, values in features.items()}
+    score = np.zeros(num_bins)
+    for name, values in normalized.items():
+        score += weights.get(name, 0.0) * values
+    return score, normalized
+
+
+def select_windows(score, top_k=10, window_seconds=60.0, context_seconds=15.0, bin_seconds=1.0):
+    """
+    window_seconds 길이로 평활화한 점수가 높은 구간 top_k개를 서로 겹치지 않게 고름
+
+    Returns:
+        [(시작 초, 끝 초, 점수), ...] - 앞뒤로 context_seconds를 붙인 구간, 시간 순서
+    """
+    width = max(1, min(int(window_seconds / bin_seconds), len(score)))
+    # 평균보다 낮은 칸이 짧고 강한 순간을 상쇄하지 않도록 양수 부분만 제곱해서 합침
+    peaks = np.maximum(score, 0) ** 2
+    smoothed = np.convolve(peaks, np.ones(width) / width, mode='same')
+    duration = len(score) * bin_seconds
+
+    windows = []
+    taken = np.zeros(len(score), dtype=bool)
+    for center in np.argsort(-smoothed, kind='stable'):
+        if len(windows) >= top_k:
+            break
+        if taken[center]:
+            continue
+        lo, hi = max(0, center - width // 2), min(len(score), center + width - width // 2)
+        # 이미 고른 구간과 겹치지 않도록 주변 한 구간 폭만큼 막아둠
+        taken[max(0, center - width):min(len(score), center + width)] = True
+        start = max(0.0, lo * bin_seconds - context_seconds)
+        end = min(duration, hi * bin_seconds + context_seconds)
+        windows.append((start, end, float(smoothed[center])))
+    return sorted(windows)
+
+
+def filter_segments(merged_data, windows):
+    """windows 중 하나에라도 시작 시각이 들어가는 세그먼트만 남김 (순서 유지)"""
+    if not windows or not merged_data:
+        return []
+    merged_windows = []
+    for start, end, _ in sorted(windows):
+        if merged_windows and start <= merged_windows[-1][1]:
+            merged_windows[-1][1] = max(merged_windows[-1][1], end)
+        else:
+            merged_windows.append([start, end])
+    starts = np.array([start for start, _ in merged_windows])
+    ends = np.array([end for _, end in merged_windows])
+
+    times = np.array([to_seconds(segment['time']) for segment in merged_data])
+    idx = np.searchsorted(starts, times, side='right') - 1
+    keep = (idx >= 0) & (times <= ends[np.maximum(idx, 0)])
+    return [segment for segment, kept in zip(merged_data, keep) if kept]
+
+
+def rank_moments(merged_data, audio=None, sample_rate=16000, top_k=10, window_seconds=60.0, context_seconds=15.0,
+                 bin_seconds=1.0, weights=None, audio_feature_bins=None):
+    """
+    병합된 캡션(+오디오)으로 후보 구간을 골라 LLM에 보낼 세그먼트만 남김
+
+    Args:
+        audio_feature_bins: compute_audio_features로 미리 계산한 오디오 특징 (지정하면 audio 대신 사용)
+
+    Returns:
+        (남긴 세그먼트 목록, [(시작 초, 끝 초, 점수), ...])
+    """
+    if not merged_data:
+        return [], []
+    score, _ = score_timeline(merged_data, audio, sample_rate=sample_rate, bin_seconds=bin_seconds, weights=weights,
+                              audio_feature_bins=audio_feature_bins)
+    windows = select_windows(score, top_k=top_k, window_seconds=window_seconds, context_seconds=context_seconds,
+                             bin_seconds=bin_seconds)
+    return filter_segments(merged_data, windows), windows
@@ -1,11 +1,18 @@
-import openai
 import json
 import asyncio
+import tiktoken
+from llm_cache import LLMResponseCache, llm_cache_key
+from llm_backend import OpenAICompatibleBackend
+from caption_store import load_records, to_seconds
 
 def convert_timestamp_to_seconds(timestamp):
-    """HH:MM:SS 형식의 타임스탬프를 초 단위로 변환"""
+    """HH:MM:SS 형식의 타임스탬프(또는 초 단위 숫자)를 초 단위로 변환"""
+    if isinstance(timestamp, (int, float)):  # 검색 결과처럼 이미 초 단위인 경우
+        return float(timestamp)
     parts = timestamp.split(':')
-    if len(parts) == 2:  # MM:SS 형식
+    if len(parts) == 1:  # 초 단위 숫자 문자열
+        return float(parts[0])
+    elif len(parts) == 2:  # MM:SS 형식
         m, s = map(float, parts)
         return m * 60 + s
     elif len(parts) == 3:  # HH:MM:SS 형식
@@ -241,7 +248,7 @@ def humorous_timestamps_prompt_home_alone(video_data, video_title, num_clips = 1
     """.format(
         video_title,
         objective,
-        "".join([f"Timestamp: {segment['time']}\nVideo Caption: {segment['video_caption']}\nAudio Caption: {segment['audio_caption']}\n\n" for segment in video_data]),
+        "".join([format_segment(segment) for segment in video_data]),
         num = num_clips
     )
 
@@ -257,60 +264,266 @@ def load_json(file_path):
     except json.JSONDecodeError:
         print(f"Error: File '{file_path}' is not a valid JSON file.")
 
-async def get_funny_timestamps(merged_output_json_path, video_title, api_key, output_json_path, num_clips = 10):
+def load_caption_data(file_path):
+    """병합된 캡션 읽기 (.json 파일 또는 caption_store 저장소)"""
+    if file_path.endswith('.json'):
+        return load_json(file_path)
+    try:
+        return load_records(file_path)
+    except FileNotFoundError:
+        print(f"Error: Caption store '{file_path}' not found.")
+
+def format_segment(segment):
+    """프롬프트에 들어가는 세그먼트 한 개의 텍스트 (humorous_timestamps_prompt_home_alone과 같은 형식)"""
+    return f"Timestamp: {segment['time']}\nVideo Caption: {segment['video_caption']}\nAudio Caption: {segment['audio_caption']}\n\n"
+
+def get_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def split_into_windows(video_data, max_tokens, model="gpt-4-turbo"):
+    """
+    세그먼트를 순서대로 묶어 각 묶음의 토큰 수가 max_tokens를 넘지 않는 창(window) 목록으로 나눔
+
+    세그먼트 하나가 max_tokens보다 길면 그 세그먼트만 들어간 창을 만듦.
+    """
+    encoding = get_encoding(model)
+    windows = []
+    current, current_tokens = [], 0
+    for segment in video_data:
+        tokens = len(encoding.encode(format_segment(segment)))
+        if current and current_tokens + tokens > max_tokens:
+            windows.append(current)
+            current, current_tokens = [], 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        windows.append(current)
+    return windows
+
+def funny_candidates_ranking_prompt(candidates, video_title, num_clips=10):
+    """
+    구간별로 뽑은 후보들 중 최종 클립을 고르는 프롬프트 생성
+
+    Args:
+        candidates: [{'start': 'HH:MM:SS', 'end': 'HH:MM:SS', 'summary': 구간 대사 요약}, ...]
+        video_title: 비디오 제목
+        num_clips: 최종으로 고를 클립 개수
+    """
+    candidate_lines = "".join(
+        f"[{i}] {candidate['start']} - {candidate['end']}\n{candidate['summary']}\n\n"
+        for i, candidate in enumerate(candidates)
+    )
+    return """
+    You are an expert in comedy analysis. The following candidate segments were pre-selected from different parts of the movie, "Home Alone", titled "{}".
+    Each candidate shows its start and end timestamps followed by the dialogue inside it.
+
+    ***Instructions:***
+    - Rank the candidates by humor and choose the top {num} segments.
+    - Prefer segments spread out across the movie over segments clustered close together.
+    - Use the candidates' start and end timestamps exactly as given.
+    - Do not include descriptions or explanations, only the timestamps.
+
+    ***Candidates:***
+    {}
+
+    ***Output Format:***
+    {{
+        "funniest_timestamps_full": [
+            ["00:02:30", "00:03:30"],
+            ... ({num} pairs in total)
+        ],
+        "funniest_start_timestamps_only": [
+            "00:02:30",
+            ... ({num} timestamps in total)
+        ]
+    }}
+    """.format(video_title, candidate_lines, num=num_clips)
+
+def parse_timestamps_output(output):
+    """LLM 응답 문자열에서 {'funniest_timestamps_full', 'funniest_start_timestamps_only'} JSON을 파싱 (실패하면 None)"""
+    try:
+        output_data = json.loads(output)
+    except json.JSONDecodeError:
+        print("Error: Failed to decode JSON from the output.")
+        return None
+    if "funniest_timestamps_full" not in output_data:
+        print("Error: 'funniest_timestamps_full' is missing from the output.")
+        return None
+    return output_data
+
+async def request_completion(prompt, backend, model="gpt-4-turbo", max_tokens=300, temperature=0.7, cache=None,
+                             refresh_cache=False):
+    """
+    Chat Completion을 호출해 응답 텍스트를 반환
+
+    Args:
+        backend: llm_backend의 백엔드 (OpenAICompatibleBackend, ReplayBackend 등)
+        cache: LLMResponseCache (지정하면 같은 요청은 API를 호출하지 않고 저장된 응답을 사용)
+        refresh_cache: True면 저장된 응답을 무시하고 다시 호출 (새 응답으로 캐시를 덮어씀)
+    """
+    messages = [
+        {"role": "system", "content": "You are an expert in comedy analysis."},
+        {"role": "user", "content": prompt}
+    ]
+    key = llm_cache_key(model, messages, temperature, max_tokens)
+    if cache is not None and not refresh_cache:
+        output = cache.get(key)
+        if output is not None:
+            print(f"[llm cache] 저장된 응답을 사용합니다 ({key[:12]})")
+            # RecordingBackend면 캐시 hit도 기록해서 나중에 재생할 때 빠지는 요청이 없게 함
+            if hasattr(backend, 'record'):
+                backend.record(model, messages, max_tokens, temperature, output)
+            return output
+
+    output = await backend.complete(model, messages, max_tokens=max_tokens, temperature=temperature)
+
+    if cache is not None:
+        # JSON으로 읽히지 않는 응답은 저장하지 않아 다음 실행에서 다시 호출되게 함
+        try:
+            json.loads(output)
+            cache.put(key, model, output)
+        except json.JSONDecodeError:
+            pass
+    return output
+
+def is_valid_pair(pair):
+    """[시작, 끝] 타임스탬프 쌍이 올바른 형식인지 확인"""
+    try:
+        start, end = pair
+        return convert_timestamp_to_seconds(start) <= convert_timestamp_to_seconds(end)
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+def summarize_range(video_data, start, end, encoding, max_tokens=150):
+    """start~end 구간 안 세그먼트들의 대사를 이어 붙여 max_tokens 이내로 자름"""
+    start_seconds, end_seconds = convert_timestamp_to_seconds(start), convert_timestamp_to_seconds(end)
+    text = " ".join(
+        segment['audio_caption'].strip() for segment in video_data
+        if start_seconds <= to_seconds(segment['time']) <= end_seconds and segment['audio_caption'].strip()
+    )
+    tokens = encoding.encode(text)
+    if len(tokens) > max_tokens:
+        text = encoding.decode(tokens[:max_tokens]) + " ..."
+    return text or "(no dialogue)"
+
+async def select_candidates(windows, video_title, candidates_per_window, max_concurrency, model, backend,
+                            cache=None, refresh_cache=False):
+    """창마다 후보 구간을 고르는 호출을 max_concurrency개까지 동시에 실행 (실패한 창은 건너뜀)"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def select(i, window):
+        prompt = humorous_timestamps_prompt_home_alone(window, video_title, num_clips=candidates_per_window)
+        async with semaphore:
+            try:
+                output = await request_completion(prompt, backend, model=model, cache=cache, refresh_cache=refresh_cache)
+            except Exception as e:
+                print(f"Error: 후보 선택 호출 실패 (창 {i + 1}/{len(windows)}): {e}")
+                return []
+        output_data = parse_timestamps_output(output)
+        if output_data is None:
+            return []
+        return [pair for pair in output_data["funniest_timestamps_full"] if is_valid_pair(pair)]
+
+    results = await asyncio.gather(*(select(i, window) for i, window in enumerate(windows)))
+    return [pair for pairs in results for pair in pairs]
+
+async def select_timestamps_output(merged_data, video_title, num_clips, window_tokens, max_concurrency,
+                                   candidates_per_window, model, backend, cache=None, refresh_cache=False):
+    """자막 길이에 따라 한 번 호출하거나 map-reduce로 골라서 최종 응답 텍스트를 반환 (실패하면 None)"""
+    windows = split_into_windows(merged_data, window_tokens, model=model)
+    if len(windows) <= 1:
+        prompt = humorous_timestamps_prompt_home_alone(merged_data, video_title, num_clips = num_clips)
+        return await request_completion(prompt, backend, model=model, cache=cache, refresh_cache=refresh_cache)
+
+    candidates_per_window = candidates_per_window or num_clips
+    print(f"자막을 {len(windows)}개 창으로 나눠 창마다 후보 {candidates_per_window}개를 고릅니다 "
+          f"(동시 호출 {max_concurrency}개).")
+    pairs = await select_candidates(windows, video_title, candidates_per_window, max_concurrency, model, backend,
+                                    cache=cache, refresh_cache=refresh_cache)
+    if not pairs:
+        print("Error: 후보 구간을 하나도 고르지 못했습니다.")
+        return None
+
+    encoding = get_encoding(model)
+    candidates = [
+        {'start': start, 'end': end, 'summary': summarize_range(merged_data, start, end, encoding)}
+        for start, end in sorted(pairs, key=lambda pair: convert_timestamp_to_seconds(pair[0]))
+    ]
+    print(f"후보 {len(candidates)}개 중 최종 {num_clips}개를 고릅니다.")
+    prompt = funny_candidates_ranking_prompt(candidates, video_title, num_clips=num_clips)
+    return await request_completion(prompt, backend, model=model, cache=cache, refresh_cache=refresh_cache)
+
+async def get_funny_timestamps(merged_output_json_path, video_title, api_key, output_json_path, num_clips = 10,
+                               window_tokens=6000, max_concurrency=4, candidates_per_window=None,
+                               model="gpt-4-turbo", cache_path=None, refresh_cache=False, cache_ttl_seconds=None,
+                               backend=None):
     """
     재미있는 순간을 찾아 타임스탬프 생성
+
+    자막 전체가 window_tokens 안에 들어가면 한 번의 호출로 고르고,
+    길면 토큰 수 기준으로 창을 나눠 창마다 후보를 동시에 고른 뒤(map),
+    후보들의 구간과 대사만 모아 한 번 더 호출해서 최종 클립을 고름(reduce).
     
     Args:
-        merged_output_json_path: 병합된 출력 JSON 파일 경로
+        merged_output_json_path: 병합된 캡션 경로 (JSON 파일 또는 caption_store 저장소)
         video_title: 비디오 제목
         api_key: OpenAI API 키
         output_json_path: 출력 JSON 파일 경로
         num_clips: 추출할 클립 개수 (기본값: 10)
+        window_tokens: 창 하나에 넣을 자막의 최대 토큰 수
+        max_concurrency: 동시에 보낼 후보 선택 호출 수
+        candidates_per_window: 창마다 고를 후보 수 (None이면 num_clips)
+        model: 사용할 모델
+        cache_path: 지정하면 LLM 응답을 이 sqlite 파일에 저장해 같은 요청은 다시 호출하지 않음
+        refresh_cache: True면 저장된 응답을 쓰지 않고 새로 호출
+        cache_ttl_seconds: 저장된 응답의 유효 기간 (None이면 만료 없음)
+        backend: LLM 백엔드 (None이면 api_key로 OpenAI API에 요청하는 OpenAICompatibleBackend를 만들어 사용)
     """
-    merged_data = load_json(merged_output_json_path)
+    merged_data = load_caption_data(merged_output_json_path)
     if not merged_data:
         return None
 
-    prompt = humorous_timestamps_prompt_home_alone(merged_data, video_title, num_clips = num_clips)
-    openai.api_key = api_key
-    # OpenAI Chat Completion API call for GPT-4
-    response = await openai.ChatCompletion.acreate(
-        model="gpt-4-turbo",  # Using the GPT-4 model
-        messages=[
-            {"role": "system", "content": "You are an expert in comedy analysis."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=300,
-        temperature=0.7
-    )
-
-    # Extract the text response
-    output = response['choices'][0]['message']['content'].strip()
-    print(output)
-    
+    own_backend = backend is None
+    if own_backend:
+        backend = OpenAICompatibleBackend(api_key=api_key)
+    cache = LLMResponseCache(cache_path, ttl_seconds=cache_ttl_seconds) if cache_path else None
     try:
-        output_data = json.loads(output)
-        
-        # 시작 타임스탬프만 초 단위로 변환하여 저장
-        start_timestamps_seconds = [
-            str(convert_timestamp_to_seconds(ts))
-            for ts in output_data["funniest_start_timestamps_only"]
-        ]
-        
-        # 기존 형식과 호환되는 형태로 저장
-        compatible_output = {
-            "funniest_timestamps": start_timestamps_seconds,
-            # 원본 데이터도 보존
-            "full_timestamps": output_data["funniest_timestamps_full"]
-        }
-        
-        # JSON 파일로 저장
-        with open(output_json_path, 'w', encoding='utf-8') as f:
-            json.dump(compatible_output, f, ensure_ascii=False, indent=4)
-
-        return compatible_output
+        output = await select_timestamps_output(merged_data, video_title, num_clips, window_tokens, max_concurrency,
+                                                candidates_per_window, model, backend, cache, refresh_cache)
+    finally:
+        if own_backend:
+            await backend.close()
+        if cache is not None:
+            cache_stats = cache.stats()
+            print(f"LLM 응답 캐시 - hit: {cache_stats['hits']}, miss: {cache_stats['misses']}")
+            cache.close()
+    if output is None:
+        return None
 
-    except json.JSONDecodeError:
-        print("Error: Failed to decode JSON from the output.")
+    print(output)
+    output_data = parse_timestamps_output(output)
+    if output_data is None:
         return None
+
+    # 시작 타임스탬프만 초 단위로 변환하여 저장
+    start_timestamps_seconds = [
+        str(convert_timestamp_to_seconds(ts))
+        for ts in output_data.get("funniest_start_timestamps_only",
+                                  [pair[0] for pair in output_data["funniest_timestamps_full"]])
+    ]
+
+    # 기존 형식과 호환되는 형태로 저장
+    compatible_output = {
+        "funniest_timestamps": start_timestamps_seconds,
+        # 원본 데이터도 보존
+        "full_timestamps": output_data["funniest_timestamps_full"]
+    }
+
+    # JSON 파일로 저장
+    with open(output_json_path, 'w', encoding='utf-8') as f:
+        json.dump(compatible_output, f, ensure_ascii=False, indent=4)
+
+    return compatible_output
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+from caption_store import AUDIO_CAPTION_SCHEMA, CaptionStore, load_records, save_records, to_seconds
+from inference_device import prepare_model, resolve_device
+from model_registry import registry
+
+# CPU에서도 빠른 작은 문장 임베딩 모델 (384차원)
+TEXT_ENCODER_ID = "sentence-transformers/all-MiniLM-L6-v2"
+INDEX_VERSION = 1
+
+
+def load_text_encoder(device="cpu", num_threads=None):
+    """문장 임베딩 모델 로드 (model_registry를 통해 한 번만 로드)"""
+    device = resolve_device(device)
+
+    def load():
+        tokenizer = AutoTokenizer.from_pretrained(TEXT_ENCODER_ID)
+        model = AutoModel.from_pretrained(TEXT_ENCODER_ID)
+        return tokenizer, prepare_model(model, device, num_threads=num_threads)
+
+    return registry.get(f"{TEXT_ENCODER_ID}:{device}", load)
+
+
+def encode_texts(texts, tokenizer, model, batch_size=64, max_length=128):
+    """문장 목록을 L2 정규화된 float32 임베딩 (N, D)으로 변환 (토큰 임베딩의 mask 평균)"""
+    device = next(model.parameters()).device
+    embeddings = []
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            batch = tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                              max_length=max_length, return_tensors="pt").to(device)
+            hidden = model(**batch).last_hidden_state
+            mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            embeddings.append(torch.nn.functional.normalize(pooled, dim=-1).float().cpu().numpy())
+    if not embeddings:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+    return np.concatenate(embeddings)
+
+
+def segment_text(segment):
+    """세그먼트 하나의 검색용 텍스트 (대사 + 장면 설명)"""
+    audio = (segment.get('audio_caption') or '').strip()
+    video = "; ".join(dict.fromkeys(segment.get('video_caption') or []))
+    return f"{audio} | {video}" if audio and video else (audio or video)
+
+
+def segment_ranges(merged_data, last_segment_seconds=5.0):
+    """세그먼트마다 (시작 초, 다음 세그먼트 시작 초) 구간"""
+    starts = [to_seconds(segment['time']) for segment in merged_data]
+    ends = starts[1:] + ([starts[-1] + last_segment_seconds] if starts else [])
+    return list(zip(starts, ends))
+
+
+def build_index(merged_caption_path, index_dir, device="cpu", batch_size=64, num_threads=None):
+    """
+    병합된 캡션(.json 또는 caption_store 저장소)으로 검색 인덱스 폴더를 만듦
+
+    index_dir/
+        embeddings.npy  - 세그먼트 임베딩 (N, D) float16, 검색할 때 메모리 매핑으로 열림
+        segments.cap    - 세그먼트 구간(start/end)과 텍스트 (caption_store)
+        meta.json       - 모델 ID, 차원, 세그먼트 수
+    """
+    merged_data = load_records(merged_caption_path)
+    # 구간은 빈 세그먼트까지 포함한 순서로 계산하고, 검색할 텍스트가 없는 세그먼트만 뺌
+    rows = [(start, end, segment_text(segment))
+            for (start, end), segment in zip(segment_ranges(merged_data), merged_data)]
+    rows = [row for row in rows if row[2]]
+    texts = [text for _, _, text in rows]
+    tokenizer, model = load_text_encoder(device, num_threads=num_threads)
+    embeddings = encode_texts(texts, tokenizer, model, batch_size=batch_size)
+
+    tmp_dir = f"{index_dir}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'embeddings.npy'), embeddings.astype(np.float16))
+    save_records(
+        os.path.join(tmp_dir, 'segments.cap'),
+        [{'start': start, 'end': end, 'text': text} for start, end, text in rows],
+        AUDIO_CAPTION_SCHEMA
+    )
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': INDEX_VERSION,
+            'model_id': TEXT_ENCODER_ID,
+            'dim': int(embeddings.shape[1]),
+            'num_segments': len(rows),
+            'source': os.path.abspath(merged_caption_path),
+        }, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir)
+    os.replace(tmp_dir, index_dir)
+    print(f"검색 인덱스 생성 완료: 세그먼트 {len(rows)}개 -> {index_dir}")
+    return index_dir
+
+
+def top_k_scores(embeddings, query_vector, top_k, chunk_rows=65536):
+    """메모리 매핑된 float16 임베딩과 질의 벡터의 내적을 chunk 단위로 계산해 상위 top_k (인덱스, 점수) 반환"""
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    scores = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), chunk_rows):
+        chunk = np.asarray(embeddings[start:start + chunk_rows], dtype=np.float32)
+        scores[start:start + len(chunk)] = chunk @ query_vector
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    idx = np.argpartition(-scores, top_k - 1)[:top_k]
+    idx = idx[np.argsort(-scores[idx], kind='stable')]
+    return idx, scores[idx]
+
+
+class RetrievalIndex:
+    """
+    build_index로 만든 인덱스 폴더를 열어 자유 문장으로 구간을 검색
+
+    결과의 (start, end)는 초 단위 숫자라서 final_video.cut_video에 그대로 넘길 수 있음.
+    """
+    def __init__(self, index_dir, device="cpu"):
+        self.index_dir = index_dir
+        self.device = device
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"지원하지 않는 인덱스 버전입니다: {self.meta.get('version')}")
+        self.embeddings = np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r')
+        self.segments = CaptionStore(os.path.join(index_dir, 'segments.cap'))
+        self.starts = self.segments.column('start')
+        self.ends = self.segments.column('end')
+
+    def __len__(self):
+        return len(self.segments)
+
+    def encode_query(self, query):
+        tokenizer, model = load_text_encoder(self.device)
+        return encode_texts([query], tokenizer, model)[0]
+
+    def search_vector(self, query_vector, top_k=5):
+        """질의 임베딩으로 검색해서 [(start, end, score), ...]를 점수 순서로 반환"""
+        idx, scores = top_k_scores(self.embeddings, query_vector, top_k)
+        return [(float(self.starts[i]), float(self.ends[i]), float(score)) for i, score in zip(idx, scores)]
+
+    def search(self, query, top_k=5):
+        """자유 문장으로 검색해서 [(start, end, score), ...]를 점수 순서로 반환"""
+        return self.search_vector(self.encode_query(query), top_k)
+
+    def text(self, start_time):
+        """start_time에 시작하는 세그먼트의 텍스트 (결과 확인용)"""
+        lo, hi = self.segments.time_range(start_time, start_time)
+        return self.segments.texts('text', lo, hi)[0] if hi > lo else ''
+
+
+if __name__ == "__main__":
+    # 사용법:
+    #   python retrieval_index.py build <merged_caption 경로> <인덱스 폴더>
+    #   python retrieval_index.py search <인덱스 폴더> "<질의>" [결과 수] [<입력 비디오> <클립 저장 폴더>]
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        build_index(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) >= 4 and sys.argv[1] == "search":
+        index = RetrievalIndex(sys.argv[2])
+        results = index.search(sys.argv[3], top_k=int(sys.argv[4]) if len(sys.argv) > 4 else 5)
+        for start, end, score in results:
+            print(f"{start:9.2f} - {end:9.2f}  {score:.3f}  {index.text(start)[:100]}")
+        if len(sys.argv) > 6:
+            from final_video import cut_video
+            for start, end, _ in results:
+                cut_video((start, end), sys.argv[5], sys.argv[6], "search")
+    else:
+        print("사용법: python retrieval_index.py build|search ...")
@@ -0,0 +1,96 @@
+import itertools
+import cv2
+import numpy as np
+
+# 히스토그램 비교용 썸네일 크기와 채널별 양자화 단계 (4 x 4 x 4 = 64 bins)
+THUMBNAIL_SIZE = (64, 36)
+HIST_BITS = 2
+
+
+def frame_thumbnail(frame):
+    """RGB 프레임을 비교용 작은 썸네일로 축소"""
+    return cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def color_histograms(thumbnails):
+    """
+    썸네일 배열 (N, H, W, 3)의 정규화된 색상 히스토그램 (N, 64)을 한 번에 계산
+    """
+    thumbnails = np.asarray(thumbnails, dtype=np.uint8)
+    shift = 8 - HIST_BITS
+    quantized = (thumbnails >> shift).astype(np.int64)
+    bins = 1 << HIST_BITS
+    codes = (quantized[..., 0] * bins + quantized[..., 1]) * bins + quantized[..., 2]
+    codes = codes.reshape(len(thumbnails), -1)
+
+    num_bins = bins ** 3
+    # 프레임마다 bin 번호를 겹치지 않게 밀어 놓고 bincount 한 번으로 전체 히스토그램 계산
+    offsets = np.arange(len(thumbnails))[:, None] * num_bins
+    hist = np.bincount((codes + offsets).ravel(), minlength=len(thumbnails) * num_bins)
+    hist = hist.reshape(len(thumbnails), num_bins).astype(np.float32)
+    return hist / codes.shape[1]
+
+
+def shot_change_scores(thumbnails):
+    """
+    연속한 썸네일 사이의 (히스토그램 거리, 평균 픽셀 차이)를 계산
+
+    Returns:
+        hist_dist: (N-1,) 0~1 범위의 히스토그램 거리 (0.5 * L1)
+        pixel_diff: (N-1,) 0~1 범위의 평균 절대 픽셀 차이
+    """
+    thumbnails = np.asarray(thumbnails, dtype=np.uint8)
+    hist = color_histograms(thumbnails)
+    hist_dist = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1)
+    gray = thumbnails.astype(np.float32).mean(axis=-1)
+    pixel_diff = np.abs(np.diff(gray, axis=0)).mean(axis=(1, 2)) / 255.0
+    return hist_dist, pixel_diff
+
+
+def select_keyframes(frames, min_interval_seconds=1.0, max_interval_seconds=10.0,
+                     hist_threshold=0.35, pixel_threshold=0.12, block_size=16):
+    """
+    샷 전환을 감지해 샷마다 키프레임을 고르는 제너레이터
+
+    샷이 바뀌면 새 샷의 첫 프레임을 내보내고, 같은 샷이 길게 이어지면 max_interval_seconds마다
+    한 장씩 더 내보냄. 키프레임 사이 간격은 min_interval_seconds보다 짧아지지 않음.
+
+    Args:
+        frames: (초 단위 시각, RGB 배열)을 내보내는 iterable (분석 간격으로 촘촘하게 샘플링된 프레임)
+        min_interval_seconds: 키프레임 사이 최소 간격
+        max_interval_seconds: 키프레임 사이 최대 간격
+        hist_threshold: 샷 전환으로 판단할 히스토그램 거리
+        pixel_threshold: 샷 전환으로 판단할 평균 픽셀 차이
+        block_size: 프레임을 이 수만큼 모아 히스토그램/차이를 한 번에 계산 (결과에는 영향 없음)
+    """
+    frames = iter(frames)
+    prev_thumbnail = None
+    last_emit = None
+    pending_shot = False
+
+    while True:
+        block = list(itertools.islice(frames, max(1, block_size)))
+        if not block:
+            break
+        thumbnails = [frame_thumbnail(frame) for _, frame in block]
+        # 이전 블록의 마지막 썸네일을 앞에 붙여 블록 경계의 전환도 같은 계산에서 잡음
+        if prev_thumbnail is not None:
+            thumbnails.insert(0, prev_thumbnail)
+        shot_changes = np.zeros(len(block), dtype=bool)
+        if len(thumbnails) > 1:
+            hist_dist, pixel_diff = shot_change_scores(np.stack(thumbnails))
+            shot_changes[len(block) - len(hist_dist):] = (hist_dist > hist_threshold) | (pixel_diff > pixel_threshold)
+        prev_thumbnail = thumbnails[-1]
+
+        for (timestamp, frame), shot_change in zip(block, shot_changes):
+            pending_shot = pending_shot or bool(shot_change)
+            if last_emit is None:
+                emit = True
+            else:
+                elapsed = timestamp - last_emit
+                emit = elapsed >= max_interval_seconds or (pending_shot and elapsed >= min_interval_seconds)
+
+            if emit:
+                last_emit = timestamp
+                pending_shot = False
+                yield timestamp, frame
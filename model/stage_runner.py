@@ -0,0 +1,396 @@
+import os
+import json
+import asyncio
+import functools
+import hashlib
+import inspect
+import shutil
+import threading
+import time
+from checkpoint_log import CHECKPOINT_SUFFIX
+
+
+def hash_file(file_path, chunk_size=1 << 20, cache_path=None):
+    """
+    파일 내용의 sha256 해시를 계산 (경로/크기/수정시각 기준으로 캐시)
+
+    Args:
+        file_path: 해시를 계산할 파일 경로
+        chunk_size: 한 번에 읽을 바이트 수
+        cache_path: 해시 캐시 JSON 경로 (None이면 캐시하지 않음)
+    """
+    stat = os.stat(file_path)
+    cache_key = f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
+        if cache_key in cache:
+            return cache[cache_key]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    file_hash = digest.hexdigest()
+
+    if cache_path:
+        cache[cache_key] = file_hash
+        _atomic_write_json(cache_path, cache)
+    return file_hash
+
+
+def _atomic_write_json(path, data):
+    """임시 파일에 쓴 뒤 교체하여 중간에 죽어도 깨진 JSON이 남지 않도록 저장"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Stage:
+    """
+    파이프라인의 한 단계
+
+    Args:
+        name: 단계 이름 (산출물 폴더 이름으로도 사용)
+        func: 실행할 함수. 입력/출력 이름과 params를 키워드 인자로 받음 (async 함수 가능)
+        inputs: 이 단계가 읽는 산출물 이름 목록 (소스 파일 또는 다른 단계의 출력)
+        outputs: {출력 이름: 파일/폴더 이름} 딕셔너리
+        model: 사용하는 모델 이름 (캐시 키에 포함)
+        params: 함수에 넘길 추가 파라미터 (캐시 키에 포함)
+        resources: 실행 중 차지하는 자원 {자원 이름: 양} (예: {'cpu': 4, 'gpu_memory_gb': 3})
+                   func가 cpu_threads 인자를 받으면 실제로 받은 'cpu' 슬롯 수를 넘겨서
+                   그 단계의 추론/디코딩/워커 스레드 수로 쓰게 함
+    """
+    def __init__(self, name, func, inputs=(), outputs=None, model=None, params=None, resources=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = dict(outputs or {})
+        self.model = model
+        self.params = dict(params or {})
+        self.resources = dict(resources or {})
+
+
+class ResourcePool:
+    """
+    동시에 실행되는 단계들이 코어/메모리를 초과해서 쓰지 않도록 자원 슬롯을 나눠주는 풀
+
+    요청한 자원이 모두 남아 있을 때까지 기다렸다가 한꺼번에 가져감.
+    용량보다 큰 요청은 용량만큼으로 줄여서 영원히 기다리지 않도록 함.
+    """
+    def __init__(self, capacities=None):
+        self.capacities = dict(capacities or {})
+        self.available = dict(self.capacities)
+        self._condition = None
+
+    def _clamp(self, request):
+        return {
+            name: min(amount, self.capacities[name])
+            for name, amount in request.items()
+            if name in self.capacities
+        }
+
+    async def acquire(self, request):
+        request = self._clamp(request)
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: all(self.available[name] >= amount for name, amount in request.items())
+            )
+            for name, amount in request.items():
+                self.available[name] -= amount
+        return request
+
+    async def release(self, request):
+        async with self._condition:
+            for name, amount in request.items():
+                self.available[name] += amount
+            self._condition.notify_all()
+
+
+class StageRunner:
+    """
+    산출물을 내용 해시로 관리하는 단계 실행기
+
+    각 단계의 출력은 (입력 해시, 모델 이름, 파라미터)로 만든 키 폴더에 저장되며,
+    같은 키의 완료 표시(_stage.json)가 있으면 단계를 건너뜀.
+    중간에 죽은 경우 마지막으로 완료된 단계부터 이어서 실행됨.
+    """
+    DONE_MARKER = '_stage.json'
+
+    def __init__(self, artifact_root, sources, resource_slots=None, max_workers=4):
+        """
+        Args:
+            artifact_root: 산출물을 저장할 루트 폴더
+            sources: {산출물 이름: 파일 경로} 형태의 원본 입력 (예: 입력 비디오)
+            resource_slots: 동시에 쓸 수 있는 자원 용량 {자원 이름: 양} (Stage.resources와 같은 이름 사용)
+            max_workers: 동기 함수 단계를 동시에 실행할 최대 개수
+        """
+        self.artifact_root = artifact_root
+        self.sources = dict(sources)
+        self.stages = []
+        self.keys = {}
+        self.paths = {}
+        self.timings = {}
+        self.wall_time = 0.0
+        self.resources = ResourcePool(resource_slots)
+        self.max_workers = max_workers
+        self._thread_slots = None
+        os.makedirs(artifact_root, exist_ok=True)
+
+    def add_stage(self, stage):
+        names = {s.name for s in self.stages}
+        if stage.name in names:
+            raise ValueError(f"이미 등록된 단계입니다: {stage.name}")
+        for output_name in stage.outputs:
+            if output_name in self.sources or any(output_name in s.outputs for s in self.stages):
+                raise ValueError(f"출력 이름이 중복됩니다: {output_name}")
+        self.stages.append(stage)
+        return stage
+
+    def _producer(self, artifact_name):
+        for stage in self.stages:
+            if artifact_name in stage.outputs:
+                return stage
+        return None
+
+    def _ordered_stages(self, targets=None):
+        """targets 단계까지 필요한 단계들을 의존 순서대로 반환"""
+        by_name = {stage.name: stage for stage in self.stages}
+        wanted = targets or [stage.name for stage in self.stages]
+        ordered = []
+        visiting = set()
+
+        def visit(stage):
+            if stage in ordered:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"단계 사이에 순환 의존이 있습니다: {stage.name}")
+            visiting.add(stage.name)
+            for input_name in stage.inputs:
+                producer = self._producer(input_name)
+                if producer is not None:
+                    visit(producer)
+                elif input_name not in self.sources:
+                    raise ValueError(f"'{stage.name}' 단계의 입력을 찾을 수 없습니다: {input_name}")
+            visiting.discard(stage.name)
+            ordered.append(stage)
+
+        for name in wanted:
+            if name not in by_name:
+                raise ValueError(f"등록되지 않은 단계입니다: {name}")
+            visit(by_name[name])
+        return ordered
+
+    def _source_key(self, name):
+        if name not in self.keys:
+            path = self.sources[name]
+            cache_path = os.path.join(self.artifact_root, 'source_hashes.json')
+            if os.path.isdir(path):
+                raise ValueError(f"소스 입력은 파일이어야 합니다: {path}")
+            self.keys[name] = hash_file(path, cache_path=cache_path)
+            self.paths[name] = path
+        return self.keys[name]
+
+    def stage_key(self, stage):
+        """입력 해시 + 모델 이름 + 파라미터로 단계 키 계산"""
+        input_keys = {}
+        for input_name in stage.inputs:
+            if input_name in self.sources:
+                input_keys[input_name] = self._source_key(input_name)
+            else:
+                input_keys[input_name] = self.keys[input_name]
+        payload = json.dumps({
+            'stage': stage.name,
+            'model': stage.model,
+            'params': stage.params,
+            'inputs': input_keys,
+            'outputs': stage.outputs,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def stage_dir(self, stage, key):
+        return os.path.join(self.artifact_root, stage.name, key[:16])
+
+    def _is_done(self, stage_dir, key, output_paths):
+        marker = os.path.join(stage_dir, self.DONE_MARKER)
+        if not os.path.exists(marker):
+            return False
+        try:
+            with open(marker, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        return info.get('key') == key and all(os.path.exists(p) for p in output_paths.values())
+
+    def _prepare(self, stage):
+        """단계 키와 입력/출력 경로를 계산하고 이미 완료되었는지 반환"""
+        key = self.stage_key(stage)
+        stage_dir = self.stage_dir(stage, key)
+        output_paths = {
+            name: os.path.join(stage_dir, filename)
+            for name, filename in stage.outputs.items()
+        }
+        input_paths = {name: self.paths[name] for name in stage.inputs}
+        done = self._is_done(stage_dir, key, output_paths)
+        return key, stage_dir, input_paths, output_paths, done
+
+    def _record(self, stage, key, output_paths):
+        for name, path in output_paths.items():
+            self.keys[name] = hashlib.sha256(f"{key}:{name}".encode('utf-8')).hexdigest()
+            self.paths[name] = path
+
+    async def _execute(self, stage, stage_dir, input_paths, output_paths, granted=None, resume=True):
+        # 이전에 중간에 죽은 실행의 잔여물은 지우고 다시 시작
+        # (resume이면 체크포인트 로그는 남겨서 단계 함수가 끝난 부분부터 이어서 실행할 수 있게 함)
+        if os.path.exists(stage_dir):
+            for entry in os.listdir(stage_dir):
+                path = os.path.join(stage_dir, entry)
+                if resume and entry.endswith(CHECKPOINT_SUFFIX):
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+        os.makedirs(stage_dir, exist_ok=True)
+
+        kwargs = {**input_paths, **output_paths, **stage.params}
+        if granted and 'cpu' in granted and 'cpu_threads' in inspect.signature(stage.func).parameters:
+            # 자원 풀에서 받은 코어 수만큼만 스레드를 쓰게 해서 동시에 도는 단계끼리 코어를 나눠 씀
+            kwargs['cpu_threads'] = max(1, int(granted['cpu']))
+        call = functools.partial(stage.func, **kwargs)
+        if inspect.iscoroutinefunction(stage.func):
+            return await call()
+        # 동기 함수는 별도 스레드에서 실행해 다른 단계와 겹쳐 돌 수 있게 함
+        async with self._thread_slots:
+            result = await self._run_in_thread(stage.name, call)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    @staticmethod
+    async def _run_in_thread(name, call):
+        """
+        동기 단계 함수를 데몬 스레드에서 실행하고 결과를 기다림
+
+        다른 단계가 실패해서 이 작업이 취소되면 스레드가 끝나기를 기다리지 않고 바로 돌아감
+        (스레드는 데몬이라 프로세스 종료도 막지 않음).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def settle(method, value):
+            if not future.done():
+                method(value)
+
+        def target():
+            try:
+                result = call()
+            except BaseException as e:
+                outcome = (future.set_exception, e)
+            else:
+                outcome = (future.set_result, result)
+            try:
+                loop.call_soon_threadsafe(settle, *outcome)
+            except RuntimeError:
+                # 이벤트 루프가 이미 닫힘 (실패로 실행이 먼저 끝난 경우)
+                pass
+
+        threading.Thread(target=target, name=f"stage-{name}", daemon=True).start()
+        return await future
+
+    def _finish(self, stage, key, stage_dir, output_paths, elapsed):
+        missing = [p for p in output_paths.values() if not os.path.exists(p)]
+        if missing:
+            raise RuntimeError(f"'{stage.name}' 단계가 출력을 만들지 못했습니다: {missing}")
+        _atomic_write_json(os.path.join(stage_dir, self.DONE_MARKER), {
+            'key': key,
+            'stage': stage.name,
+            'model': stage.model,
+            'params': stage.params,
+            'inputs': {name: self.keys[name] for name in stage.inputs},
+            'outputs': output_paths,
+            'elapsed_seconds': elapsed,
+            'finished_at': time.time(),
+        })
+
+    async def run(self, targets=None, force=()):
+        """
+        단계들을 의존 순서대로 실행하고 {산출물 이름: 경로}를 반환
+
+        서로 의존하지 않는 단계(예: 비디오 캡션과 오디오 캡션)는 자원 슬롯이 허락하는 만큼 동시에 실행되며,
+        각 단계는 입력을 만드는 단계가 모두 끝나는 즉시 시작됨.
+
+        Args:
+            targets: 실행할 단계 이름 목록 (None이면 전체, 필요한 선행 단계는 자동 포함)
+            force: 캐시를 무시하고 다시 실행할 단계 이름 목록 (뒤따르는 단계도 다시 실행됨)
+        """
+        run_start = time.time()
+        for source_name in self.sources:
+            self._source_key(source_name)
+
+        # 다시 실행된 단계의 출력을 쓰는 단계도 다시 실행
+        fresh_outputs = set()
+        tasks = {}
+
+        async def run_stage(stage):
+            producers = {self._producer(name) for name in stage.inputs} - {None}
+            await asyncio.gather(*(tasks[producer.name] for producer in producers))
+
+            key, stage_dir, input_paths, output_paths, done = self._prepare(stage)
+            stale = stage.name in force or any(name in fresh_outputs for name in stage.inputs)
+            if done and not stale:
+                print(f"[{stage.name}] 이전 결과를 재사용합니다: {stage_dir}")
+                self._record(stage, key, output_paths)
+                return
+
+            held = await self.resources.acquire(stage.resources)
+            try:
+                print(f"[{stage.name}] 실행 중... ({stage_dir})")
+                start_time = time.time()
+                # 강제로 다시 돌리거나 입력이 새로 만들어진 경우에는 이전 체크포인트를 쓰지 않음
+                await self._execute(stage, stage_dir, input_paths, output_paths, held, resume=not stale)
+                elapsed = time.time() - start_time
+            finally:
+                await self.resources.release(held)
+            self._finish(stage, key, stage_dir, output_paths, elapsed)
+            self._record(stage, key, output_paths)
+            fresh_outputs.update(output_paths)
+            self.timings[stage.name] = elapsed
+            print(f"[{stage.name}] 완료 ({elapsed:.2f}초)")
+
+        self._thread_slots = asyncio.Semaphore(self.max_workers)
+        for stage in self._ordered_stages(targets):
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            # 한 단계가 실패하면 나머지 단계는 취소하고, 이미 돌고 있는 긴 동기 단계가 끝나기를 기다리지 않음
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.wall_time = time.time() - run_start
+
+        return dict(self.paths)
+
+    def report_timings(self):
+        """이번 실행에서 실제로 돌린 단계별 소요 시간과 전체 소요 시간 출력"""
+        print("\n=== 단계별 소요 시간 ===")
+        for name, elapsed in self.timings.items():
+            print(f"- {name}: {elapsed:.2f}초")
+        print(f"단계 시간 합계: {sum(self.timings.values()):.2f}초, 실제 전체 소요 시간: {self.wall_time:.2f}초")
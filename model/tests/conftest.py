@@ -0,0 +1,26 @@
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+
+# model/ 모듈들은 서로 모듈 이름으로 import하므로 (python main.py처럼) model/ 폴더를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SOURCE_FPS = 25
+
+
+@pytest.fixture(scope='session')
+def source_video(tmp_path_factory):
+    """20초, 25fps, 1초마다 키프레임, 소리가 있는 테스트 영상 (ffmpeg/ffprobe가 없으면 건너뜀)"""
+    if not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+        pytest.skip('ffmpeg/ffprobe가 필요합니다')
+    path = str(tmp_path_factory.mktemp('source') / 'source.mp4')
+    subprocess.run([
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f"testsrc2=size=160x120:rate={SOURCE_FPS}:duration=20",
+        '-f', 'lavfi', '-i', 'sine=frequency=440:duration=20',
+        '-c:v', 'libx264', '-g', str(SOURCE_FPS), '-keyint_min', str(SOURCE_FPS), '-sc_threshold', '0', '-bf', '0',
+        '-c:a', 'aac', '-shortest', path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return path
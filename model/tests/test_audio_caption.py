@@ -0,0 +1,104 @@
+import os
+import stat
+import subprocess
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('whisper_timestamped')
+audio_caption = pytest.importorskip('audio_caption')
+
+
+def fake_ffmpeg(tmp_path, monkeypatch, num_samples, returncode):
+    """stdout보다 먼저 stderr로 파이프 버퍼(64KB)보다 많이 쓰는 가짜 ffmpeg를 PATH 맨 앞에 둠"""
+    script = tmp_path / 'ffmpeg'
+    script.write_text(
+        "#!/usr/bin/env python3\n"
+        "import sys\n"
+        "sys.stderr.write('w' * (1 << 18))\n"
+        "sys.stderr.flush()\n"
+        f"sys.stdout.buffer.write(b'\\x00' * 4 * {num_samples})\n"
+        f"sys.exit({returncode})\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_load_audio_pcm_does_not_block_on_a_full_stderr(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, num_samples=1 << 18, returncode=0)
+    audio = audio_caption.load_audio_pcm('input.mp4')
+    assert audio.dtype == np.float32 and len(audio) == 1 << 18
+
+
+def test_load_audio_pcm_raises_with_the_captured_stderr(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, num_samples=16, returncode=1)
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        audio_caption.load_audio_pcm('input.mp4')
+    assert error.value.returncode == 1
+    assert len(error.value.stderr) == 1 << 18
+
+
+def test_load_audio_pcm_rejects_empty_output(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, num_samples=0, returncode=0)
+    with pytest.raises(RuntimeError):
+        audio_caption.load_audio_pcm('input.mp4')
+
+
+def noise_with_silences(sample_rate, seconds, silences):
+    """seconds초 길이의 잡음 중 silences [(시작 초, 끝 초), ...] 구간만 조용한 합성 오디오"""
+    audio = np.random.default_rng(0).uniform(-0.5, 0.5, int(seconds * sample_rate)).astype(np.float32)
+    for start, end in silences:
+        audio[int(start * sample_rate):int(end * sample_rate)] = 0.0
+    return audio
+
+
+def check_chunks_cover(chunks, total, max_samples):
+    assert chunks[0][0] == 0 and chunks[-1][1] == total
+    assert all(end == next_start for (_, end), (next_start, _) in zip(chunks, chunks[1:]))
+    assert all(0 < end - start <= max_samples for start, end in chunks)
+
+
+def test_find_silence_splits_cuts_inside_silences():
+    sample_rate = 1000
+    audio = noise_with_silences(sample_rate, 100, [(22, 24), (47, 49), (71, 73)])
+    chunks = audio_caption.find_silence_splits(audio, sample_rate=sample_rate, max_chunk_seconds=30.0,
+                                               min_chunk_seconds=10.0)
+    check_chunks_cover(chunks, len(audio), 30 * sample_rate)
+    splits = [start / sample_rate for start, _ in chunks[1:]]
+    assert len(splits) == 3
+    for split, (silence_start, silence_end) in zip(splits, [(22, 24), (47, 49), (71, 73)]):
+        assert silence_start <= split <= silence_end
+
+
+def test_find_silence_splits_keeps_short_audio_whole():
+    audio = np.zeros(5000, dtype=np.float32)
+    assert audio_caption.find_silence_splits(audio, sample_rate=1000, max_chunk_seconds=5.0) == [(0, 5000)]
+
+
+@pytest.mark.parametrize('min_chunk_seconds', [10.0, 30.0])
+def test_find_silence_splits_hard_cuts_when_min_is_not_below_max(min_chunk_seconds):
+    sample_rate = 1000
+    audio = noise_with_silences(sample_rate, 45, [])
+    chunks = audio_caption.find_silence_splits(audio, sample_rate=sample_rate, max_chunk_seconds=10.0,
+                                               min_chunk_seconds=min_chunk_seconds)
+    check_chunks_cover(chunks, len(audio), 10 * sample_rate)
+    assert [start for start, _ in chunks] == [0, 10000, 20000, 30000, 40000]
+
+
+def test_stitch_transcriptions_shifts_chunks_to_global_time():
+    first = {'text': ' hello ', 'language': 'en', 'segments': [
+        {'id': 0, 'start': 0.5, 'end': 1.0, 'text': 'hello',
+         'words': [{'text': 'hello', 'start': 0.5, 'end': 1.0}]},
+    ]}
+    second = {'text': 'world', 'language': 'en', 'segments': [
+        {'id': 0, 'start': 0.25, 'end': 2.0, 'text': 'world'},
+        {'id': 1, 'start': 2.5, 'end': 3.0, 'text': 'again'},
+    ]}
+    # 병렬 실행에서는 끝나는 순서대로 들어오므로 순서를 섞어서 넘김
+    result = audio_caption.stitch_transcriptions([(30.0, second), (0.0, first)])
+    assert result['text'] == 'hello world' and result['language'] == 'en'
+    assert [segment['id'] for segment in result['segments']] == [0, 1, 2]
+    assert [(segment['start'], segment['end']) for segment in result['segments']] == [
+        (0.5, 1.0), (30.25, 32.0), (32.5, 33.0)]
+    assert result['segments'][0]['words'] == [{'text': 'hello', 'start': 0.5, 'end': 1.0}]
+    assert second['segments'][0]['start'] == 0.25  # 입력 결과는 바꾸지 않음
@@ -0,0 +1,56 @@
+import itertools
+import cv2
+import numpy as np
+import caption_cache
+from caption_cache import CaptionCache, perceptual_hash
+
+
+def textured_frame(seed, size=(180, 320)):
+    """부드러운 무늬가 있는 RGB 프레임 (축소/밝기 변화에도 pHash가 유지되는 정도의 저주파 성분)"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(9, 16, 3)).astype(np.uint8)
+    return cv2.resize(small, size[::-1], interpolation=cv2.INTER_CUBIC)
+
+
+def test_phash_survives_resizing_and_brightness_changes():
+    frame = textured_frame(0)
+    resized = cv2.resize(frame, (160, 90), interpolation=cv2.INTER_AREA)
+    brighter = np.clip(frame.astype(np.int16) + 6, 0, 255).astype(np.uint8)
+    assert perceptual_hash(resized) == perceptual_hash(frame) == perceptual_hash(brighter)
+    assert perceptual_hash(textured_frame(1)) != perceptual_hash(frame)
+    assert -(1 << 63) <= perceptual_hash(frame) < (1 << 63)
+
+
+def test_cache_hits_for_a_similar_frame_and_is_scoped_by_model(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    cache = CaptionCache(db_path, 'blip')
+    frame = textured_frame(0)
+    cache.put_many([perceptual_hash(frame)], ['a boy in a house'])
+    resized = cv2.resize(frame, (160, 90), interpolation=cv2.INTER_AREA)
+    assert cache.get_many([perceptual_hash(resized), perceptual_hash(textured_frame(1))]) == [
+        'a boy in a house', None]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    cache.close()
+
+    # 다시 열어도 남아 있고, 다른 모델 ID로는 보이지 않음
+    reopened = CaptionCache(db_path, 'blip')
+    other = CaptionCache(db_path, 'blip:int8')
+    assert reopened.get_many([perceptual_hash(frame)]) == ['a boy in a house']
+    assert other.get_many([perceptual_hash(frame)]) == [None]
+    reopened.close()
+    other.close()
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(caption_cache.time, 'time', lambda: float(next(clock)))
+    cache = CaptionCache(str(tmp_path / 'cache.sqlite'), 'blip', max_entries=3)
+    cache.put_many([1, 2, 3], ['one', 'two', 'three'])
+    assert cache.get_many([1]) == ['one']  # 1을 최근에 쓴 항목으로 만듦
+    cache.put_many([4], ['four'])  # 가장 오래 안 쓴 2가 빠짐
+    assert cache.get_many([1, 2, 3, 4]) == ['one', None, 'three', 'four']
+    cache.get_many([4])  # 1과 3보다 4를 더 최근에 씀
+    cache.put_many([5, 6], ['five', 'six'])
+    assert cache.get_many([1, 3, 4, 5, 6]) == [None, None, 'four', 'five', 'six']
+    assert cache.stats()['evictions'] == 3
+    cache.close()
@@ -0,0 +1,41 @@
+import pytest
+from caption_store import (
+    AUDIO_CAPTION_SCHEMA, MERGED_CAPTION_SCHEMA, CaptionStore, load_records, save_records
+)
+
+MERGED_RECORDS = [
+    {'time': 0.0, 'audio_caption': '', 'video_caption': ['빈 방']},
+    {'time': 1.5, 'audio_caption': 'Kevin!', 'video_caption': []},
+    {'time': 3.25, 'audio_caption': '케빈 어디 있니?', 'video_caption': ['a man yells', '', 'ünïcödé']},
+    {'time': 10.0, 'audio_caption': 'end', 'video_caption': ['last']},
+]
+
+
+@pytest.mark.parametrize('name', ['merged.cap', 'merged.json'])
+def test_records_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    save_records(path, MERGED_RECORDS, MERGED_CAPTION_SCHEMA)
+    assert load_records(path) == MERGED_RECORDS
+
+
+def test_time_strings_are_stored_as_seconds(tmp_path):
+    path = str(tmp_path / 'audio.cap')
+    save_records(path, [{'start': '00:01:02.500', 'end': 63, 'text': 'x'}], AUDIO_CAPTION_SCHEMA)
+    assert load_records(path) == [{'start': 62.5, 'end': 63.0, 'text': 'x'}]
+
+
+def test_store_reads_rows_by_time_range(tmp_path):
+    path = str(tmp_path / 'merged.cap')
+    save_records(path, MERGED_RECORDS, MERGED_CAPTION_SCHEMA, attrs={'language': 'en'})
+    store = CaptionStore(path)
+    assert len(store) == len(MERGED_RECORDS)
+    assert store.attrs == {'language': 'en'}
+    assert store.slice_time(1.5, 3.25) == MERGED_RECORDS[1:3]
+    assert store.slice_time(4.0, 9.0) == []
+    assert store.texts('video_caption', 2, 4) == [MERGED_RECORDS[2]['video_caption'], ['last']]
+
+
+def test_empty_store_round_trip(tmp_path):
+    path = str(tmp_path / 'empty.cap')
+    save_records(path, [], MERGED_CAPTION_SCHEMA)
+    assert load_records(path) == []
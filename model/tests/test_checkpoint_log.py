@@ -0,0 +1,40 @@
+import json
+import pytest
+from checkpoint_log import CheckpointLog
+
+
+def test_checkpoint_log_round_trip(tmp_path):
+    path = str(tmp_path / 'stage.ckpt')
+    with CheckpointLog(path) as log:
+        for i in range(5):
+            log.append({'index': i, 'caption': f"캡션 {i}"})
+    assert CheckpointLog(path).load() == [{'index': i, 'caption': f"캡션 {i}"} for i in range(5)]
+
+
+@pytest.mark.parametrize('tail', [b'{"index": 3, "capt', b'{"index": 3}', b'not json\n'])
+def test_checkpoint_log_resumes_after_truncated_record(tmp_path, tail):
+    path = str(tmp_path / 'stage.ckpt')
+    with CheckpointLog(path) as log:
+        for i in range(3):
+            log.append({'index': i})
+    # 쓰는 도중에 죽어서 마지막 줄이 끊긴 경우
+    with open(path, 'ab') as f:
+        f.write(tail)
+
+    log = CheckpointLog(path)
+    records = log.load()
+    assert records == [{'index': i} for i in range(3)]
+    # 이어서 실행하면 끝난 작업은 건너뛰고 나머지만 기록
+    done = {record['index'] for record in records}
+    for i in range(5):
+        if i not in done:
+            log.append({'index': i})
+    log.close()
+
+    assert CheckpointLog(path).load() == [{'index': i} for i in range(5)]
+    with open(path, 'rb') as f:
+        assert [json.loads(line) for line in f] == [{'index': i} for i in range(5)]
+
+
+def test_missing_checkpoint_log_is_empty(tmp_path):
+    assert CheckpointLog(str(tmp_path / 'missing.ckpt')).load() == []
@@ -0,0 +1,111 @@
+import random
+from caption_store import to_seconds
+from concat import merge_captions, to_datetime
+
+
+def merge_captions_reference(audio_caption, video_caption):
+    """기존 merge_captions (오디오 구간마다 모든 비디오 캡션을 strptime으로 비교) - 비교 기준용"""
+    merged_data = []
+    for audio in audio_caption:
+        start_time = to_datetime(str(audio['start_formatted']))
+        end_time = to_datetime(str(audio['end_formatted']))
+        merged_data.append({
+            'time': audio['start_formatted'],
+            'audio_caption': audio['text'],
+            'video_caption': [
+                video['caption']
+                for video in video_caption
+                if start_time <= to_datetime(str(video['time'])) <= end_time
+            ]
+        })
+    return merged_data
+
+
+def synthetic_captions(num_segments, num_frames, seed=0):
+    """대사 구간과 공백이 섞인 오디오 구간 / 임의 시각의 비디오 캡션 (시간 순서)"""
+    rng = random.Random(seed)
+    duration = num_frames * 1.0
+    step = duration / num_segments
+    audio_caption = []
+    for i in range(num_segments):
+        start = i * step + rng.uniform(0, step * 0.3)
+        end = start + rng.uniform(step * 0.3, step * 0.7)
+        audio_caption.append({'start_formatted': round(start, 2), 'end_formatted': round(end, 2), 'text': f"line {i}"})
+    frame_times = sorted(rng.uniform(0, duration) for _ in range(num_frames))
+    video_caption = [
+        {'time': f"{int(t) // 3600:02}:{int(t) % 3600 // 60:02}:{t % 60:06.3f}", 'caption': f"frame {i}"}
+        for i, t in enumerate(frame_times)
+    ]
+    return audio_caption, video_caption
+
+
+def overlapping_captions():
+    """서로 겹치는 오디오 구간 (한 프레임이 두 구간에 속함) + 구간 경계와 같은 시각의 프레임"""
+    audio_caption = [
+        {'start_formatted': '00:00:01.000', 'end_formatted': '00:00:04.000', 'text': 'a'},
+        {'start_formatted': '00:00:03.000', 'end_formatted': '00:00:06.000', 'text': 'b'},
+        {'start_formatted': '00:00:06.000', 'end_formatted': '00:00:06.500', 'text': 'c'},
+    ]
+    video_caption = [
+        {'time': '00:00:01.000', 'caption': 'v1'},
+        {'time': '00:00:03.500', 'caption': 'v3.5'},
+        {'time': '00:00:05.000', 'caption': 'v5'},
+        {'time': '00:00:06.000', 'caption': 'v6'},
+    ]
+    return audio_caption, video_caption
+
+
+def gapped_captions():
+    """대사 사이 공백에 프레임이 있는 경우 (연속된 공백 프레임 + 맨 앞/맨 뒤 공백)"""
+    audio_caption = [
+        {'start_formatted': 2.0, 'end_formatted': 3.0, 'text': 'a'},
+        {'start_formatted': 6.0, 'end_formatted': 7.0, 'text': 'b'},
+    ]
+    video_caption = [{'time': f"00:00:{t:06.3f}", 'caption': f"v{t}"}
+                     for t in (0.5, 2.5, 4.0, 4.5, 5.0, 6.5, 9.0)]
+    return audio_caption, video_caption
+
+
+def test_matches_reference_merge_on_overlapping_segments():
+    audio_caption, video_caption = overlapping_captions()
+    merged = merge_captions(audio_caption, video_caption, include_gaps=False)
+    assert merged == merge_captions_reference(audio_caption, video_caption)
+    assert [entry['video_caption'] for entry in merged] == [['v1', 'v3.5'], ['v3.5', 'v5', 'v6'], ['v6']]
+
+
+def test_unsorted_video_captions_are_merged_in_time_order():
+    audio_caption, video_caption = overlapping_captions()
+    shuffled = list(reversed(video_caption))
+    assert merge_captions(audio_caption, shuffled) == merge_captions(audio_caption, video_caption)
+
+
+def test_matches_reference_merge_on_synthetic_captions():
+    audio_caption, video_caption = synthetic_captions(200, 200, seed=3)
+    assert merge_captions(audio_caption, video_caption, include_gaps=False) == \
+        merge_captions_reference(audio_caption, video_caption)
+
+
+def test_gap_captions_are_inserted_in_time_order():
+    audio_caption, video_caption = gapped_captions()
+    merged = merge_captions(audio_caption, video_caption)
+
+    # 공백 항목을 빼면 기존 구현과 같음
+    assert [entry for entry in merged if entry['audio_caption']] == \
+        merge_captions_reference(audio_caption, video_caption)
+    assert [(to_seconds(entry['time']), entry['audio_caption'], entry['video_caption']) for entry in merged] == [
+        (0.5, '', ['v0.5']),
+        (2.0, 'a', ['v2.5']),
+        (4.0, '', ['v4.0', 'v4.5', 'v5.0']),
+        (6.0, 'b', ['v6.5']),
+        (9.0, '', ['v9.0']),
+    ]
+
+
+def test_every_video_caption_is_kept_once_outside_overlaps():
+    audio_caption, video_caption = synthetic_captions(200, 500, seed=1)
+    merged = merge_captions(audio_caption, video_caption)
+    gap_captions = [caption for entry in merged if not entry['audio_caption'] for caption in entry['video_caption']]
+    covered = {caption for entry in merged if entry['audio_caption'] for caption in entry['video_caption']}
+    assert not covered & set(gap_captions)
+    assert covered | set(gap_captions) == {video['caption'] for video in video_caption}
+    assert [to_seconds(entry['time']) for entry in merged] == sorted(to_seconds(entry['time']) for entry in merged)
@@ -0,0 +1,92 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from final_video import (
+    clip_filename, cut_clips, cut_clips_single_pass, merge_clip_ranges, probe_clip, reserve_output_path,
+    snap_clip_ranges
+)
+
+FPS = 25
+
+
+def test_clip_filename_replaces_unsafe_characters():
+    assert clip_filename('Home Alone: 2/3', 1.5, 4.0, 3) == 'Home_Alone_2_3_03_1.50-4.00.mp4'
+    assert clip_filename(None, 0, 1) == 'clip_0.00-1.00.mp4'
+
+
+def test_reserve_output_path_never_hands_out_the_same_path(tmp_path):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(executor.map(lambda _: reserve_output_path(str(tmp_path), 'clip.mp4'), range(20)))
+    assert len(set(paths)) == 20
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in paths)
+    assert 'clip.mp4' in os.listdir(tmp_path) and 'clip_19.mp4' in os.listdir(tmp_path)
+
+
+def test_cut_clips_keeps_input_order(tmp_path, source_video):
+    timestamp_pairs = [('00:00:05', '00:00:07'), ('bad', 'pair'), ('00:00:01', '00:00:03'), ('00:00:05', '00:00:07')]
+    outputs = cut_clips(timestamp_pairs, source_video, str(tmp_path / 'clips'), 'home alone', max_workers=2)
+
+    assert outputs[1] is None
+    assert len({outputs[0], outputs[2], outputs[3]}) == 3  # 같은 구간도 서로 다른 파일로 저장
+    assert os.path.basename(outputs[0]).startswith('home_alone_01_5.00-7.00')
+    for output in (outputs[0], outputs[2], outputs[3]):
+        info = probe_clip(output)
+        assert info['frames'] > 0
+        assert abs(info['frames'] / info['frame_rate'] - 2.0) <= 1.0  # 스트림 복사라 키프레임 단위로만 정확함
+
+
+def test_merge_clip_ranges_sorts_and_merges_overlaps():
+    clips = [(1, 30.0, 33.0), (2, 5.0, 10.0), (3, 8.0, 12.0), (4, 6.0, 7.0), (5, 12.0, 14.0)]
+    assert merge_clip_ranges(clips) == [
+        (5.0, 12.0, [2, 4, 3]),
+        (12.0, 14.0, [5]),  # 끝과 시작이 맞닿기만 하면 합치지 않음
+        (30.0, 33.0, [1]),
+    ]
+    assert merge_clip_ranges([]) == []
+
+
+def test_snap_clip_ranges_widens_to_keyframes_and_remerges():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+    groups = [(1.0, 2.5, [1]), (3.5, 5.0, [2]), (6.0, 7.0, [3]), (8.5, 9.0, [4])]
+    assert snap_clip_ranges(groups, keyframes) == [
+        (0.0, 6.0, [1, 2]),  # [0, 4]와 [2, 6]이 키프레임에 맞추면서 겹침
+        (6.0, 8.0, [3]),
+        (8.0, None, [4]),  # 마지막 키프레임 뒤는 파일 끝까지
+    ]
+    with pytest.raises(ValueError):
+        snap_clip_ranges([(8.5, 9.0, [1]), (9.5, 10.0, [2])], keyframes)
+    with pytest.raises(ValueError):
+        # 확인한 범위(window_seconds) 밖의 키프레임은 쓰지 않음
+        snap_clip_ranges([(7.5, 8.0, [1])], [0.0, 8.0], window_seconds=5.0)
+
+
+SINGLE_PASS_PAIRS = [
+    ('00:00:09', '00:00:11'),
+    ('00:00:02.5', '00:00:04.2'),
+    ('bad', 'pair'),
+    ('00:00:10', '00:00:12.5'),
+    ('00:00:17.5', '00:00:20'),
+]
+
+
+def check_single_pass_results(results, output_dir):
+    """SINGLE_PASS_PAIRS를 자른 결과가 키프레임 단위 GOP 전체를 담고 영상/소리가 같이 시작하는지 확인"""
+    assert [result['status'] for result in results] == ['ok', 'ok', 'invalid', 'ok', 'ok']
+    assert [result['cut_range'] for result in results] == [(9.0, 13.0), (2.0, 5.0), None, (9.0, 13.0), (17.0, None)]
+    assert results[0]['merged_with'] == [4] and results[3]['merged_with'] == [1]
+    assert results[0]['output'] == results[3]['output']
+
+    expected_frames = {(2.0, 5.0): 3 * FPS, (9.0, 13.0): 4 * FPS, (17.0, None): 3 * FPS}
+    outputs = {result['cut_range']: result['output'] for result in results if result['output']}
+    assert sorted(os.listdir(output_dir)) == sorted(os.path.basename(path) for path in outputs.values())
+    for cut_range, output in outputs.items():
+        info = probe_clip(output)
+        assert info['frames'] == expected_frames[cut_range], cut_range
+        assert info['video_start'] == pytest.approx(0.0, abs=1 / FPS)
+        assert info['audio_start'] == pytest.approx(info['video_start'], abs=1 / FPS)
+
+
+def test_single_pass_clips_cover_whole_gops(tmp_path, source_video):
+    output_dir = str(tmp_path / 'clips')
+    results = cut_clips_single_pass(SINGLE_PASS_PAIRS, source_video, output_dir, 'home alone')
+    check_single_pass_results(results, output_dir)
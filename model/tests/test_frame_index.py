@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+from frame_index import merge_frame_hits, quantize_embeddings  # noqa: E402
+
+
+def test_quantize_embeddings_round_trips_within_half_a_step():
+    embeddings = np.random.default_rng(0).normal(size=(50, 16)).astype(np.float32)
+    quantized, scales = quantize_embeddings(embeddings)
+    assert quantized.dtype == np.int8 and scales.dtype == np.float32
+    assert quantized.shape == embeddings.shape and scales.shape == (50,)
+    assert (np.abs(quantized).max(axis=1) == 127).all()
+    error = np.abs(quantized * scales[:, None] - embeddings)
+    assert (error <= scales[:, None] / 2 + 1e-6).all()
+
+
+def test_quantize_embeddings_handles_zero_rows_and_empty_input():
+    quantized, scales = quantize_embeddings(np.zeros((2, 4), dtype=np.float32))
+    assert (quantized == 0).all() and np.isfinite(scales).all()
+    quantized, scales = quantize_embeddings(np.zeros((0, 4), dtype=np.float32))
+    assert quantized.shape == (0, 4) and scales.shape == (0,)
+
+
+def test_merge_frame_hits_joins_nearby_frames_and_sorts_by_score():
+    hits = [(10.0, 0.2), (0.5, 0.3), (12.0, 0.5), (30.0, 0.4), (2.0, 0.1), (14.5, 0.25)]
+    assert merge_frame_hits(hits, gap_seconds=3.0, pad_seconds=1.0) == [
+        (9.0, 15.5, 0.5, 3),
+        (29.0, 31.0, 0.4, 1),
+        (0.0, 3.0, 0.3, 2),  # 시작은 0초 아래로 내려가지 않음
+    ]
+
+
+def test_merge_frame_hits_splits_when_gap_is_exceeded():
+    ranges = merge_frame_hits([(0.0, 0.1), (3.5, 0.2)], gap_seconds=3.0, pad_seconds=0.0)
+    assert ranges == [(3.5, 3.5, 0.2, 1), (0.0, 0.0, 0.1, 1)]
+    assert merge_frame_hits([]) == []
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from final_video import cut_clips_single_pass, probe_clip
+from keyframe_index import KeyframeIndex, load_keyframe_index, smart_cut
+from test_final_video import FPS, SINGLE_PASS_PAIRS, check_single_pass_results
+
+
+def test_keyframe_lookups_and_frame_count():
+    pts = np.arange(0, 10, 0.5)
+    index = KeyframeIndex(pts, np.array([0.0, 4.0, 8.0]), {'r_frame_rate': '2/1'})
+    assert index.frame_rate == 2.0
+    assert index.keyframe_at_or_before(3.9) == 0.0 and index.keyframe_at_or_before(4.0) == 4.0
+    assert index.keyframe_at_or_after(4.1) == 8.0 and index.keyframe_at_or_after(8.1) is None
+    assert index.frame_count(1.0, 4.0) == 6  # [1.0, 4.0)
+
+
+def test_index_is_cached_and_skips_rescans(tmp_path, source_video):
+    cache_dir = str(tmp_path / 'keyframes')
+    assert load_keyframe_index(source_video, cache_dir, build=False) is None
+    index = load_keyframe_index(source_video, cache_dir)
+    assert len(index.pts) == 20 * FPS
+    assert np.allclose(index.keyframes, np.arange(20))
+    cached = load_keyframe_index(source_video, cache_dir, build=False)
+    assert np.array_equal(cached.pts, index.pts) and cached.stream == index.stream
+
+
+@pytest.mark.parametrize('start, end', [(2.2, 7.6), (3.0, 6.0), (4.44, 4.92)])
+def test_smart_cut_is_frame_accurate(tmp_path, source_video, start, end):
+    index = load_keyframe_index(source_video, str(tmp_path / 'keyframes'))
+    output_path = str(tmp_path / 'cut.mp4')
+    smart_cut(index, source_video, start, end, output_path)
+    info = probe_clip(output_path)
+    assert info['frames'] == index.frame_count(start, end)
+
+
+def test_single_pass_with_keyframe_index(tmp_path, source_video):
+    index = load_keyframe_index(source_video, str(tmp_path / 'keyframes'))
+    output_dir = str(tmp_path / 'clips')
+    results = cut_clips_single_pass(SINGLE_PASS_PAIRS, source_video, output_dir, 'home alone', keyframe_index=index)
+    check_single_pass_results(results, output_dir)
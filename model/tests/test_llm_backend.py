@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from llm_backend import OpenAICompatibleBackend, RecordingBackend, ReplayBackend, start_stub_server
+from llm_cache import LLMResponseCache
+
+MESSAGES = [{'role': 'user', 'content': 'funny?'}]
+
+
+def echo(model, messages):
+    return f'{{"model": "{model}", "prompt": "{messages[-1]["content"]}"}}'
+
+
+def test_recorded_responses_replay_without_fallback(tmp_path):
+    recordings = str(tmp_path / 'recordings.jsonl')
+
+    async def record():
+        backend = RecordingBackend(ReplayBackend(fallback=echo), recordings)
+        first = await backend.complete('gpt-4-turbo', MESSAGES, max_tokens=50, temperature=0.0)
+        second = await backend.complete('gpt-4o', MESSAGES)
+        await backend.close()
+        return first, second
+
+    async def replay():
+        backend = ReplayBackend(recordings)
+        return (await backend.complete('gpt-4-turbo', MESSAGES, max_tokens=50, temperature=0.0),
+                await backend.complete('gpt-4o', MESSAGES))
+
+    recorded = asyncio.run(record())
+    assert asyncio.run(replay()) == recorded
+
+
+def test_replay_rejects_unrecorded_request(tmp_path):
+    backend = ReplayBackend(str(tmp_path / 'missing.jsonl'))
+    with pytest.raises(KeyError):
+        # 같은 메시지라도 temperature가 다르면 다른 요청
+        asyncio.run(backend.complete('gpt-4-turbo', MESSAGES, temperature=0.1))
+
+
+def test_cache_hits_are_recorded_for_replay(tmp_path):
+    pytest.importorskip('tiktoken')
+    from prompt import request_completion
+
+    recordings = str(tmp_path / 'recordings.jsonl')
+    cache = LLMResponseCache(str(tmp_path / 'llm.sqlite'))
+    live = ReplayBackend(fallback=echo)
+
+    async def run(backend, cache=None):
+        return [await request_completion(prompt, backend, cache=cache) for prompt in ('a', 'b')]
+
+    # 첫 실행은 캐시만 채우고, 두 번째 실행은 캐시 hit만으로 끝나지만 기록은 남아야 함
+    expected = asyncio.run(run(live, cache))
+    recorder = RecordingBackend(live, recordings)
+    assert asyncio.run(run(recorder, cache)) == expected
+    asyncio.run(recorder.close())
+    assert live.calls == 2
+    cache.close()
+
+    assert asyncio.run(run(ReplayBackend(recordings))) == expected
+
+
+def test_http_backend_through_stub_server(tmp_path):
+    async def run():
+        runner, base_url = await start_stub_server(ReplayBackend(fallback=echo))
+        backend = OpenAICompatibleBackend(base_url=base_url, max_retries=0)
+        try:
+            return await asyncio.gather(*(
+                backend.complete('gpt-4-turbo', [{'role': 'user', 'content': str(i)}]) for i in range(4)
+            ))
+        finally:
+            await backend.close()
+            await runner.cleanup()
+
+    assert asyncio.run(run()) == [echo('gpt-4-turbo', [{'content': str(i)}]) for i in range(4)]
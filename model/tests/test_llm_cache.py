@@ -0,0 +1,79 @@
+import pytest
+import llm_cache
+from llm_cache import LLMResponseCache, llm_cache_key
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache.time, 'time', clock.time)
+    return clock
+
+
+def test_key_depends_on_every_request_field():
+    messages = [{'role': 'user', 'content': 'hi'}]
+    key = llm_cache_key('gpt-4-turbo', messages, 0.7, 300)
+    assert key == llm_cache_key('gpt-4-turbo', [dict(messages[0])], 0.7, 300)
+    assert len({
+        key,
+        llm_cache_key('gpt-4o', messages, 0.7, 300),
+        llm_cache_key('gpt-4-turbo', [{'role': 'user', 'content': 'hello'}], 0.7, 300),
+        llm_cache_key('gpt-4-turbo', messages, 0.0, 300),
+        llm_cache_key('gpt-4-turbo', messages, 0.7, 100),
+    }) == 5
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / 'llm.sqlite'), ttl_seconds=60)
+    cache.put('a', 'gpt', '{"x": 1}')
+    clock.now += 59
+    assert cache.get('a') == '{"x": 1}'
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'evictions': 1}
+    cache.close()
+
+
+def test_put_evicts_expired_entries(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / 'llm.sqlite'), ttl_seconds=60)
+    cache.put('old', 'gpt', 'old')
+    clock.now += 61
+    cache.put('new', 'gpt', 'new')
+    assert cache.evictions == 1
+    assert cache.get('new') == 'new'
+    assert cache.get('old') is None
+    cache.close()
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / 'llm.sqlite'), max_entries=2)
+    cache.put('a', 'gpt', 'A')
+    clock.now += 1
+    cache.put('b', 'gpt', 'B')
+    clock.now += 1
+    assert cache.get('a') == 'A'  # a를 최근에 사용했으므로 b가 먼저 밀려남
+    clock.now += 1
+    cache.put('c', 'gpt', 'C')
+    assert cache.evictions == 1
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    cache.close()
+
+
+def test_entries_survive_reopen(tmp_path):
+    path = str(tmp_path / 'llm.sqlite')
+    cache = LLMResponseCache(path)
+    cache.put('a', 'gpt', 'A')
+    cache.close()
+    reopened = LLMResponseCache(path)
+    assert reopened.get('a') == 'A'
+    reopened.close()
@@ -0,0 +1,76 @@
+import threading
+import pytest
+import model_registry
+from model_registry import ModelRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(model_registry.time, 'time', clock)
+    # 가짜 모델은 {'bytes': 크기} 딕셔너리로 나타냄
+    monkeypatch.setattr(model_registry, '_tensor_bytes', lambda value: value['bytes'])
+    return clock
+
+
+def loader(size, loads):
+    def load():
+        loads.append(size)
+        return {'bytes': size}
+    return load
+
+
+def test_models_are_loaded_once_and_shared_between_threads(clock):
+    registry = ModelRegistry()
+    loads = []
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get('m', loader(1, loads))))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [1] and all(result is results[0] for result in results)
+    assert registry.stats()['m']['uses'] == 8
+    with pytest.raises(KeyError):
+        registry.get('unknown')
+
+
+def test_idle_models_are_evicted_and_reloaded_on_demand(clock):
+    registry = ModelRegistry(idle_seconds=60)
+    loads = []
+    registry.get('a', loader(1, loads))
+    clock.now += 30
+    registry.get('b', loader(2, loads))
+    clock.now += 40  # a는 70초, b는 40초 동안 쓰이지 않음
+    registry.get('b')
+    assert not registry.stats()['a']['loaded'] and registry.stats()['b']['loaded']
+
+    registry.get('a')  # 등록된 로더로 다시 로드
+    assert loads == [1, 2, 1] and registry.stats()['a']['loads'] == 2
+
+
+def test_budget_evicts_least_recently_used_models_first(clock):
+    registry = ModelRegistry(memory_budget_bytes=10)
+    loads = []
+    for name, size in (('a', 4), ('b', 4)):
+        registry.get(name, loader(size, loads))
+        clock.now += 1
+    registry.get('a')  # b가 가장 오래 안 쓴 모델이 됨
+    clock.now += 1
+    registry.get('c', loader(4, loads))
+    stats = registry.stats()
+    assert [name for name in 'abc' if stats[name]['loaded']] == ['a', 'c']
+    assert registry.resident_bytes() == 8
+
+    # 방금 요청한 모델은 한도보다 커도 내리지 않고, 나머지를 모두 내림
+    registry.get('big', loader(20, loads))
+    assert [name for name, info in registry.stats().items() if info['loaded']] == ['big']
@@ -0,0 +1,44 @@
+import numpy as np
+from moment_ranker import filter_segments, select_windows
+
+
+def spiky_score(length=600, spikes=((100, 3.0), (300, 5.0), (500, 4.0), (590, 1.0))):
+    score = np.full(length, -0.5)
+    for position, value in spikes:
+        score[position] = value
+    return score
+
+
+def test_select_windows_picks_the_strongest_moments_in_time_order():
+    windows = select_windows(spiky_score(), top_k=2, window_seconds=60.0, context_seconds=15.0)
+    assert len(windows) == 2
+    (first_start, first_end, first_score), (second_start, second_end, second_score) = windows
+    # 가장 강한 두 순간(300초, 500초)이 시간 순서로, 앞뒤 문맥을 포함한 구간 안에 들어감
+    assert first_start + 15 <= 300 < first_end - 15 and second_start + 15 <= 500 < second_end - 15
+    assert first_end - first_start == second_end - second_start == 60 + 2 * 15
+    assert first_score > second_score > 0
+
+
+def test_select_windows_does_not_overlap_and_clips_to_the_video():
+    score = spiky_score(spikes=((5, 3.0), (20, 2.5), (300, 1.0)))
+    windows = select_windows(score, top_k=10, window_seconds=60.0, context_seconds=0.0)
+    assert len(windows) == 10
+    assert windows[0][0] == 0.0 and windows[-1][1] == 600.0
+    assert all(prev_end <= next_start for (_, prev_end, _), (next_start, _, _) in zip(windows, windows[1:]))
+    # 5초와 20초는 한 구간 폭 안이라 같은 구간에 들어가고, 점수가 있는 구간은 순간이 있는 두 구간뿐
+    scored = [(start, end) for start, end, value in windows if value > 0]
+    assert len(scored) == 2
+    assert scored[0][0] <= 5 and 20 < scored[0][1] and scored[1][0] <= 300 < scored[1][1]
+
+
+def test_select_windows_handles_a_video_shorter_than_the_window():
+    windows = select_windows(np.array([0.0, 2.0, 0.0]), top_k=3, window_seconds=60.0, context_seconds=15.0)
+    assert windows == [(0.0, 3.0, windows[0][2])]
+
+
+def test_filter_segments_keeps_segments_starting_inside_any_window():
+    segments = [{'time': f"00:00:{second:02d}", 'text': str(second)} for second in range(0, 60, 5)]
+    windows = [(30.0, 40.0, 1.0), (0.0, 10.0, 2.0), (38.0, 45.0, 0.5)]  # 겹치는 구간은 합쳐짐
+    kept = filter_segments(segments, windows)
+    assert [segment['text'] for segment in kept] == ['0', '5', '10', '30', '35', '40', '45']
+    assert filter_segments(segments, []) == [] and filter_segments([], windows) == []
@@ -0,0 +1,89 @@
+import re
+import json
+import asyncio
+import pytest
+import prompt
+from llm_backend import ReplayBackend
+
+
+class WordEncoding:
+    """공백 단위로 토큰을 세는 가짜 tiktoken 인코딩 (네트워크 없이 실행)"""
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def word_encoding(monkeypatch):
+    monkeypatch.setattr(prompt, 'get_encoding', lambda model: WordEncoding())
+
+
+def hms(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def segments(num_segments=40, step=10):
+    return [{'time': hms(i * step), 'video_caption': f"scene {i}", 'audio_caption': f"line number {i}"}
+            for i in range(num_segments)]
+
+
+def segment_tokens(segment):
+    return len(prompt.format_segment(segment).split())
+
+
+def test_split_into_windows_respects_the_token_limit_and_order():
+    data = segments()
+    per_segment = segment_tokens(data[0])
+    windows = prompt.split_into_windows(data, max_tokens=per_segment * 6)
+    assert [segment for window in windows for segment in window] == data
+    assert all(sum(segment_tokens(segment) for segment in window) <= per_segment * 6 for window in windows)
+    assert [len(window) for window in windows] == [6] * 6 + [4]
+
+
+def test_split_into_windows_keeps_an_oversized_segment_alone():
+    data = segments(3)
+    data[1] = dict(data[1], audio_caption=" ".join(["word"] * 100))
+    windows = prompt.split_into_windows(data, max_tokens=segment_tokens(data[0]) * 2)
+    assert [[segment['time'] for segment in window] for window in windows] == [
+        ['00:00:00'], ['00:00:10'], ['00:00:20']]
+
+
+def scripted_llm(failing_window_start=None):
+    """창 프롬프트에는 창의 처음~끝 구간(과 잘못된 쌍 하나)을, 순위 프롬프트에는 앞쪽 후보들을 돌려주는 가짜 LLM"""
+    def respond(model, messages):
+        content = messages[-1]['content']
+        if 'pre-selected' in content:
+            num_clips = int(re.search(r'choose the top (\d+)', content).group(1))
+            pairs = [list(pair) for pair in re.findall(r'\[\d+\] (\S+) - (\S+)', content)][:num_clips]
+            return json.dumps({'funniest_timestamps_full': pairs,
+                               'funniest_start_timestamps_only': [start for start, _ in pairs]})
+        times = re.findall(r'Timestamp: (\S+)', content)
+        if times[0] == failing_window_start:
+            raise RuntimeError("server error")
+        return json.dumps({'funniest_timestamps_full': [[times[0], times[-1]], ['later', 'never']]})
+    return respond
+
+
+def test_map_reduce_selection_ranks_candidates_from_every_window():
+    data = segments()
+    backend = ReplayBackend(fallback=scripted_llm(failing_window_start='00:02:00'), latency_seconds=0.01)
+    window_tokens = segment_tokens(data[0]) * 6
+    output = asyncio.run(prompt.select_timestamps_output(
+        data, 'home_alone', num_clips=3, window_tokens=window_tokens, max_concurrency=2,
+        candidates_per_window=1, model='gpt-4-turbo', backend=backend))
+    # 창 7개 + 순위 호출 1개, 동시 호출은 max_concurrency 이하
+    assert backend.calls == 8 and backend.max_in_flight <= 2
+    # 실패한 창(00:02:00부터)과 잘못된 쌍은 빠지고, 후보는 시각 순서로 정렬되어 순위 프롬프트에 들어감
+    assert json.loads(output)['funniest_timestamps_full'] == [
+        ['00:00:00', '00:00:50'], ['00:01:00', '00:01:50'], ['00:03:00', '00:03:50']]
+
+
+def test_short_captions_use_a_single_call():
+    data = segments(5)
+    backend = ReplayBackend(fallback=lambda model, messages: '{"funniest_timestamps_full": []}')
+    output = asyncio.run(prompt.select_timestamps_output(
+        data, 'home_alone', num_clips=3, window_tokens=10_000, max_concurrency=2,
+        candidates_per_window=None, model='gpt-4-turbo', backend=backend))
+    assert backend.calls == 1 and json.loads(output) == {'funniest_timestamps_full': []}
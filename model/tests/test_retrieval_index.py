@@ -0,0 +1,59 @@
+import os
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+from caption_store import AUDIO_CAPTION_SCHEMA, save_records  # noqa: E402
+from retrieval_index import (  # noqa: E402
+    INDEX_VERSION, TEXT_ENCODER_ID, RetrievalIndex, segment_ranges, segment_text, top_k_scores,
+)
+
+
+def test_segment_ranges_end_at_the_next_segment():
+    segments = [{'time': '00:00:00'}, {'time': '00:00:04.5'}, {'time': 12}]
+    assert segment_ranges(segments) == [(0.0, 4.5), (4.5, 12.0), (12.0, 17.0)]
+    assert segment_ranges(segments, last_segment_seconds=1.0)[-1] == (12.0, 13.0)
+    assert segment_ranges([]) == []
+
+
+def test_segment_text_joins_dialogue_and_unique_scene_captions():
+    assert segment_text({'audio_caption': ' hi ', 'video_caption': ['a boy', 'a boy', 'a dog']}) == 'hi | a boy; a dog'
+    assert segment_text({'audio_caption': '', 'video_caption': ['a boy']}) == 'a boy'
+    assert segment_text({'audio_caption': 'hi', 'video_caption': None}) == 'hi'
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 100, 65536])
+def test_top_k_scores_matches_a_full_sort(tmp_path, chunk_rows):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / 'embeddings.npy')
+    np.save(path, rng.standard_normal((250, 16)).astype(np.float16))
+    embeddings = np.load(path, mmap_mode='r')
+    query = rng.standard_normal(16).astype(np.float32)
+    expected = np.asarray(embeddings, dtype=np.float32) @ query
+
+    idx, scores = top_k_scores(embeddings, query, 10, chunk_rows=chunk_rows)
+    assert list(idx) == list(np.argsort(-expected, kind='stable')[:10])
+    np.testing.assert_allclose(scores, expected[idx], rtol=1e-6)
+    assert len(top_k_scores(embeddings, query, 1000, chunk_rows=chunk_rows)[0]) == 250
+    assert len(top_k_scores(embeddings, query, 0)[0]) == 0
+
+
+def test_retrieval_index_returns_segment_ranges_and_text(tmp_path):
+    index_dir = str(tmp_path / 'index')
+    os.makedirs(index_dir)
+    embeddings = np.eye(4, dtype=np.float16)
+    np.save(os.path.join(index_dir, 'embeddings.npy'), embeddings)
+    save_records(os.path.join(index_dir, 'segments.cap'),
+                 [{'start': i * 2.0, 'end': i * 2.0 + 2.0, 'text': f"segment {i}"} for i in range(4)],
+                 AUDIO_CAPTION_SCHEMA)
+    with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'model_id': TEXT_ENCODER_ID, 'dim': 4, 'num_segments': 4}, f)
+
+    index = RetrievalIndex(index_dir)
+    assert len(index) == 4
+    results = index.search_vector(np.array([0.1, 0.0, 0.9, 0.3], dtype=np.float32), top_k=2)
+    assert [(start, end) for start, end, _ in results] == [(4.0, 6.0), (6.0, 8.0)]
+    assert results[0][2] == pytest.approx(0.9, abs=1e-3)
+    assert index.text(4.0) == 'segment 2' and index.text(5.0) == ''
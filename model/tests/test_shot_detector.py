@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from shot_detector import select_keyframes
+
+# (시작 초, RGB 색) - 각 색이 다음 시작 전까지 이어지는 합성 샷
+SHOTS = [(0.0, (200, 30, 30)), (3.0, (30, 200, 30)), (3.5, (30, 30, 200)), (20.0, (220, 220, 220))]
+
+
+def synthetic_frames(seconds=26.0, step=0.5, size=(72, 128)):
+    """SHOTS의 색으로 채운 프레임을 step초마다 (시각, RGB 배열)로 반환 (같은 샷 안에서는 약한 잡음만 있음)"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for timestamp in np.arange(0.0, seconds, step):
+        color = [color for start, color in SHOTS if start <= timestamp][-1]
+        noise = rng.integers(-4, 5, size=(*size, 3))
+        frames.append((float(timestamp), np.clip(np.array(color) + noise, 0, 255).astype(np.uint8)))
+    return frames
+
+
+def keyframe_times(frames, **kwargs):
+    return [timestamp for timestamp, _ in select_keyframes(frames, **kwargs)]
+
+
+def test_select_keyframes_follows_shot_changes_and_interval_limits():
+    times = keyframe_times(synthetic_frames(), min_interval_seconds=1.0, max_interval_seconds=10.0)
+    # 3초 전환은 바로, 3.5초 전환은 최소 간격 때문에 4초로 밀리고, 긴 샷은 10초마다, 20초 전환은 바로
+    assert times == [0.0, 3.0, 4.0, 14.0, 20.0]
+
+
+@pytest.mark.parametrize('block_size', [1, 3, 7, 64])
+def test_select_keyframes_does_not_depend_on_block_size(block_size):
+    frames = synthetic_frames()
+    assert keyframe_times(frames, block_size=block_size) == keyframe_times(frames)
+
+
+def test_select_keyframes_yields_the_original_frames():
+    frames = synthetic_frames(seconds=4.0)
+    selected = list(select_keyframes(frames, block_size=3))
+    by_time = dict(frames)
+    assert all(frame is by_time[timestamp] for timestamp, frame in selected)
+    assert list(select_keyframes([])) == []
@@ -0,0 +1,109 @@
+import os
+import asyncio
+import pytest
+from stage_runner import Stage, StageRunner
+
+
+def make_runner(root, source, calls, suffix=''):
+    """source -> upper -> count 두 단계 파이프라인 (실행된 단계 이름을 calls에 기록)"""
+    def write_upper(source, upper_output):
+        calls.append('upper')
+        with open(source, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with open(upper_output, 'w', encoding='utf-8') as f:
+            f.write(text.upper())
+
+    def write_count(upper_output, count_output, suffix):
+        calls.append('count')
+        with open(upper_output, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with open(count_output, 'w', encoding='utf-8') as f:
+            f.write(f"{len(text)}{suffix}")
+
+    runner = StageRunner(os.path.join(root, 'artifacts'), {'source': source})
+    runner.add_stage(Stage('upper', write_upper, inputs=['source'], outputs={'upper_output': 'upper.txt'}))
+    runner.add_stage(Stage('count', write_count, inputs=['upper_output'], outputs={'count_output': 'count.txt'},
+                           params={'suffix': suffix}))
+    return runner
+
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.txt'
+    path.write_text('hello', encoding='utf-8')
+    return str(path)
+
+
+def test_second_run_reuses_outputs(tmp_path, source):
+    calls = []
+    paths = asyncio.run(make_runner(str(tmp_path), source, calls).run())
+    assert calls == ['upper', 'count']
+    assert read(paths['upper_output']) == 'HELLO'
+    assert read(paths['count_output']) == '5'
+
+    calls.clear()
+    again = asyncio.run(make_runner(str(tmp_path), source, calls).run())
+    assert calls == []
+    assert again == paths
+
+
+def test_source_change_invalidates_all_stages(tmp_path, source):
+    calls = []
+    first = asyncio.run(make_runner(str(tmp_path), source, calls).run())
+    with open(source, 'w', encoding='utf-8') as f:
+        f.write('hello world')
+    os.utime(source, ns=(os.stat(source).st_atime_ns, os.stat(source).st_mtime_ns + 10 ** 9))
+
+    calls.clear()
+    paths = asyncio.run(make_runner(str(tmp_path), source, calls).run())
+    assert calls == ['upper', 'count']
+    assert paths['count_output'] != first['count_output']
+    assert read(paths['count_output']) == '11'
+
+
+def test_param_change_invalidates_only_that_stage(tmp_path, source):
+    calls = []
+    asyncio.run(make_runner(str(tmp_path), source, calls).run())
+
+    calls.clear()
+    paths = asyncio.run(make_runner(str(tmp_path), source, calls, suffix='!').run())
+    assert calls == ['count']
+    assert read(paths['count_output']) == '5!'
+
+
+def test_force_reruns_stage_and_dependents(tmp_path, source):
+    calls = []
+    asyncio.run(make_runner(str(tmp_path), source, calls).run())
+
+    calls.clear()
+    asyncio.run(make_runner(str(tmp_path), source, calls).run(force=['upper']))
+    assert calls == ['upper', 'count']
+
+
+def test_missing_output_is_not_a_cache_hit(tmp_path, source):
+    calls = []
+    paths = asyncio.run(make_runner(str(tmp_path), source, calls).run())
+    os.remove(paths['count_output'])
+
+    calls.clear()
+    asyncio.run(make_runner(str(tmp_path), source, calls).run())
+    assert calls == ['count']
+
+
+def test_granted_cpu_slots_are_passed_as_threads(tmp_path, source):
+    granted = {}
+
+    def record_threads(source, marker_output, cpu_threads=None):
+        granted['cpu_threads'] = cpu_threads
+        open(marker_output, 'w').close()
+
+    runner = StageRunner(str(tmp_path / 'artifacts'), {'source': source}, resource_slots={'cpu': 4})
+    runner.add_stage(Stage('threads', record_threads, inputs=['source'], outputs={'marker_output': 'marker'},
+                           resources={'cpu': 8}))
+    asyncio.run(runner.run())
+    assert granted['cpu_threads'] == 4
@@ -0,0 +1,145 @@
+import os
+import stat
+import subprocess
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+import video_caption  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def blip():
+    """로컬 캐시에 있는 BLIP 모델 (내려받지 않음, 없으면 건너뜀)"""
+    try:
+        processor = video_caption.BlipProcessor.from_pretrained(video_caption.BLIP_MODEL_ID, local_files_only=True)
+        model = video_caption.BlipForConditionalGeneration.from_pretrained(video_caption.BLIP_MODEL_ID,
+                                                                           local_files_only=True)
+    except Exception as e:
+        pytest.skip(f"BLIP 모델이 로컬 캐시에 없습니다: {e}")
+    return processor, model.eval()
+
+
+def synthetic_frames(num_frames=5, size=96):
+    """프레임마다 색과 무늬가 다른 RGB 배열"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:size, 0:size]
+    frames = []
+    for i in range(num_frames):
+        color = rng.integers(0, 256, 3)
+        stripes = ((x + y * i) // (8 + 4 * i)) % 2
+        frames.append((stripes[..., None] * color).astype(np.uint8))
+    return frames
+
+
+def test_batched_captions_match_one_frame_at_a_time(blip):
+    processor, model = blip
+    pixel_values = video_caption.preprocess_images(synthetic_frames(), processor)
+    single, used = video_caption.generate_captions_batched(pixel_values, processor, model, batch_size=1)
+    assert used == 1 and len(single) == len(pixel_values)
+    # 마지막 배치가 덜 찬 경우(5 = 2 + 2 + 1)와 한 번에 전부 넣는 경우 모두 같아야 함
+    for batch_size in (2, 8):
+        captions, _ = video_caption.generate_captions_batched(pixel_values, processor, model, batch_size=batch_size)
+        assert captions == single
+
+
+def fake_ffmpeg(tmp_path, monkeypatch, num_frames, returncode, message='bad input'):
+    """2x4 RGB 프레임 num_frames개를 쓰고 stderr에 message를 남기는 가짜 ffmpeg를 PATH 맨 앞에 둠"""
+    script = tmp_path / 'ffmpeg'
+    script.write_text(
+        "#!/usr/bin/env python3\n"
+        "import sys\n"
+        f"sys.stderr.write({message!r})\n"
+        f"sys.stdout.buffer.write(bytes(range(24)) * {num_frames})\n"
+        f"sys.exit({returncode})\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(video_caption, '_probe_video_size', lambda path: (4, 2))
+
+
+def test_ffmpeg_sampler_yields_frames_at_the_sampling_interval(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, num_frames=3, returncode=0)
+    frames = list(video_caption._sample_frames_ffmpeg('input.mp4', 2))
+    assert [timestamp for timestamp, _ in frames] == [0, 2, 4]
+    assert frames[0][1].shape == (2, 4, 3) and frames[0][1][1, 3, 2] == 23
+
+
+def test_ffmpeg_sampler_raises_with_stderr_on_failure(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, num_frames=1, returncode=1)
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        list(video_caption._sample_frames_ffmpeg('input.mp4', 1))
+    assert error.value.returncode == 1 and error.value.stderr == b'bad input'
+
+
+def test_ffmpeg_sampler_raises_when_no_frame_was_decoded(tmp_path, monkeypatch):
+    fake_ffmpeg(tmp_path, monkeypatch, num_frames=0, returncode=0)
+    with pytest.raises(RuntimeError, match='bad input'):
+        list(video_caption._sample_frames_ffmpeg('input.mp4', 1))
+
+
+class FakeCache:
+    def __init__(self, captions=None):
+        self.captions = dict(captions or {})
+
+    def get_many(self, hashes):
+        return [self.captions.get(h) for h in hashes]
+
+    def put_many(self, hashes, captions):
+        self.captions.update(zip(hashes, captions))
+
+
+@pytest.fixture
+def fake_blip(monkeypatch):
+    """프레임 번호(첫 픽셀 값)를 캡션으로 돌려주는 가짜 전처리/추론, 추론한 프레임 번호를 기록함"""
+    captioned = []
+
+    def generate(pixel_values, processor, model):
+        captioned.extend(pixel_values)
+        return [f"frame {i}" for i in pixel_values]
+
+    monkeypatch.setattr(video_caption, 'preprocess_images', lambda images, processor: [int(image[0, 0, 0])
+                                                                                       for image in images])
+    monkeypatch.setattr(video_caption, 'generate_captions_from_pixels', generate)
+    monkeypatch.setattr(video_caption, 'perceptual_hash', lambda image: int(image[0, 0, 0]))
+    return captioned
+
+
+def numbered_frames(num_frames):
+    return [(i * 0.5, np.full((2, 2, 3), i, dtype=np.uint8)) for i in range(num_frames)]
+
+
+def test_pipeline_keeps_frame_order_with_several_preprocess_workers(fake_blip):
+    stats = {}
+    results = list(video_caption.caption_frames_pipelined(numbered_frames(23), None, None, batch_size=3,
+                                                          num_preprocess_workers=3, queue_size=2, stats=stats))
+    assert results == [(i * 0.5, f"frame {i}") for i in range(23)]
+    assert stats['frames'] == 23
+
+
+def test_pipeline_only_runs_the_model_on_cache_misses(fake_blip):
+    cache = FakeCache({i: f"cached {i}" for i in range(0, 10, 3)})
+    results = list(video_caption.caption_frames_pipelined(numbered_frames(10), None, None, batch_size=4,
+                                                          cache=cache))
+    assert [caption for _, caption in results] == [
+        f"cached {i}" if i % 3 == 0 else f"frame {i}" for i in range(10)]
+    assert sorted(fake_blip) == [i for i in range(10) if i % 3]
+    assert cache.captions[1] == "frame 1"  # 새로 만든 캡션은 캐시에 저장
+
+
+def test_pipeline_raises_decode_errors(fake_blip):
+    def frames():
+        yield from numbered_frames(5)
+        raise ValueError("decode failed")
+
+    with pytest.raises(ValueError, match="decode failed"):
+        list(video_caption.caption_frames_pipelined(frames(), None, None, batch_size=2))
+
+
+def test_pipeline_can_be_closed_early(fake_blip):
+    pipeline = video_caption.caption_frames_pipelined(numbered_frames(200), None, None, batch_size=2,
+                                                      queue_size=1)
+    assert next(pipeline) == (0.0, "frame 0")
+    pipeline.close()
+    assert len(fake_blip) < 200
@@ -0,0 +1,134 @@
+import os
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+from caption_store import AUDIO_CAPTION_SCHEMA, save_records  # noqa: E402
+from retrieval_index import INDEX_VERSION, TEXT_ENCODER_ID  # noqa: E402
+from video_library import VideoLibrary  # noqa: E402
+
+DIM = 32
+NUM_TOPICS = 60
+
+
+def write_index(index_dir, embeddings):
+    """retrieval_index.build_index와 같은 형식의 인덱스 폴더를 임베딩으로 직접 만듦 (세그먼트 i는 [i, i+1]초)"""
+    os.makedirs(index_dir)
+    np.save(os.path.join(index_dir, 'embeddings.npy'), embeddings.astype(np.float16))
+    save_records(os.path.join(index_dir, 'segments.cap'),
+                 [{'start': i, 'end': i + 1, 'text': f"segment {i}"} for i in range(len(embeddings))],
+                 AUDIO_CAPTION_SCHEMA)
+    with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'model_id': TEXT_ENCODER_ID, 'dim': DIM,
+                   'num_segments': len(embeddings)}, f)
+
+
+def normalize(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+# 실제 문장 임베딩처럼 주제별로 모여 있는 임베딩 (주제 중심 + 잡음)
+TOPICS = normalize(np.random.default_rng(42).standard_normal((NUM_TOPICS, DIM)))
+
+
+def topic_embeddings(rng, num_rows, noise=0.35):
+    topics = rng.integers(0, NUM_TOPICS, num_rows)
+    return normalize(TOPICS[topics] + noise * rng.standard_normal((num_rows, DIM)) / np.sqrt(DIM) * 4)
+
+
+def queries(num_queries=20):
+    return topic_embeddings(np.random.default_rng(1), num_queries)
+
+
+@pytest.fixture(scope='module')
+def library(tmp_path_factory):
+    # 비디오 4편 x 6000 세그먼트 -> 샤드마다 군집 약 77개, 전체 300개 이상이라 기본 nprobe(128)는 일부만 검색함
+    tmp_path = tmp_path_factory.mktemp('library')
+    rng = np.random.default_rng(0)
+    library = VideoLibrary(str(tmp_path / 'library'), max_workers=2)
+    for video_id in ('a', 'b', 'c', 'd'):
+        index_dir = str(tmp_path / f"index_{video_id}")
+        write_index(index_dir, topic_embeddings(rng, 6000))
+        library.add(video_id, index_dir=index_dir)
+    yield library
+    library.close()
+
+
+def recall(library, top_k=10):
+    found = total = 0
+    for query in queries():
+        exact = {hit[:3] for hit in library.search_vector(query, top_k=top_k, exact=True)}
+        approx = library.search_vector(query, top_k=top_k)
+        assert [hit[3] for hit in approx] == sorted((hit[3] for hit in approx), reverse=True)
+        found += len(exact & {hit[:3] for hit in approx})
+        total += len(exact)
+    return found / total
+
+
+def test_default_nprobe_searches_only_part_of_the_library(library):
+    _, (centroids, _) = library._open_shards()
+    assert len(centroids) > 2 * library.nprobe
+
+
+def test_default_ivf_search_is_nearly_exact(library):
+    assert recall(library) >= 0.95
+
+
+def test_ivf_probing_every_cluster_matches_exact_search(library):
+    nprobe, library.nprobe = library.nprobe, 10 ** 6
+    try:
+        for query in queries(5):
+            assert library.search_vector(query, top_k=10) == library.search_vector(query, top_k=10, exact=True)
+    finally:
+        library.nprobe = nprobe
+
+
+def test_search_can_be_limited_to_some_videos(library):
+    for query in queries(3):
+        hits = library.search_vector(query, top_k=5, video_ids={'b'})
+        assert {video_id for video_id, *_ in hits} == {'b'}
+        assert [hit[:3] for hit in hits] == \
+            [hit[:3] for hit in library.search_vector(query, top_k=5, video_ids={'b'}, exact=True)]
+
+
+def test_add_and_remove_videos(tmp_path):
+    rng = np.random.default_rng(3)
+    library = VideoLibrary(str(tmp_path / 'library'), max_workers=2)
+    for video_id, num_rows in (('a', 40), ('b', 25)):
+        index_dir = str(tmp_path / f"index_{video_id}")
+        write_index(index_dir, topic_embeddings(rng, num_rows))
+        library.add(video_id, index_dir=index_dir)
+    query = queries(1)[0]
+    assert len(library.search_vector(query, top_k=1000)) == 65  # 샤드를 열어 둔 상태에서 삭제
+
+    assert library.remove('a')
+    assert not library.remove('a')
+    assert set(library.videos()) == {'b'}
+    hits = library.search_vector(query, top_k=1000)
+    assert {video_id for video_id, *_ in hits} == {'b'} and len(hits) == 25
+
+    # 같은 video_id로 다시 추가하면 샤드를 교체함
+    index_dir = str(tmp_path / 'index_b2')
+    embeddings = topic_embeddings(rng, 3)
+    write_index(index_dir, embeddings)
+    library.add('b', index_dir=index_dir)
+    assert library.videos()['b']['num_segments'] == 3
+    video_id, start, end, score = library.search_vector(embeddings[1], top_k=1, exact=True)[0]
+    assert (video_id, start, end) == ('b', 1.0, 2.0)
+    assert score == pytest.approx(1.0, abs=1e-2)
+    library.close()
+
+
+def test_is_current_tracks_the_registered_key(tmp_path):
+    library = VideoLibrary(str(tmp_path / 'library'))
+    index_dir = str(tmp_path / 'index')
+    write_index(index_dir, topic_embeddings(np.random.default_rng(4), 10))
+    assert not library.is_current('a', 'key1')
+    library.add('a', index_dir=index_dir, key='key1')
+    assert library.is_current('a', 'key1')
+    assert not library.is_current('a', 'key2')
+    library.add('a', index_dir=index_dir)  # key 없이 등록하면 항상 다시 등록 대상
+    assert not library.is_current('a', 'key1')
+    library.close()
@@ -1,78 +1,473 @@
 import os
 import json
+import time
+import subprocess
+import tempfile
+import threading
+import queue
 import cv2
+import numpy as np
+import torch
 from PIL import Image
 from transformers import BlipProcessor, BlipForConditionalGeneration
+from shot_detector import select_keyframes
+from caption_cache import CaptionCache, perceptual_hash
+from caption_store import VIDEO_CAPTION_SCHEMA, save_records
+from checkpoint_log import CheckpointLog
+from inference_device import prepare_model, resolve_device
+from model_registry import registry
 
-def initialize_model():
-    processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-large")
-    model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-large").to("cuda")
-    return processor, model
+BLIP_MODEL_ID = "Salesforce/blip-image-captioning-large"
 
+# BLIP-large generate 시 이미지 한 장이 차지하는 대략적인 메모리 (activation + beam/캐시 여유분 포함)
+BLIP_BYTES_PER_IMAGE = 256 * 1024 ** 2
 
-def downsample_and_save_frames(input_video_path, output_folder, downsample_rate_seconds):
-    cap = cv2.VideoCapture(input_video_path)
+def initialize_model(device=None, quantize=False, num_threads=None):
+    """
+    BLIP 모델 로드 (프로세스 전체에서 공유하는 model_registry를 통해 한 번만 로드)
+
+    Args:
+        device: 실행 장치 (None이면 GPU가 있으면 cuda, 없으면 cpu)
+        quantize: CPU에서 Linear 레이어를 int8 동적 양자화할지 여부
+        num_threads: CPU 추론 스레드 수
+    """
+    device = resolve_device(device)
+
+    def load():
+        processor = BlipProcessor.from_pretrained(BLIP_MODEL_ID)
+        model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_ID)
+        model = prepare_model(model, device, quantize=quantize, num_threads=num_threads)
+        return processor, model
+
+    # 같은 프로세스에서는 한 번만 로드하고 재사용
+    return registry.get(f"{BLIP_MODEL_ID}:{device}:{'int8' if quantize else 'fp32'}", load)
+
+
+def _probe_video_size(input_video_path):
+    """ffprobe로 비디오 가로/세로 크기 확인"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=width,height', '-of', 'csv=p=0:s=x', input_video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    width, height = result.stdout.decode().strip().split('x')[:2]
+    return int(width), int(height)
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    downsample_rate = int(fps * downsample_rate_seconds)
+
+def _sample_frames_opencv(input_video_path, downsample_rate_seconds):
+    cap = cv2.VideoCapture(input_video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    downsample_rate = max(1, int(fps * downsample_rate_seconds))
 
     frame_idx = 0
-    saved_frame_idx = 0
+    try:
+        while cap.isOpened():
+            # 사용하지 않을 프레임은 grab()만 하고 디코딩된 이미지를 꺼내지 않음
+            if not cap.grab():
+                break
+
+            if frame_idx % downsample_rate == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                # 프레임 번호가 아닌 실제 표시 시각(PTS)을 사용 (가변 프레임레이트 대응)
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if timestamp <= 0 and frame_idx > 0:
+                    timestamp = frame_idx / fps
+                yield timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+            frame_idx += 1
+    finally:
+        cap.release()
+
+
+def _sample_frames_ffmpeg(input_video_path, downsample_rate_seconds):
+    """
+    ffmpeg fps 필터로 뽑은 raw RGB 프레임을 파이프로 읽음
+
+    ffmpeg가 실패하면(종료 코드가 0이 아니거나 프레임을 하나도 못 뽑으면) stderr 내용과 함께 예외를 냄.
+    """
+    width, height = _probe_video_size(input_video_path)
+    frame_bytes = width * height * 3
+    command = [
+        'ffmpeg', '-v', 'error', '-i', input_video_path,
+        '-vf', f'fps=1/{downsample_rate_seconds}',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'
+    ]
+    # stderr는 파이프 대신 임시 파일로 받아서, stdout만 읽는 동안 stderr 버퍼가 가득 차 멈추는 일이 없게 함
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            sample_idx = 0
+            while True:
+                buffer = process.stdout.read(frame_bytes)
+                if len(buffer) < frame_bytes:
+                    break
+                frame = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+                yield sample_idx * downsample_rate_seconds, frame
+                sample_idx += 1
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+            returncode = process.wait()
+            if returncode != 0:
+                stderr_file.seek(0)
+                raise subprocess.CalledProcessError(returncode, command, stderr=stderr_file.read())
+            if sample_idx == 0:
+                stderr_file.seek(0)
+                message = stderr_file.read().decode(errors='replace').strip()
+                raise RuntimeError(f"ffmpeg가 프레임을 하나도 뽑지 못했습니다: {input_video_path}"
+                                   + (f" ({message})" if message else ""))
+        finally:
+            process.stdout.close()
+            # 끝까지 읽지 않고 멈춘 경우(제너레이터를 중간에 닫음)에만 ffmpeg를 종료
+            if process.poll() is None:
+                process.kill()
+            process.wait()
 
-        if frame_idx % downsample_rate == 0:
-            frame_filename = os.path.join(output_folder, f'frame_{saved_frame_idx}.jpg')
-            cv2.imwrite(frame_filename, frame)
-            saved_frame_idx += 1
 
-        frame_idx += 1
+def sample_frames(input_video_path, downsample_rate_seconds, backend="opencv", debug_frame_folder=None,
+                  sampling="fixed", min_interval_seconds=1.0, max_interval_seconds=10.0, analysis_interval_seconds=0.25):
+    """
+    프레임을 뽑아 (초 단위 표시 시각, RGB numpy 배열)을 순서대로 반환하는 제너레이터
 
-    cap.release()
+    Args:
+        input_video_path: 입력 비디오 경로
+        downsample_rate_seconds: 샘플링 간격 (초, sampling="fixed"일 때 사용)
+        backend: "opencv" (건너뛸 프레임은 grab만 수행) 또는 "ffmpeg" (fps 필터 + raw RGB 파이프)
+        debug_frame_folder: 지정하면 뽑은 프레임을 JPEG로도 저장 (디버깅용)
+        sampling: "fixed" (일정 간격) 또는 "shot" (샷 전환 기준 키프레임)
+        min_interval_seconds: sampling="shot"일 때 키프레임 사이 최소 간격
+        max_interval_seconds: sampling="shot"일 때 키프레임 사이 최대 간격
+        analysis_interval_seconds: sampling="shot"일 때 샷 전환을 검사하는 프레임 간격
+    """
+    interval = downsample_rate_seconds if sampling == "fixed" else analysis_interval_seconds
+    if backend == "opencv":
+        frames = _sample_frames_opencv(input_video_path, interval)
+    elif backend == "ffmpeg":
+        frames = _sample_frames_ffmpeg(input_video_path, interval)
+    else:
+        raise ValueError(f"지원하지 않는 프레임 샘플링 방식입니다: {backend}")
+
+    if sampling == "shot":
+        frames = select_keyframes(frames, min_interval_seconds, max_interval_seconds)
+    elif sampling != "fixed":
+        raise ValueError(f"지원하지 않는 샘플링 모드입니다: {sampling}")
+
+    if debug_frame_folder:
+        os.makedirs(debug_frame_folder, exist_ok=True)
+
+    for saved_frame_idx, (timestamp, frame) in enumerate(frames):
+        if debug_frame_folder:
+            frame_filename = os.path.join(debug_frame_folder, f'frame_{saved_frame_idx}.jpg')
+            cv2.imwrite(frame_filename, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        yield timestamp, frame
+
+
+def format_timestamp(seconds):
+    """초 단위 시각을 'HH:MM:SS.mmm' 문자열로 변환"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600 * 1000)
+    minutes, millis = divmod(millis, 60 * 1000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02}.{millis:03}"
+
+
+def downsample_and_save_frames(input_video_path, output_folder, downsample_rate_seconds):
+    for _ in sample_frames(input_video_path, downsample_rate_seconds, debug_frame_folder=output_folder):
+        pass
 
 
 def generate_caption(img_path, processor, model):
     raw_image = Image.open(img_path).convert('RGB')
-    inputs = processor(raw_image, return_tensors="pt").to("cuda")
+    inputs = processor(raw_image, return_tensors="pt").to(model.device)
     out = model.generate(**inputs)
     caption = processor.decode(out[0], skip_special_tokens=True)
     return caption
 
 
-def process_video(video_path, frame_folder, output_json_path, downsample_rate_seconds=1):
-    # frame_folder가 존재하지 않으면 생성
-    if not os.path.exists(frame_folder):
-        os.makedirs(frame_folder)
-        print(f"프레임 폴더가 생성되었습니다: {frame_folder}")
+def available_memory_bytes(device):
+    """현재 장치에서 사용 가능한 메모리 (알 수 없으면 None)"""
+    device = torch.device(device)
+    if device.type == "cuda":
+        free, _ = torch.cuda.mem_get_info(device)
+        return free
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def resolve_batch_size(batch_size, device, bytes_per_image=BLIP_BYTES_PER_IMAGE, memory_fraction=0.8):
+    """요청한 배치 크기를 가용 메모리 한도 안으로 제한"""
+    free = available_memory_bytes(device)
+    if free is None:
+        return max(1, batch_size)
+    limit = int(free * memory_fraction // bytes_per_image)
+    return max(1, min(batch_size, limit))
+
+
+def preprocess_images(images, processor):
+    """이미지 여러 장(PIL 또는 RGB numpy 배열)을 BLIP 입력 텐서(pixel_values)로 변환 (CPU)"""
+    return processor(images=images, return_tensors="pt")["pixel_values"]
+
 
+def generate_captions_from_pixels(pixel_values, processor, model):
+    """전처리된 pixel_values 배치를 한 번의 generate 호출로 캡셔닝"""
+    pixel_values = pixel_values.to(model.device, dtype=model.dtype)
+    with torch.no_grad():
+        out = model.generate(pixel_values=pixel_values)
+    return processor.batch_decode(out, skip_special_tokens=True)
+
+
+def generate_captions(images, processor, model):
+    """이미지 여러 장(PIL 또는 RGB numpy 배열)을 한 번의 processor/generate 호출로 캡셔닝"""
+    return generate_captions_from_pixels(preprocess_images(images, processor), processor, model)
+
+
+def generate_captions_batched(pixel_values, processor, model, batch_size):
+    """
+    pixel_values를 batch_size씩 나눠 캡셔닝. 메모리가 부족하면 배치를 절반으로 줄여 다시 시도
+
+    Returns:
+        (captions, 실제로 사용한 batch_size)
+    """
+    captions = []
+    start = 0
+    while start < len(pixel_values):
+        batch = pixel_values[start:start + batch_size]
+        try:
+            captions.extend(generate_captions_from_pixels(batch, processor, model))
+        except torch.cuda.OutOfMemoryError:
+            if batch_size == 1:
+                raise
+            torch.cuda.empty_cache()
+            batch_size = max(1, batch_size // 2)
+            print(f"메모리 부족으로 배치 크기를 {batch_size}(으)로 줄입니다.")
+            continue
+        start += len(batch)
+    return captions, batch_size
+
+
+_PIPELINE_END = object()
+
+
+def caption_frames_pipelined(frames, processor, model, batch_size, num_preprocess_workers=2, queue_size=4, stats=None,
+                             cache=None):
+    """
+    디코딩 -> 전처리 -> 추론을 제한된 크기의 큐로 연결해 동시에 실행하고 (시각, 캡션)을 순서대로 반환하는 제너레이터
+
+    디코딩 스레드가 batch_size 단위로 프레임을 모아 raw 큐에 넣고, 전처리 스레드들이 pixel_values로
+    변환해 ready 큐에 넣으면, 호출한 스레드가 이를 꺼내 모델에 넣음. 큐가 가득 차면 앞 단계가 기다리므로
+    긴 영상에서도 메모리 사용량은 (queue_size * batch_size) 프레임 정도로 유지됨.
+
+    Args:
+        frames: (초 단위 시각, RGB 배열)을 내보내는 iterable (예: sample_frames)
+        num_preprocess_workers: 전처리 스레드 수
+        queue_size: 각 큐에 쌓아둘 수 있는 최대 배치 수
+        stats: 딕셔너리를 넘기면 단계별 소요 시간(decode/preprocess/inference)을 누적해서 기록
+        cache: CaptionCache를 넘기면 전처리 스레드에서 perceptual hash로 먼저 조회하고, 캐시에 없는 프레임만 모델에 넣음
+    """
+    if stats is None:
+        stats = {}
+    stats.update({'decode': 0.0, 'preprocess': 0.0, 'inference': 0.0, 'frames': 0})
+    stats_lock = threading.Lock()
+    stop_event = threading.Event()
+    errors = []
+
+    raw_queue = queue.Queue(maxsize=queue_size)
+    ready_queue = queue.Queue(maxsize=queue_size)
+
+    def put(q, item):
+        # 소비자가 먼저 멈춘 경우 영원히 막히지 않도록 주기적으로 종료 여부 확인
+        while not stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode_worker():
+        seq = 0
+        timestamps, images = [], []
+        try:
+            frame_iter = iter(frames)
+            while not stop_event.is_set():
+                decode_start = time.time()
+                item = next(frame_iter, None)
+                with stats_lock:
+                    stats['decode'] += time.time() - decode_start
+                if item is None:
+                    break
+                timestamps.append(item[0])
+                images.append(item[1])
+                if len(images) >= batch_size:
+                    if not put(raw_queue, (seq, timestamps, images)):
+                        return
+                    seq += 1
+                    timestamps, images = [], []
+            if images:
+                put(raw_queue, (seq, timestamps, images))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(num_preprocess_workers):
+                put(raw_queue, _PIPELINE_END)
+
+    def preprocess_worker():
+        try:
+            while True:
+                item = raw_queue.get()
+                if item is _PIPELINE_END:
+                    break
+                seq, timestamps, images = item
+                preprocess_start = time.time()
+                hashes, cached = None, [None] * len(images)
+                if cache is not None:
+                    hashes = [perceptual_hash(image) for image in images]
+                    cached = cache.get_many(hashes)
+                    images = [image for image, caption in zip(images, cached) if caption is None]
+                pixel_values = preprocess_images(images, processor) if images else None
+                with stats_lock:
+                    stats['preprocess'] += time.time() - preprocess_start
+                if not put(ready_queue, (seq, timestamps, pixel_values, hashes, cached)):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(ready_queue, _PIPELINE_END)
+
+    threads = [threading.Thread(target=decode_worker, daemon=True)]
+    threads += [threading.Thread(target=preprocess_worker, daemon=True) for _ in range(num_preprocess_workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        # 전처리 스레드가 여러 개라 배치가 섞여 들어오므로 순서대로 다시 정렬
+        pending = {}
+        next_seq = 0
+        finished_workers = 0
+        while finished_workers < num_preprocess_workers:
+            item = ready_queue.get()
+            if errors:
+                raise errors[0]
+            if item is _PIPELINE_END:
+                finished_workers += 1
+                continue
+            pending[item[0]] = item
+            while next_seq in pending:
+                _, timestamps, pixel_values, hashes, batch_captions = pending.pop(next_seq)
+                if pixel_values is not None:
+                    inference_start = time.time()
+                    new_captions, batch_size = generate_captions_batched(pixel_values, processor, model, batch_size)
+                    stats['inference'] += time.time() - inference_start
+                    miss_idx = [i for i, caption in enumerate(batch_captions) if caption is None]
+                    for i, caption in zip(miss_idx, new_captions):
+                        batch_captions[i] = caption
+                    if cache is not None:
+                        cache.put_many([hashes[i] for i in miss_idx], new_captions)
+                stats['frames'] += len(batch_captions)
+                next_seq += 1
+                for timestamp, caption in zip(timestamps, batch_captions):
+                    yield timestamp, caption
+        if errors:
+            raise errors[0]
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=1)
+
+
+def process_video(video_path, frame_folder, output_json_path, downsample_rate_seconds=1, batch_size=16, backend="opencv",
+                  num_preprocess_workers=2, queue_size=4, sampling="fixed", min_interval_seconds=1.0,
+                  max_interval_seconds=10.0, cache_path=None, device=None, quantize=False, num_threads=None,
+                  checkpoint_path=None):
+    """
+    비디오에서 프레임을 뽑아 메모리에서 바로 캡셔닝한 뒤 JSON 또는 caption_store 저장소로 저장
+
+    프레임 디코딩/전처리와 모델 추론은 caption_frames_pipelined로 겹쳐서 실행됨.
+
+    Args:
+        frame_folder: 지정하면 샘플링한 프레임을 JPEG로도 저장 (디버깅용, None이면 저장하지 않음)
+        backend: 프레임 샘플링 방식 ("opencv" 또는 "ffmpeg")
+        num_preprocess_workers: 전처리 스레드 수
+        queue_size: 단계 사이 큐에 쌓아둘 수 있는 최대 배치 수
+        sampling: "fixed" (downsample_rate_seconds 간격) 또는 "shot" (샷마다 키프레임, 간격은 min/max로 제한)
+        cache_path: 지정하면 perceptual hash 기반 캡션 캐시(sqlite)를 사용 (여러 실행/비디오에서 공유 가능)
+        device: 실행 장치 (None이면 GPU가 있으면 cuda, 없으면 cpu)
+        quantize: CPU에서 BLIP Linear 레이어를 int8 동적 양자화할지 여부
+        num_threads: CPU 추론 스레드 수
+        checkpoint_path: 지정하면 캡션을 만들 때마다 이 로그에 이어 쓰고, 다시 실행하면 이미 캡셔닝한
+                         시각의 프레임은 건너뜀 (최종 결과를 저장하면 로그는 삭제)
+    """
     # output_json_path의 디렉토리가 존재하지 않으면 생성
     output_dir = os.path.dirname(output_json_path)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         print(f"출력 JSON 폴더가 생성되었습니다: {output_dir}")
 
-    processor, model = initialize_model()
-    
-    downsample_and_save_frames(video_path, frame_folder, downsample_rate_seconds)
-    
-    frames = sorted(os.listdir(frame_folder))
+    processor, model = initialize_model(device, quantize=quantize, num_threads=num_threads)
+
     captions = []
 
-    for idx, frame in enumerate(frames):
-        img_path = os.path.join(frame_folder, frame)
-        time_str = f"{idx // 3600:02}:{(idx % 3600) // 60:02}:{idx % 60:02}"
-        caption = generate_caption(img_path, processor, model)
+    batch_size = resolve_batch_size(batch_size, model.device)
+    print(f"캡션 배치 크기: {batch_size}")
+
+    # 이전 실행이 중간에 멈췄다면 로그에 남은 캡션을 불러오고 그 시각의 프레임은 다시 캡셔닝하지 않음
+    checkpoint = CheckpointLog(checkpoint_path) if checkpoint_path else None
+    resumed = checkpoint.load() if checkpoint else []
+    done_timestamps = {round(record['time'], 3) for record in resumed}
+    if resumed:
+        print(f"체크포인트에서 캡션 {len(resumed)}개를 불러와 해당 프레임은 건너뜁니다: {checkpoint_path}")
+
+    start_time = time.time()
+    stats = {}
+    frames = sample_frames(video_path, downsample_rate_seconds, backend=backend, debug_frame_folder=frame_folder,
+                           sampling=sampling, min_interval_seconds=min_interval_seconds,
+                           max_interval_seconds=max_interval_seconds)
+    if done_timestamps:
+        frames = ((timestamp, frame) for timestamp, frame in frames if round(timestamp, 3) not in done_timestamps)
+    new_captions = []
+    cache_model_id = f"{BLIP_MODEL_ID}:int8" if quantize else BLIP_MODEL_ID
+    cache = CaptionCache(cache_path, cache_model_id) if cache_path else None
+    pipeline = caption_frames_pipelined(frames, processor, model, batch_size,
+                                        num_preprocess_workers=num_preprocess_workers,
+                                        queue_size=queue_size, stats=stats, cache=cache)
+    try:
+        for timestamp, caption in pipeline:
+            if checkpoint:
+                checkpoint.append({"time": timestamp, "caption": caption})
+            new_captions.append((timestamp, caption))
+    finally:
+        # 캡셔닝 중에 실패해도 전처리 스레드를 먼저 멈춘 뒤 캐시 DB 연결과 체크포인트 로그를 닫음
+        pipeline.close()
+        if cache is not None:
+            cache.close()
+        if checkpoint:
+            checkpoint.close()
+
+    for timestamp, caption in sorted([(r['time'], r['caption']) for r in resumed] + new_captions,
+                                     key=lambda item: item[0]):
         data = {
-            "time": time_str,
+            "time": format_timestamp(timestamp),
             "caption": caption
         }
         captions.append(data)
 
-    with open(output_json_path, 'w') as json_file:
-        json.dump(captions, json_file, indent=4)
-        print(f"캡션이 저장되었습니다: {output_json_path}")
+    elapsed = time.time() - start_time
+    if new_captions:
+        print(f"캡션 생성 속도: {len(new_captions) / max(elapsed, 1e-9):.2f} frames/sec "
+              f"({len(new_captions)}프레임, {elapsed:.2f}초)")
+        print(f"단계별 누적 시간 - 디코딩: {stats['decode']:.2f}초, 전처리: {stats['preprocess']:.2f}초, "
+              f"추론: {stats['inference']:.2f}초, 전체: {elapsed:.2f}초")
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f"캡션 캐시 - hit: {cache_stats['hits']}, miss: {cache_stats['misses']}, "
+              f"hit rate: {cache_stats['hit_rate']:.1%}, 삭제: {cache_stats['evictions']}")
+
+    # .json이면 기존 JSON, 아니면 시각 배열 + 텍스트 버퍼로 된 컬럼형 저장소로 저장
+    save_records(output_json_path, captions, VIDEO_CAPTION_SCHEMA)
+    print(f"캡션이 저장되었습니다: {output_json_path}")
+    if checkpoint:
+        checkpoint.remove()
 
-    return captions
\ No newline at end of file
+    return captions
@@ -12,6 +12,8 @@ import numpy as np
 from tqdm import tqdm
 from pathlib import Path
 import json
+from model_registry import registry
+from audio_caption import load_whisper_model
 
 # 기본 경로 설정
 BASE_PATH = '/home/aikusrv02/aiku/video_retrieval'
@@ -20,31 +22,42 @@ OUTPUT_PATH = f"{BASE_PATH}/data/home_alone/shorts_metadata"
 
 class MultiModalAnalyzer:
     def __init__(self):
-        print("모델 초기화 중...")
-        try:
-            # 비디오 분석 모델
-            self.video_processor = AutoProcessor.from_pretrained("MCG-NJU/videomae-base-finetuned-kinetics")
-            self.video_model = AutoModelForVideoClassification.from_pretrained("MCG-NJU/videomae-base-finetuned-kinetics")
-            
-            # STT 모델 (Whisper)
-            self.stt_model = whisper.load_model("base")
-            
-            # 캡셔닝 파이프라인
-            self.caption_pipeline = pipeline(
-                "video-classification", 
-                model="facebook/timesformer-base-finetuned-k400",
-                device=0 if torch.cuda.is_available() else -1
-            )
-            
-            # GPU 설정
-            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            self.video_model.to(self.device)
-            
-            print(f"모델 초기화 완료. 사용 장치: {self.device}")
-            
-        except Exception as e:
-            print(f"모델 초기화 중 오류 발생: {e}")
-            raise
+        # 모델은 실제로 쓰일 때 model_registry를 통해 한 번만 로드됨
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"분석기 초기화 완료. 사용 장치: {self.device}")
+
+    @property
+    def video_processor(self):
+        return self._videomae()[0]
+
+    @property
+    def video_model(self):
+        return self._videomae()[1]
+
+    def _videomae(self):
+        # 비디오 분석 모델
+        def load():
+            processor = AutoProcessor.from_pretrained("MCG-NJU/videomae-base-finetuned-kinetics")
+            model = AutoModelForVideoClassification.from_pretrained("MCG-NJU/videomae-base-finetuned-kinetics")
+            model.to(self.device)
+            model.eval()
+            return processor, model
+
+        return registry.get(f"MCG-NJU/videomae-base-finetuned-kinetics:{self.device}", load)
+
+    @property
+    def stt_model(self):
+        # STT 모델 (Whisper)
+        return load_whisper_model("base", device=self.device)
+
+    @property
+    def caption_pipeline(self):
+        # 캡셔닝 파이프라인 (현재 분석 과정에서는 사용하지 않아 요청될 때만 로드)
+        return registry.get(f"facebook/timesformer-base-finetuned-k400:{self.device}", lambda: pipeline(
+            "video-classification",
+            model="facebook/timesformer-base-finetuned-k400",
+            device=0 if torch.cuda.is_available() else -1
+        ))
 
     def extract_video_features(self, video_path: str) -> list:
         """비디오 프레임 분석"""
@@ -343,6 +356,7 @@ def main():
                 save_results(results, OUTPUT_PATH)
             print("-" * 50)
         
+        registry.report()
         print("\n모든 처리가 완료되었습니다!")
         
     except Exception as e:
@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import time
+import heapq
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from retrieval_index import RetrievalIndex, build_index, load_text_encoder, encode_texts, top_k_scores
+
+LIBRARY_VERSION = 1
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def build_ivf(shard_dir, num_clusters=None, iterations=10, seed=0, chunk_rows=65536):
+    """
+    샤드의 임베딩을 spherical k-means로 묶어 IVF(군집 중심 + 군집별 행 목록)를 저장
+
+    shard_dir/ivf_centroids.npy (C, D) float32, ivf_rows.npy (군집 순서로 정렬한 행 번호), ivf_offsets.npy (C + 1)
+    """
+    embeddings = np.load(os.path.join(shard_dir, 'embeddings.npy'), mmap_mode='r')
+    num_rows = len(embeddings)
+    num_clusters = num_clusters or max(1, int(round(np.sqrt(num_rows))))
+    num_clusters = max(1, min(num_clusters, num_rows))
+
+    rng = np.random.default_rng(seed)
+    centroids = np.asarray(embeddings[np.sort(rng.choice(num_rows, num_clusters, replace=False))],
+                           dtype=np.float32) if num_rows else np.zeros((1, embeddings.shape[1]), np.float32)
+    assignments = np.zeros(num_rows, dtype=np.int64)
+    for _ in range(iterations):
+        sums = np.zeros_like(centroids)
+        for start in range(0, num_rows, chunk_rows):
+            chunk = np.asarray(embeddings[start:start + chunk_rows], dtype=np.float32)
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+            np.add.at(sums, assignments[start:start + len(chunk)], chunk)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # 비어 있는 군집은 이전 중심을 그대로 둠
+        centroids = np.where(norms > 1e-9, sums / np.maximum(norms, 1e-9), centroids)
+
+    rows = np.argsort(assignments, kind='stable')
+    offsets = np.zeros(num_clusters + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=num_clusters), out=offsets[1:])
+    np.save(os.path.join(shard_dir, 'ivf_centroids.npy'), centroids.astype(np.float32))
+    np.save(os.path.join(shard_dir, 'ivf_rows.npy'), rows)
+    np.save(os.path.join(shard_dir, 'ivf_offsets.npy'), offsets)
+
+
+class VideoLibrary:
+    """
+    여러 비디오의 검색 인덱스를 비디오별 샤드로 모아두고 한 번에 검색하는 라이브러리
+
+    root/
+        manifest.json         - 등록된 비디오 목록 (video_id -> 제목, 원본 경로, 샤드 경로, 세그먼트 수)
+        shards/<video_id>/    - retrieval_index.build_index 형식의 인덱스
+
+    비디오를 추가/삭제해도 해당 샤드만 만들거나 지우고 manifest만 다시 씀.
+    샤드마다 임베딩을 군집으로 묶은 IVF를 함께 저장해 두고, 검색할 때는 질의를 한 번만 임베딩해서
+    (1) 모든 샤드의 군집 중심 중 가까운 nprobe개를 고르고 (2) 그 군집에 속한 행만 샤드별로 동시에 점수를 매긴 뒤
+    (3) 샤드별 top-K를 힙으로 합침. 실제로 점수를 매기는 행 수가 nprobe에만 비례하므로
+    비디오가 늘어나도 검색 시간이 거의 그대로임 (exact=True면 모든 행을 검색).
+    샤드는 메모리 매핑으로 한 번 열어두고 manifest가 바뀔 때만 다시 읽음.
+    """
+    def __init__(self, root, max_workers=None, device="cpu", nprobe=128):
+        self.root = root
+        self.device = device
+        self.nprobe = nprobe
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self._executor = None
+        self._centroids = None  # (전체 군집 중심 행렬, [(video_id, 샤드 안 군집 번호), ...])
+        os.makedirs(os.path.join(root, 'shards'), exist_ok=True)
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+        self._shards = {}
+
+    def _load_manifest(self):
+        """manifest를 읽음 (다른 프로세스가 바꿨으면 다시 읽고, 사라진 샤드는 닫음)"""
+        mtime = os.path.getmtime(self.manifest_path) if os.path.exists(self.manifest_path) else None
+        if self._manifest is not None and mtime == self._manifest_mtime:
+            return self._manifest
+        if mtime is None:
+            manifest = {'version': LIBRARY_VERSION, 'videos': {}}
+        else:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        for video_id in list(self._shards):
+            entry = manifest['videos'].get(video_id)
+            if entry is None or entry['added_at'] != self._shards[video_id][0]:
+                del self._shards[video_id]
+        self._manifest, self._manifest_mtime = manifest, mtime
+        self._centroids = None
+        return manifest
+
+    def _save_manifest(self, manifest):
+        _write_json_atomic(self.manifest_path, manifest)
+        self._manifest = manifest
+        self._manifest_mtime = os.path.getmtime(self.manifest_path)
+        self._centroids = None
+
+    def shard_dir(self, video_id):
+        return os.path.join(self.root, 'shards', video_id)
+
+    def videos(self):
+        with self._lock:
+            return dict(self._load_manifest()['videos'])
+
+    def is_current(self, video_id, key):
+        """video_id가 이미 같은 key(예: 검색 인덱스 단계의 산출물 키)로 등록되어 있는지"""
+        entry = self.videos().get(video_id)
+        return entry is not None and key is not None and entry.get('key') == key
+
+    def add(self, video_id, title=None, video_path=None, index_dir=None, merged_caption_path=None, key=None):
+        """
+        비디오 하나를 라이브러리에 추가 (같은 video_id가 있으면 교체)
+
+        index_dir(이미 만든 검색 인덱스)를 복사하거나, 없으면 merged_caption_path로 샤드를 새로 만듦.
+        key를 주면 manifest에 함께 저장해서 is_current로 다시 등록할 필요가 있는지 확인할 수 있음.
+        """
+        if index_dir is None and merged_caption_path is None:
+            raise ValueError("index_dir 또는 merged_caption_path 중 하나는 필요합니다.")
+        # 샤드는 임시 폴더에 만든 뒤 교체해서 검색 중인 다른 프로세스가 반쯤 만든 샤드를 보지 않게 함
+        staging = f"{self.shard_dir(video_id)}.new"
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+        if index_dir is not None:
+            shutil.copytree(index_dir, staging)
+        else:
+            build_index(merged_caption_path, staging, device=self.device)
+        build_ivf(staging)
+        num_segments = len(RetrievalIndex(staging))
+
+        with self._lock:
+            manifest = self._load_manifest()
+            if os.path.exists(self.shard_dir(video_id)):
+                shutil.rmtree(self.shard_dir(video_id))
+            os.replace(staging, self.shard_dir(video_id))
+            manifest['videos'][video_id] = {
+                'title': title or video_id,
+                'video_path': video_path,
+                'shard': os.path.join('shards', video_id),
+                'num_segments': num_segments,
+                'key': key,
+                'added_at': time.time(),
+            }
+            self._save_manifest(manifest)
+            self._shards.pop(video_id, None)
+        print(f"[library] '{video_id}' 추가: 세그먼트 {num_segments}개 (전체 {len(manifest['videos'])}편)")
+
+    def remove(self, video_id):
+        with self._lock:
+            manifest = self._load_manifest()
+            if manifest['videos'].pop(video_id, None) is None:
+                print(f"[library] 등록되지 않은 비디오입니다: {video_id}")
+                return False
+            self._save_manifest(manifest)
+            self._shards.pop(video_id, None)
+            if os.path.exists(self.shard_dir(video_id)):
+                shutil.rmtree(self.shard_dir(video_id))
+        print(f"[library] '{video_id}' 삭제 (남은 비디오 {len(manifest['videos'])}편)")
+        return True
+
+    def _open_shards(self, video_ids=None):
+        """{video_id: (RetrievalIndex, ivf_rows, ivf_offsets)}와 전체 군집 중심 (manifest가 바뀌면 다시 읽음)"""
+        with self._lock:
+            manifest = self._load_manifest()
+            for video_id, entry in manifest['videos'].items():
+                if video_id not in self._shards:
+                    shard_dir = os.path.join(self.root, entry['shard'])
+                    index = RetrievalIndex(shard_dir, device=self.device)
+                    rows = np.load(os.path.join(shard_dir, 'ivf_rows.npy'), mmap_mode='r')
+                    offsets = np.load(os.path.join(shard_dir, 'ivf_offsets.npy'))
+                    self._shards[video_id] = (entry['added_at'], index, rows, offsets)
+            if self._centroids is None:
+                matrices, owners = [], []
+                for video_id in manifest['videos']:
+                    centroids = np.load(os.path.join(self.root, manifest['videos'][video_id]['shard'],
+                                                    'ivf_centroids.npy'))
+                    matrices.append(centroids)
+                    owners.extend((video_id, c) for c in range(len(centroids)))
+                self._centroids = (np.concatenate(matrices) if matrices else np.zeros((0, 0), np.float32), owners)
+            shards = {
+                video_id: shard[1:] for video_id, shard in self._shards.items()
+                if video_ids is None or video_id in video_ids
+            }
+            return shards, self._centroids
+
+    def _map(self, func, items):
+        # 스레드 풀은 한 번 만들어 두고 계속 재사용
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return list(self._executor.map(func, items))
+
+    def search_vector(self, query_vector, top_k=10, video_ids=None, exact=False):
+        """
+        질의 임베딩으로 모든(또는 video_ids) 비디오를 검색해서 [(video_id, start, end, score), ...] 반환
+
+        Args:
+            exact: True면 IVF를 쓰지 않고 모든 행의 점수를 계산
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        shards, (centroids, owners) = self._open_shards(video_ids)
+
+        if exact:
+            tasks = [(video_id, None) for video_id in shards]
+        else:
+            # 가까운 군집 nprobe개를 라이브러리 전체에서 고르고 샤드별로 묶음
+            probe = {}
+            if len(centroids):
+                centroid_scores = centroids @ query_vector
+                allowed = np.array([owner[0] in shards for owner in owners])
+                centroid_scores[~allowed] = -np.inf
+                nprobe = min(self.nprobe, int(allowed.sum()))
+                if nprobe > 0:
+                    for i in np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]:
+                        video_id, cluster = owners[i]
+                        probe.setdefault(video_id, []).append(cluster)
+            tasks = list(probe.items())
+
+        def search_shard(task):
+            video_id, clusters = task
+            index, rows, offsets = shards[video_id]
+            if clusters is None:
+                idx, scores = top_k_scores(index.embeddings, query_vector, top_k)
+            else:
+                candidates = np.sort(np.concatenate([rows[offsets[c]:offsets[c + 1]] for c in clusters]))
+                local_idx, scores = top_k_scores(index.embeddings[candidates], query_vector, top_k)
+                idx = candidates[local_idx]
+            return [(float(score), video_id, float(index.starts[i]), float(index.ends[i]))
+                    for i, score in zip(idx, scores)]
+
+        # numpy 행렬 곱은 GIL을 놓기 때문에 샤드별 검색이 스레드에서 동시에 실행됨
+        per_shard = self._map(search_shard, tasks)
+        best = heapq.nlargest(top_k, (hit for hits in per_shard for hit in hits), key=lambda hit: hit[0])
+        return [(video_id, start, end, score) for score, video_id, start, end in best]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def search(self, query, top_k=10, video_ids=None, exact=False):
+        """자유 문장으로 라이브러리 전체를 검색해서 [(video_id, start, end, score), ...]를 점수 순서로 반환"""
+        tokenizer, model = load_text_encoder(self.device)
+        query_vector = encode_texts([query], tokenizer, model)[0]
+        return self.search_vector(query_vector, top_k=top_k, video_ids=video_ids, exact=exact)
+
+
+if __name__ == "__main__":
+    # 사용법:
+    #   python video_library.py <라이브러리 폴더> list
+    #   python video_library.py <라이브러리 폴더> add <video_id> <검색 인덱스 폴더 또는 merged_caption 경로> [원본 비디오 경로]
+    #   python video_library.py <라이브러리 폴더> remove <video_id>
+    #   python video_library.py <라이브러리 폴더> search "<질의>" [결과 수]
+    if len(sys.argv) < 3:
+        print("사용법: python video_library.py <라이브러리 폴더> list|add|remove|search ...")
+        sys.exit(1)
+    library = VideoLibrary(sys.argv[1])
+    command = sys.argv[2]
+    if command == "list":
+        for video_id, entry in library.videos().items():
+            print(f"{video_id}: {entry['title']} (세그먼트 {entry['num_segments']}개) {entry['video_path'] or ''}")
+    elif command == "add":
+        source = sys.argv[4]
+        video_path = sys.argv[5] if len(sys.argv) > 5 else None
+        if os.path.exists(os.path.join(source, 'embeddings.npy')):
+            library.add(sys.argv[3], video_path=video_path, index_dir=source)
+        else:
+            library.add(sys.argv[3], video_path=video_path, merged_caption_path=source)
+    elif command == "remove":
+        library.remove(sys.argv[3])
+    elif command == "search":
+        start_time = time.time()
+        results = library.search(sys.argv[3], top_k=int(sys.argv[4]) if len(sys.argv) > 4 else 10)
+        print(f"검색 시간: {(time.time() - start_time) * 1000:.1f}ms")
+        for video_id, start, end, score in results:
+            print(f"{video_id:>20} {start:9.2f} - {end:9.2f}  {score:.3f}")
@@ -8,6 +8,9 @@ import json
 import random
 import numpy as np
 from PIL import ImageDraw, Image
+from model_registry import registry
+
+VIDEOMAE_MODEL_ID = "MCG-NJU/videomae-base-finetuned-kinetics"
 
 ### 경로 설정 ###
 BASE_PATH = '/home/aikusrv02/aiku/video_retrieval'
@@ -53,11 +56,20 @@ def extract_frames(video_path, num_frames=16):
         
     return np.array(frames)  # numpy 배열로 변환
 
+def load_videomae():
+    """VideoMAE 모델 로드 (프로세스에서 한 번만 로드하고 쇼츠마다 재사용)"""
+    def load():
+        processor = AutoImageProcessor.from_pretrained(VIDEOMAE_MODEL_ID)
+        model = AutoModelForVideoClassification.from_pretrained(VIDEOMAE_MODEL_ID)
+        model.eval()
+        return processor, model
+
+    return registry.get(VIDEOMAE_MODEL_ID, load)
+
 def analyze_video_content(video_path):
     """비디오 내용 분석하여 행동/장면 설명 생성"""
     try:
-        processor = AutoImageProcessor.from_pretrained("MCG-NJU/videomae-base-finetuned-kinetics")
-        model = AutoModelForVideoClassification.from_pretrained("MCG-NJU/videomae-base-finetuned-kinetics")
+        processor, model = load_videomae()
         
         frames = extract_frames(video_path)
         if frames is None:
@@ -409,4 +421,5 @@ if __name__ == "__main__":
         
         print("-" * 50)
     
+    registry.report()
     print("\n모든 처리 완료!")
\ No newline at end of file
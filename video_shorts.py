@@ -1,65 +1,117 @@
-from moviepy.editor import VideoFileClip, ColorClip, CompositeVideoClip
 import os
+import sys
+import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 ### 경로 설정 ###
 BASE_PATH = '/home/aikusrv02/aiku/video_retrieval'
 base_data_path = f"{BASE_PATH}/data/home_alone" ### 여기만 바꾸면 됨##
+final_video_export = f"{base_data_path}/final_video"  # model/main.py가 잘라낸 클립을 내보내는 고정 경로 (main.py의 final_video_export와 같게)
+max_concurrent_encodes = 2  # 동시에 실행할 인코딩 수 (인코딩마다 CPU 코어를 나눠 씀)
 
+# Shorts 비율 (9:16)
+SHORTS_ASPECT = (9, 16)
 
 
+def shorts_filter_graph(target_size=None, color="black"):
+    """
+    9:16 캔버스 가운데에 영상을 놓는 ffmpeg 필터 그래프
 
-def add_margin_to_short(input_video_path, output_video_path):
-    # 비디오 클립 불러오기
-    clip = VideoFileClip(input_video_path)
-    
-    # Shorts 비율 (9:16) 계산
-    target_aspect_ratio = 9 / 16
-    video_aspect_ratio = clip.w / clip.h
-    
-    # 목표 크기 계산 (9:16 비율에 맞춤)
-    target_width = clip.w
-    target_height = int(target_width / target_aspect_ratio)
-    
-    # 위아래 여백 추가 여부 결정
-    if video_aspect_ratio > target_aspect_ratio:
-        # 가로가 더 긴 경우, 위아래에 여백 추가
-        margin_height = (target_height - clip.h) // 2
-        # 위아래 여백을 추가한 배경 생성
-        background = ColorClip(size=(clip.w, target_height), color=(0, 0, 0))
-        background = background.set_duration(clip.duration)
-        
-        # 클립을 배경 중앙에 배치
-        video_with_margin = CompositeVideoClip([background, clip.set_position(("center", "center"))])
-    else:
-        # 비율이 맞으면 여백 추가 없이 원본 유지
-        video_with_margin = clip
-
-    # 출력 파일 저장
-    video_with_margin.write_videofile(output_video_path, codec="libx264", fps=clip.fps)
+    target_size가 없으면 기존처럼 원본 해상도를 유지하고, 가로가 더 길면 위아래에(레터박스),
+    세로가 더 길면 좌우에(필러박스) 여백을 붙임. target_size=(가로, 세로)면 비율을 유지한 채
+    그 크기 안에 맞게 줄이거나 늘린 뒤 나머지를 여백으로 채움.
+    """
+    w, h = SHORTS_ASPECT
+    if target_size is None:
+        # 코덱이 짝수 크기를 요구하므로 2의 배수로 올림 (내리면 홀수 크기 원본보다 작아져 pad가 실패함)
+        pad = (f"pad=w='ceil(max(iw,ih*{w}/{h})/2)*2':h='ceil(max(ih,iw*{h}/{w})/2)*2'"
+               f":x='(ow-iw)/2':y='(oh-ih)/2':color={color}")
+        return f"{pad},setsar=1"
+    width, height = target_size
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease:force_divisible_by=2,"
+            f"pad={width}:{height}:x='(ow-iw)/2':y='(oh-ih)/2':color={color},setsar=1")
+
+
+def add_margin_to_short(input_video_path, output_video_path, target_size=None, crf=20, preset="veryfast",
+                        threads=None):
+    """
+    영상에 여백을 붙여 9:16 Shorts 비율로 만듦 (ffmpeg 필터 그래프로 한 번에 인코딩, 소리는 그대로 복사)
+
+    Args:
+        target_size: (가로, 세로) 출력 크기 (None이면 원본 해상도 기준으로 여백만 추가)
+        threads: 인코더 스레드 수 (여러 인코딩을 동시에 돌릴 때 코어를 나눠 쓰도록 지정)
+    """
+    command = [
+        'ffmpeg', '-v', 'error', '-y',
+        '-i', input_video_path,
+        '-vf', shorts_filter_graph(target_size),
+        '-c:v', 'libx264', '-preset', preset, '-crf', str(crf), '-pix_fmt', 'yuv420p',
+        '-c:a', 'copy',
+        '-movflags', '+faststart',
+    ]
+    if threads:
+        command += ['-threads', str(threads)]
+    result = subprocess.run(command + [output_video_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # ffmpeg는 필터 설정 오류에도 종료 코드 0으로 끝나면서 빈 파일을 남길 수 있으므로 출력 파일도 확인
+    if result.returncode != 0 or not os.path.exists(output_video_path) or os.path.getsize(output_video_path) == 0:
+        if os.path.exists(output_video_path):
+            os.remove(output_video_path)
+        raise subprocess.CalledProcessError(result.returncode or 1, command, result.stdout, result.stderr)
+    return output_video_path
 
 
 def print_video_dimensions(video_path):
-    # 비디오 파일 불러오기
-    clip = VideoFileClip(video_path)
-    
-    # 가로 및 세로 길이 출력
-    width, height = clip.w, clip.h
+    # ffprobe로 비디오 가로/세로 길이 확인
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width,height',
+         '-of', 'json', video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    stream = json.loads(result.stdout)['streams'][0]
+    width, height = stream['width'], stream['height']
     print(f"비디오 가로 길이: {width} 픽셀")
     print(f"비디오 세로 길이: {height} 픽셀")
-    
+    return width, height
+
+
+def make_shorts_batch(input_dir, output_dir, max_workers=2, target_size=None):
+    """
+    input_dir의 mp4 파일들을 최대 max_workers개씩 동시에 Shorts 비율로 변환
+
+    Returns:
+        {입력 파일 이름: 출력 경로 또는 None(실패)}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = sorted(file for file in os.listdir(input_dir) if file.endswith('.mp4'))  # mp4 파일만 처리
+    # 동시에 돌리는 인코딩끼리 코어를 나눠 써서 서로 스레드를 빼앗지 않게 함
+    threads = max(1, (os.cpu_count() or 1) // max(1, max_workers))
+
+    def convert(file):
+        input_video_path = os.path.join(input_dir, file)
+        # 파일 이름 뒤에 _shorts 추가
+        base_name = os.path.splitext(file)[0]  # 확장자 제외한 파일 이름
+        output_video_path = os.path.join(output_dir, f"{base_name}_shorts_black.mp4")
+        try:
+            add_margin_to_short(input_video_path, output_video_path, target_size=target_size, threads=threads)
+            print(f"[shorts] {file} -> {output_video_path}")
+            return output_video_path
+        except subprocess.CalledProcessError as e:
+            print(f"[shorts] {file} 변환 실패: {e.stderr.decode(errors='replace').strip() or e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = dict(zip(files, executor.map(convert, files)))
+    print(f"[shorts] {sum(1 for path in results.values() if path)}/{len(files)}개 변환 완료")
+    return results
+
 
 if __name__ == "__main__":
-    final_video_path = f"{base_data_path}/final_video/"
-    shorts_output_dir = f"{base_data_path}/shorts_trimmed/"
-    
-    # 출력 디렉토리가 없으면 생성
-    if not os.path.exists(shorts_output_dir):
-        os.makedirs(shorts_output_dir)
-    
-    for file in os.listdir(final_video_path):
-        if file.endswith('.mp4'):  # mp4 파일만 처리
-            input_video_path = os.path.join(final_video_path, file)
-            # 파일 이름 뒤에 _shorts 추가
-            base_name = os.path.splitext(file)[0]  # 확장자 제외한 파일 이름
-            output_video_path = os.path.join(shorts_output_dir, f"{base_name}_shorts_black.mp4")
-            add_margin_to_short(input_video_path, output_video_path)
\ No newline at end of file
+    # 사용법: python video_shorts.py [입력 폴더] [출력 폴더] [동시 인코딩 수]
+    final_video_path = sys.argv[1] if len(sys.argv) > 1 else final_video_export
+    shorts_output_dir = sys.argv[2] if len(sys.argv) > 2 else f"{base_data_path}/shorts_trimmed/"
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else max_concurrent_encodes
+    if not os.path.isdir(final_video_path):
+        sys.exit(f"[shorts] 입력 폴더가 없습니다: {final_video_path} (model/main.py를 먼저 실행하거나 입력 폴더를 지정하세요)")
+
+    make_shorts_batch(final_video_path, shorts_output_dir, max_workers=workers)